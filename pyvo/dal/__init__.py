@@ -5,8 +5,12 @@ from .ssa import search as spectrumsearch
 from .sla import search as linesearch
 from .scs import search as conesearch
 from .tap import search as tablesearch
+from .fanout import search as multisearch
 
-from .query import DALService, DALQuery, DALResults, Record
+from .query import (
+    DALService, DALQuery, DALResults, Record,
+    enable_response_cache, disable_response_cache,
+    enable_dataset_cache, disable_dataset_cache)
 
 from .sia import SIAService, SIAQuery, SIAResults, SIARecord
 from .sia2 import SIA2Service, SIA2Query, SIA2Results, ObsCoreRecord
@@ -14,6 +18,9 @@ from .ssa import SSAService, SSAQuery, SSAResults, SSARecord
 from .sla import SLAService, SLAQuery, SLAResults, SLARecord
 from .scs import SCSService, SCSQuery, SCSResults, SCSRecord
 from .tap import TAPService, TAPQuery, TAPResults, AsyncTAPJob
+from .fanout import SearchFailure
+from .scheduler import JobWatcher
+from .vosi import enable_metadata_cache, disable_metadata_cache
 
 
 from .exceptions import (
@@ -22,13 +29,16 @@ from .exceptions import (
 
 __all__ = [
     "imagesearch", "spectrumsearch", "linesearch", "conesearch", "tablesearch",
+    "multisearch",
     "DALService", "imagesearch2",
     "SIAService", "SIA2Service", "SSAService", "SLAService", "SCSService", "TAPService",
     "DALQuery", "SIAQuery", "SIA2Query", "SSAQuery", "SLAQuery", "SCSQuery", "TAPQuery",
-    "DALResults",
+    "DALResults", "enable_response_cache", "disable_response_cache",
+    "enable_dataset_cache", "disable_dataset_cache",
+    "enable_metadata_cache", "disable_metadata_cache",
     "SIAResults", "SIA2Results", "SSAResults", "SLAResults", "SCSResults", "TAPResults",
     "Record", "ObsCoreRecord",
     "SIARecord", "SSARecord", "SLARecord", "SCSRecord",
-    "AsyncTAPJob",
+    "AsyncTAPJob", "JobWatcher", "SearchFailure",
     "DALAccessError", "DALProtocolError", "DALFormatError", "DALServiceError",
     "DALQueryError", "DALOverflowWarning"]
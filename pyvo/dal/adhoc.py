@@ -6,10 +6,12 @@ import numpy as np
 import warnings
 import copy
 import requests
-from collections import OrderedDict
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from time import monotonic
 
 from .query import DALResults, DALQuery, DALService, Record
-from .exceptions import DALServiceError
+from .exceptions import DALAccessError, DALServiceError, DALOverflowWarning
 from .vosi import AvailabilityMixin, CapabilityMixin
 from .params import find_param_by_keyword, get_converter
 
@@ -30,6 +32,11 @@ from ..dam.obscore import POLARIZATION_STATES
 # reasons. This is the size of a batch
 DATALINK_BATCH_CALL_SIZE = 50
 
+# batches of IDs are sized so that a datalink response takes about this
+# many seconds and has about this many rows
+DATALINK_BATCH_SECONDS = 10
+DATALINK_BATCH_ROWS = 10000
+
 SODA_SYNC_IVOID = 'ivo://ivoa.net/std/SODA#sync-1'
 DATALINK_IVOID = 'ivo://ivoa.net/std/datalink'
 
@@ -170,60 +177,170 @@ class DatalinkResultsMixin(AdhocServiceResultsMixin):
     Mixin for datalink functionallity for results classes.
     """
 
-    def iter_datalinks(self):
+    def iter_datalinks(self, *, max_workers=4, batch_size=None):
         """
-        Iterates over all datalinks in a DALResult.
+        Iterates over all datalinks in a DALResult, in the order of its rows.
+
+        Where the rows reference a datalink service, their IDs are sent to
+        it in batches, with up to ``max_workers`` requests running at the
+        same time.  The size of the batches is adapted to the number of
+        IDs the service accepts per request and to the time and size of
+        its responses.  The IDs of a batch that fails are requested one by
+        one; the error of an ID that fails on its own is raised when its
+        row is reached.
+
+        Parameters
+        ----------
+        max_workers : int
+            the maximal number of datalink requests running at the same time
+        batch_size : int
+            the number of IDs sent in the first requests.  By default, all
+            IDs are sent in a single first request, and the size of the
+            response is used as the service's limit.
         """
-        # To reduce the number of calls to the Datalink service, multiple
-        # IDs are sent in batches. The appropriate batch size is not available
-        # as each service has its own criteria for determining the maximum
-        # number of IDs processed per request. To overcome this limitation,
-        # this method initially sends all the available IDs and if the
-        # response is partial, uses the size of the response as the batch
-        # size.
         if not hasattr(self, '_datalink'):
             try:
                 self._datalink = self.get_adhocservice_by_ivoid(DATALINK_IVOID)
             except DALServiceError:
                 self._datalink = None
-        remaining_ids = []  # remaining IDs to processed
-        current_batch = None  # retrieved but not returned yet
-        current_ids = []  # retrieved but not returned
-        processed_ids = []  # retrived and returned IDs
-        batch_size = None  # size of the batch
+
+        if self._datalink:
+            self.query = DatalinkQuery.from_resource(
+                [_ for _ in self], self._datalink, session=self._session)
+            yield from _iter_batched_datalinks(
+                self.query, list(self.query['ID']),
+                max_workers=max_workers, batch_size=batch_size)
+            return
 
         for row in self:
-            if self._datalink:
-                if not current_ids:
-                    if batch_size is None:
-                        # first call.
-                        self.query = DatalinkQuery.from_resource(
-                            [_ for _ in self], self._datalink, session=self._session)
-                        remaining_ids = self.query['ID']
-                    if not remaining_ids:
-                        # we are done
-                        return
-                    if batch_size:
-                        # subsequent calls are limitted to batch size
-                        self.query['ID'] = remaining_ids[:batch_size]
-                    current_batch = self.query.execute(post=True)
-                    current_ids = list(OrderedDict.fromkeys(
-                        [_ for _ in current_batch.to_table()['ID']]))
-                    if not current_ids:
-                        raise DALServiceError(
-                            'Could not retrieve datalinks for: {}'.format(
-                                ', '.join([_ for _ in remaining_ids])))
-                    batch_size = len(current_ids)
-                id1 = current_ids.pop(0)
-                processed_ids.append(id1)
-                remaining_ids.remove(id1)
-                yield current_batch.clone_byid(id1)
-            elif row.access_format == DATALINK_MIME_TYPE:
+            if row.access_format == DATALINK_MIME_TYPE:
                 yield DatalinkResults.from_result_url(row.getdataurl())
             else:
                 yield None
 
 
+class _BatchSizer:
+    """
+    the number of IDs to send in the next datalink request, learned from
+    the responses so far.
+    """
+
+    def __init__(self, size=None):
+        # None until the first response if the service limit is probed
+        self.size = size
+        self.limit = None
+        self._seconds_per_id = None
+        self._rows_per_id = None
+
+    def update(self, requested, returned, rows, elapsed):
+        """
+        take into account a response with ``rows`` rows for ``returned`` of
+        ``requested`` IDs that took ``elapsed`` seconds.
+        """
+        if returned < requested:
+            # the service truncated the batch; never send more than that
+            self.limit = min(self.limit or returned, returned)
+
+        seconds_per_id = max(elapsed, 1e-3) / returned
+        rows_per_id = max(rows, 1) / returned
+        if self._seconds_per_id is None:
+            self._seconds_per_id, self._rows_per_id = (
+                seconds_per_id, rows_per_id)
+        else:
+            self._seconds_per_id = (self._seconds_per_id + seconds_per_id) / 2
+            self._rows_per_id = (self._rows_per_id + rows_per_id) / 2
+
+        size = min(DATALINK_BATCH_SECONDS / self._seconds_per_id,
+                   DATALINK_BATCH_ROWS / self._rows_per_id,
+                   2 * (self.size or returned))
+        if self.limit is not None:
+            size = min(size, self.limit)
+        self.size = max(1, int(size))
+
+
+def _iter_batched_datalinks(query, ids, *, max_workers, batch_size):
+    # yields the DatalinkResults for each of ids, in order, keeping up to
+    # max_workers requests in flight
+    wanted = Counter(ids)  # how often each ID is still to be yielded
+    queue = deque(OrderedDict.fromkeys(ids))  # IDs not requested yet
+    single = set()  # IDs of failed batches, to be requested one by one
+    resolved = {}  # DatalinkResults or exception by ID
+    sizer = _BatchSizer(batch_size)
+
+    def run(batch):
+        batch_query = DatalinkQuery(
+            query.baseurl, session=query._session, **query)
+        batch_query['ID'] = batch
+        started = monotonic()
+        result = batch_query.execute(post=True)
+        return result, monotonic() - started
+
+    def next_batch():
+        if queue[0] in single:
+            return [queue.popleft()]
+        size = sizer.size or len(queue)
+        batch = []
+        while queue and len(batch) < size and queue[0] not in single:
+            batch.append(queue.popleft())
+        return batch
+
+    def failed(batch, error):
+        if len(batch) == 1:
+            resolved[batch[0]] = error
+        else:
+            single.update(batch)
+            queue.extendleft(reversed(batch))
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {}
+    try:
+        for id_ in ids:
+            while id_ not in resolved:
+                # while the limit of the service is unknown, the first
+                # request is sent alone
+                while (queue and len(pending) < max_workers
+                       and not (sizer.size is None and pending)):
+                    batch = next_batch()
+                    pending[executor.submit(run, batch)] = batch
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch = pending.pop(future)
+                    try:
+                        result, elapsed = future.result()
+                    except DALAccessError as ex:
+                        failed(batch, ex)
+                        continue
+
+                    byid = result._rows_byid()
+                    returned = [_ for _ in batch if _ in byid]
+                    if not returned:
+                        failed(batch, DALServiceError(
+                            'Could not retrieve datalinks for: {}'.format(
+                                ', '.join(batch)), url=result.queryurl))
+                        continue
+
+                    sizer.update(
+                        len(batch), len(returned), len(result), elapsed)
+                    for returned_id in returned:
+                        resolved[returned_id] = result.clone_byid(returned_id)
+                    # truncated batches are continued first
+                    queue.extendleft(reversed(
+                        [_ for _ in batch if _ not in byid]))
+
+            outcome = resolved[id_]
+            wanted[id_] -= 1
+            if not wanted[id_]:
+                del resolved[id_]
+            if isinstance(outcome, Exception):
+                raise outcome
+            yield outcome
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
 class DatalinkRecordMixin:
     """
     Mixin for record classes, providing functionallity for datalink.
@@ -231,6 +348,8 @@ class DatalinkRecordMixin:
     - ``getdataset()`` considers datalink.
     """
 
+    __slots__ = ()
+
     def getdatalink(self):
         try:
             datalink = self._results.get_adhocservice_by_ivoid(DATALINK_IVOID)
@@ -254,6 +373,12 @@ class DatalinkRecordMixin:
             # this should go to Record.getdataset()
             return super().getdataset(timeout=timeout)
 
+    def _get_dataset_url(self):
+        try:
+            return next(self.getdatalink().bysemantics('#this')).access_url
+        except (DALServiceError, ValueError, StopIteration):
+            return super()._get_dataset_url()
+
 
 class DatalinkService(DALService, AvailabilityMixin, CapabilityMixin):
     """
@@ -569,6 +694,66 @@ class DatalinkResults(DatalinkResultsMixin, DALResults):
             if record.semantics in semantics:
                 yield record
 
+    def _rows_byid(self):
+        # maps each ID to its rows (a slice where they are contiguous),
+        # in the order the IDs first appear; built once per result
+        if getattr(self, '_byid', None) is None:
+            positions = OrderedDict()
+            for position, id_ in enumerate(
+                    self.resultstable.array['ID'].tolist()):
+                positions.setdefault(id_, []).append(position)
+
+            self._byid = OrderedDict()
+            for id_, rows in positions.items():
+                if rows[-1] - rows[0] + 1 == len(rows):
+                    self._byid[id_] = slice(rows[0], rows[-1] + 1)
+                else:
+                    self._byid[id_] = np.array(rows)
+        return self._byid
+
+    def _view(self, rows):
+        # a DatalinkResults with the given rows of this one, sharing the
+        # parsed VOTable and keeping only the services these rows reference
+        table = copy.copy(self.resultstable)
+        table.array = self.resultstable.array[rows]
+
+        referenced = set(
+            service for service in table.array['service_def'].tolist()
+            if service)
+        results = self._findresultsresource(self.votable)
+
+        votable = copy.copy(self.votable)
+        votable._resources = HomogeneousList(Resource)
+        for resource in self.votable.resources:
+            if resource is results:
+                resource = copy.copy(resource)
+                resource._tables = HomogeneousList(
+                    type(table), [table] + list(results.tables[1:]))
+            elif resource.ID and resource.ID not in referenced:
+                continue
+            votable.resources.append(resource)
+
+        with warnings.catch_warnings():
+            # the complete result has warned already
+            warnings.simplefilter("ignore", DALOverflowWarning)
+            return DatalinkResults(
+                votable, url=self.queryurl, session=self._session)
+
+    def iter_byid(self):
+        """
+        iterate over the IDs in this result together with the datalink
+        results for each of them, in the order the IDs first appear.
+
+        The index of the rows belonging to each ID is built once; the
+        results share the rows and service descriptors with this result.
+
+        Returns
+        -------
+        Iterator of (str, DatalinkResults)
+        """
+        for id_, rows in self._rows_byid().items():
+            yield id_, self._view(rows)
+
     def clone_byid(self, id):
         """
         return a clone of the object with results and corresponding
@@ -576,28 +761,11 @@ class DatalinkResults(DatalinkResultsMixin, DALResults):
 
         Returns
         -------
-        Sequence of DatalinkRecord
-            a sequence of dictionary-like wrappers containing the result record
+        DatalinkResults
+            the datalink results for the given id; they share their rows
+            and service descriptors with this result.
         """
-
-        copy_tb = copy.deepcopy(self.votable)
-        votable = copy_tb.get_first_table()
-        # find index of ID column
-        id_index = None
-        for index, field in enumerate(votable.fields):
-            if field.name == 'ID':
-                id_index = index
-        rows = [x for x in votable.array if x[id_index] == id]
-        votable.create_arrays(len(rows))
-        for index, row in enumerate(rows):
-            votable.array[index] = row
-        # now remove unreferenced services from resources
-        referenced_serviced = [x for x in votable.array['service_def'] if x]
-        # remove customized that are not referenced by the current results
-        for x in copy_tb.resources:
-            if x.ID and x.ID not in referenced_serviced:
-                copy_tb.resources.remove(x)
-        return DatalinkResults(copy_tb)
+        return self._view(self._rows_byid().get(id, slice(0, 0)))
 
     def getdataset(self, *, timeout=None):
         """
@@ -637,6 +805,8 @@ class SodaRecordMixin:
     `pyvo.dal.adhoc.AdhocServiceResultsMixin` mixed in.
     """
 
+    __slots__ = ()
+
     def _get_soda_resource(self):
         try:
             return self._results.get_adhocservice_by_ivoid(SODA_SYNC_IVOID)
@@ -716,6 +886,8 @@ class DatalinkRecord(DatalinkRecordMixin, SodaRecordMixin, Record):
     operator) where *key* is table column name.
     """
 
+    __slots__ = ()
+
     @property
     def id(self):
         """
@@ -0,0 +1,125 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Conversion of VOTable result tables to Apache Arrow.
+
+This needs the optional dependency pyarrow.
+"""
+import numpy as np
+
+__all__ = ["table_to_arrow"]
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError(
+            "Arrow and Parquet export require the pyarrow package")
+    return pyarrow
+
+
+def _native(data):
+    # arrow only accepts native byte order
+    if not data.dtype.isnative:
+        data = data.astype(data.dtype.newbyteorder("="))
+    return data
+
+
+def _pyvalue(value):
+    # python values for the elements of object columns, which hold
+    # variable-length strings and arrays
+    if value is None or value is np.ma.masked:
+        return None
+    if isinstance(value, np.ma.MaskedArray):
+        return [None if masked else item for item, masked in zip(
+            value.data.tolist(), np.ma.getmaskarray(value).tolist())]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _column_to_arrow(pa, column):
+    data = np.ma.getdata(column)
+    mask = np.ma.getmaskarray(column)
+    nrows = len(data)
+
+    if data.dtype.kind == "O":
+        return pa.array([
+            None if masked else _pyvalue(value)
+            for value, masked in zip(data, mask)])
+
+    if data.dtype.kind == "c":
+        data = np.stack([data.real, data.imag], axis=-1)
+        mask = np.stack([mask, mask], axis=-1)
+
+    data = _native(data)
+
+    if data.ndim > 1:
+        # fixed-size arrays; a row is null if all its elements are
+        width = int(np.prod(data.shape[1:]))
+        flat_mask = mask.reshape(-1)
+        values = pa.array(
+            np.ascontiguousarray(data).reshape(-1),
+            mask=flat_mask if flat_mask.any() else None)
+        row_mask = mask.reshape(nrows, width).all(axis=1)
+        return pa.FixedSizeListArray.from_arrays(
+            values, width, mask=pa.array(row_mask) if row_mask.any() else None)
+
+    # numeric columns are handed over without copying where numpy's
+    # memory layout permits; masks become validity bitmaps
+    array = pa.array(data, mask=mask if mask.any() else None)
+    if pa.types.is_binary(array.type):
+        array = array.cast(pa.string())
+    return array
+
+
+def _field_metadata(field):
+    metadata = {}
+    for key in ("ID", "ucd", "utype", "unit", "datatype", "arraysize"):
+        value = getattr(field, key, None)
+        if value is not None:
+            metadata[key.lower()] = str(value)
+    if field.description:
+        metadata["description"] = field.description
+    return metadata
+
+
+def table_to_arrow(table):
+    """
+    convert a VOTable table element to a `pyarrow.Table`.
+
+    Numeric columns are converted without copying where the memory layout
+    of the table's array permits it, and masked values become nulls.  The
+    field metadata (ID, UCD, utype, unit, datatype, arraysize and
+    description) is kept in the metadata of the arrow fields.
+
+    Parameters
+    ----------
+    table : `astropy.io.votable.tree.TableElement`
+        the table to convert
+
+    Returns
+    -------
+    `pyarrow.Table`
+    """
+    pa = _import_pyarrow()
+
+    arrays, fields = [], []
+    for field in table.fields:
+        array = _column_to_arrow(pa, table.array[field.name])
+        arrays.append(array)
+        fields.append(pa.field(
+            field.name, array.type, metadata=_field_metadata(field)))
+
+    metadata = {}
+    if table.name:
+        metadata["name"] = table.name
+    if table.description:
+        metadata["description"] = table.description
+
+    return pa.Table.from_arrays(
+        arrays, schema=pa.schema(fields, metadata=metadata or None))
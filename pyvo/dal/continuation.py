@@ -0,0 +1,263 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Completing results that services cut off at their output limit.
+
+When a query overflows (QUERY_STATUS is OVERFLOW), follow-up queries fetch
+the missing rows, and all rows are put into a single result.  TAP queries
+are continued by paging on a unique ordering key, so no row is transferred
+twice.  Cone-shaped searches (SCS, SSA, SIA2) are continued by covering
+the cone with smaller cones, which are split again while they overflow;
+rows outside the original cone and rows already received are dropped.
+"""
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import warnings
+
+import numpy as np
+
+from astropy.coordinates import SkyCoord, angular_separation
+import astropy.units as u
+
+from .exceptions import DALOverflowWarning
+from .partition import _is_overflow, _merge
+
+__all__ = ["Progress", "run_continued", "run_cone_continued"]
+
+#: the name of the subquery wrapping continued TAP queries
+_SUBQUERY = "pyvo_continued"
+
+# a cone of radius r is covered by seven cones of radius r/2, one at its
+# center and six at the distance sqrt(3)/2 r around it; the margin absorbs
+# the curvature of the sphere
+_SUBCONE_SCALE = 0.5 * 1.02
+_SUBCONE_OFFSET = np.sqrt(3) / 2
+
+
+Progress = namedtuple("Progress", ["queries", "rows", "pending"])
+Progress.__doc__ = """
+the state of a continued query, as passed to progress callbacks.
+"""
+Progress.queries.__doc__ = "the number of queries run so far"
+Progress.rows.__doc__ = "the number of distinct rows received so far"
+Progress.pending.__doc__ = "the number of queries known to be still needed"
+
+
+def _literal(value):
+    # the ADQL literal for a key value
+    from .tap import escape
+
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bytes):
+        value = value.decode("utf-8")
+    if isinstance(value, str):
+        return "'{}'".format(escape(value))
+    return repr(value)
+
+
+def run_continued(
+        service, query, *, key, mode="sync", maxrec=None, progress=None,
+        **keywords):
+    """
+    run ``query`` on ``service`` and, as long as the result overflows,
+    fetch the following rows in the order of ``key``.
+
+    See `pyvo.dal.TAPService.run_continued` for the parameters.
+
+    Returns
+    -------
+    `~pyvo.dal.TAPResults`
+    """
+    from .tap import TAPResults
+
+    if mode not in ("sync", "async"):
+        raise ValueError("mode must be sync or async")
+    run = service.run_sync if mode == "sync" else service.run_async
+
+    parts = []
+    rows = 0
+    last = None
+    while True:
+        condition = "" if last is None else " WHERE {} > {}".format(
+            key, _literal(last))
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DALOverflowWarning)
+            part = run(
+                "SELECT * FROM ({}) AS {}{} ORDER BY {}".format(
+                    query, _SUBQUERY, condition, key),
+                maxrec=maxrec, **keywords)
+        overflow = _is_overflow(part.votable)
+
+        parts.append(part)
+        rows += len(part)
+        if progress is not None:
+            progress(Progress(len(parts), rows, int(overflow)))
+
+        if not overflow:
+            break
+        if not len(part):
+            # the service cannot return any rows; nothing to continue from
+            warnings.warn(
+                "Partial result set. The service returned no further rows.",
+                category=DALOverflowWarning)
+            break
+        last = part.getcolumn(key)[-1]
+
+    return TAPResults(
+        _merge(parts, overflow and not len(part)), url=parts[0].queryurl,
+        session=service._session)
+
+
+def _subcones(ra, dec, radius):
+    center = SkyCoord(ra, dec, unit="deg")
+    around = center.directional_offset_by(
+        np.arange(6) * 60 * u.deg, _SUBCONE_OFFSET * radius * u.deg)
+    subradius = _SUBCONE_SCALE * radius
+    return [(ra, dec, subradius)] + [
+        (pos.ra.deg, pos.dec.deg, subradius) for pos in around]
+
+
+def _new_rows(results, center, radius, key, positions, seen, *, first):
+    # which rows of results lie in the cone and have not been seen before;
+    # adds their keys to seen.  Rows without a key are identified by their
+    # position; without that, they are only kept from the first query.
+    # Also returns the number of rows dropped for lack of both.
+    keep = np.ones(len(results), dtype=bool)
+
+    located = positions(results)
+    unlocated = np.ones(len(results), dtype=bool)
+    if located is not None:
+        ra, dec, slack = located
+        separation = np.rad2deg(angular_separation(
+            np.deg2rad(ra), np.deg2rad(dec),
+            np.deg2rad(center[0]), np.deg2rad(center[1])))
+        # rows without a position are kept
+        keep &= np.ma.filled(separation <= radius + slack, True)
+        unlocated = np.ma.getmaskarray(ra) | np.ma.getmaskarray(dec)
+
+    name = key(results) if callable(key) else key
+    if name is None:
+        raise ValueError(
+            "the results have no column identifying the rows; pass key")
+
+    dropped = 0
+    for index, value in enumerate(results.getcolumn(name)):
+        if not keep[index]:
+            continue
+        if value is np.ma.masked:
+            if not unlocated[index]:
+                value = ("position", float(ra[index]), float(dec[index]))
+            elif first:
+                continue
+            else:
+                keep[index] = False
+                dropped += 1
+                continue
+        if value in seen:
+            keep[index] = False
+        else:
+            seen.add(value)
+    return keep, dropped
+
+
+def run_cone_continued(
+        make_query, results_class, ra, dec, radius, *, key, positions,
+        max_depth=4, max_workers=4, progress=None, session=None):
+    """
+    run a cone-shaped search and, where the result overflows, search the
+    area again in smaller cones.
+
+    This is the implementation behind the ``search_continued`` methods of
+    the SCS, SSA and SIA2 services.
+
+    Parameters
+    ----------
+    make_query : callable
+        returns the `~pyvo.dal.DALQuery` for the cone with the center
+        ``ra``, ``dec`` and the radius ``radius``, all in degrees.
+    results_class : type
+        the `~pyvo.dal.DALResults` subclass for the results of the queries
+    ra, dec, radius : float
+        the cone to search, in degrees
+    key : str or callable
+        the name of a column uniquely identifying the rows, or a function
+        returning it for a result; rows found in several cones are only
+        kept once.  Rows with a NULL key are told apart by their
+        positions; rows without either are dropped from all but the first
+        query, with a `~pyvo.dal.DALOverflowWarning`.
+    positions : callable
+        returns the right ascensions and declinations of the rows of a
+        result as arrays in degrees, together with how far (in degrees)
+        they may be from the cone and still belong to the result; or None
+        if the rows have no positions.
+    max_depth : int
+        how often a cone may be split; cones still overflowing are left
+        incomplete, with a `~pyvo.dal.DALOverflowWarning`.
+    max_workers : int
+        the maximal number of queries run at the same time
+    progress : callable
+        called with a `Progress` after each query
+    session : object
+        the session to attach to the results
+
+    Returns
+    -------
+    results_class
+        the combined results
+    """
+    def run(cone):
+        query = make_query(*cone[1:])
+        return query.execute_votable(), query.queryurl
+
+    pending = [(0, ra, dec, radius)]
+    parts = []
+    seen = set()
+    queries = rows = truncated = dropped = 0
+
+    while pending:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            outcomes = list(executor.map(run, pending))
+
+        rerun = []
+        for index, (cone, (votable, url)) in enumerate(zip(pending, outcomes)):
+            queries += 1
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", DALOverflowWarning)
+                part = results_class(votable, url=url, session=session)
+
+            keep, unknown = _new_rows(
+                part, (ra, dec), radius, key, positions, seen,
+                first=queries == 1)
+            dropped += unknown
+            part.resultstable.array = part.resultstable.array[keep]
+            if len(part.resultstable.array) or not parts:
+                parts.append(part)
+            rows += int(keep.sum())
+
+            if _is_overflow(votable):
+                if cone[0] < max_depth:
+                    rerun.extend(
+                        (cone[0] + 1,) + subcone
+                        for subcone in _subcones(*cone[1:]))
+                else:
+                    truncated += 1
+
+            if progress is not None:
+                progress(Progress(
+                    queries, rows, len(pending) - index - 1 + len(rerun)))
+        pending = rerun
+
+    if truncated:
+        warnings.warn(
+            "Partial result set. {} cones still exceed the output "
+            "limit.".format(truncated), category=DALOverflowWarning)
+    if dropped:
+        warnings.warn(
+            "{} rows of the smaller cones without a key or position were "
+            "dropped, as they may duplicate others.".format(dropped),
+            category=DALOverflowWarning)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DALOverflowWarning)
+        return results_class(
+            _merge(parts, truncated), url=parts[0].queryurl, session=session)
@@ -2,8 +2,21 @@
 """
 An implementation of the Database API v2.0 interface to DAL VOTable responses.
 This only supports read-only access.
+
+`connect` opens a connection to a TAP service, the cursors of which run ADQL
+queries and read their results while they are being transferred.  Cursors
+over results already retrieved are returned by `pyvo.dal.DALResults.cursor`.
 """
+from contextlib import contextmanager
+import weakref
+
+import numpy as np
+
+from .exceptions import (
+    DALAccessError, DALFormatError, DALQueryError, DALServiceError)
 from .query import Iter
+from .streaming import DEFAULT_CHUNK_SIZE
+from .tap import TAPService
 
 apilevel = "2.0"
 threadsafety = 2
@@ -112,8 +125,414 @@ DATETIME = TypeObject(3, STRING.id)
 ROWID = TypeObject(4, NUMBER.id)
 
 
-def connect(source):
-    raise NotSupportedError("Connection objects not supported")
+def _type_code(datatype):
+    if datatype in ("short", "int", "long", "float", "double",
+                    "floatComplex", "doubleComplex", "boolean"):
+        return NUMBER
+    return STRING
+
+
+def _values(column):
+    # the values of column as Python objects, with None for masked entries
+    # (SQL NULLs)
+    return np.ma.asanyarray(column).tolist()
+
+
+def _rows(columns):
+    # turn columns into rows without creating a record per row
+    return [list(row) for row in zip(*(_values(column) for column in columns))]
+
+
+@contextmanager
+def _dal_errors():
+    # raise the DB-API exceptions for the exceptions of pyvo.dal
+    try:
+        yield
+    except DALQueryError as ex:
+        raise ProgrammingError(str(ex)) from ex
+    except DALFormatError as ex:
+        raise DatabaseError(str(ex)) from ex
+    except DALServiceError as ex:
+        raise OperationalError(str(ex)) from ex
+    except DALAccessError as ex:
+        raise DatabaseError(str(ex)) from ex
+
+
+def connect(service, **keywords):
+    """
+    open a connection to a TAP service.
+
+    Parameters
+    ----------
+    service : str or `~pyvo.dal.TAPService`
+        the service or its access URL
+    **keywords :
+        further arguments to `Connection`
+
+    Returns
+    -------
+    `Connection`
+
+    Examples
+    --------
+    >>> with connect("http://dc.g-vo.org/tap") as conn:  # doctest: +SKIP
+    ...     df = pandas.read_sql("SELECT * FROM ivoa.obscore", conn)
+    """
+    if isinstance(service, str):
+        service = TAPService(service)
+    return Connection(service, **keywords)
+
+
+class Connection:
+    """
+    a read-only connection to a TAP service as defined by the Python Database
+    API.  See PEP 249 for details.
+
+    The cursors of the connection run ADQL queries on the service and read
+    their results while they arrive, so results of any size can be processed
+    without holding them in memory completely.
+
+    Parameters
+    ----------
+    service : `~pyvo.dal.TAPService`
+        the service to query
+    mode : str
+        "sync" to run the queries synchronously, or "async" to run them as
+        asynchronous jobs, which are deleted once their results are read.
+    maxrec : int
+        the maximum number of rows per query; defaults to the service
+        default.
+    chunk_rows : int
+        the minimal number of rows read from a response at a time; cursors
+        with a larger ``arraysize`` read ``arraysize`` rows at a time.
+    **keywords :
+        further arguments to the queries, e.g., ``uploads``
+    """
+
+    def __init__(self, service, *, mode="sync", maxrec=None,
+                 chunk_rows=DEFAULT_CHUNK_SIZE, **keywords):
+        if mode not in ("sync", "async"):
+            raise ValueError("mode must be sync or async")
+        if chunk_rows < 1:
+            raise ValueError("chunk_rows must be positive")
+
+        self._service = service
+        self._mode = mode
+        self._maxrec = maxrec
+        self._chunk_rows = chunk_rows
+        self._keywords = keywords
+        self._cursors = weakref.WeakSet()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def service(self):
+        """
+        the TAP service of this connection (read-only)
+        """
+        return self._service
+
+    @property
+    def closed(self):
+        """
+        whether the connection has been closed (read-only)
+        """
+        return self._closed
+
+    def close(self):
+        """
+        Close the connection and all of its cursors.
+        """
+        for cursor in list(self._cursors):
+            cursor.close()
+        self._closed = True
+
+    def commit(self):
+        """
+        Do nothing, as connections are read-only.  This is provided for
+        compliance with the Python Database API.
+        """
+        pass
+
+    def rollback(self):
+        """
+        Do nothing, as connections are read-only.  This is provided for
+        compliance with the Python Database API.
+        """
+        pass
+
+    def cursor(self):
+        """
+        Return a new `TAPCursor` running queries on the service.
+        """
+        if self._closed:
+            raise InterfaceError("the connection is closed")
+        cursor = TAPCursor(self)
+        self._cursors.add(cursor)
+        return cursor
+
+    def _run(self, query, chunk_size):
+        # returns the job, if any, and an iterator over the result chunks
+        if self._mode == "async":
+            job = self._service.submit_job(
+                query, maxrec=self._maxrec, **self._keywords)
+            try:
+                job.run().wait()
+                job.raise_if_error()
+            except DALAccessError:
+                job.delete()
+                raise
+            return job, job.fetch_result_iter(chunk_size=chunk_size)
+
+        tapquery = self._service.create_query(
+            query, maxrec=self._maxrec, **self._keywords)
+        return None, tapquery.execute_iter(chunk_size=chunk_size)
+
+
+class TAPCursor:
+    """
+    a cursor running queries on the TAP service of a `Connection` and
+    reading their results while they arrive.  This class implements the
+    Python Database API.
+
+    The rows are read from the response in chunks of ``arraysize`` rows,
+    or of the connection's ``chunk_rows`` if that is larger; the next chunk
+    is only read once the rows before it have been fetched.  `fetchmany`
+    and `fetchall` convert all rows they return at once, column by column.
+    """
+
+    def __init__(self, connection):
+        """Create a cursor instance.  The constructor is not typically called
+        by directly applications; rather an instance is obtained from calling
+        a Connection's cursor().
+        """
+        self._connection = connection
+        self._arraysize = 1
+        self._description = None
+        self._rowcount = -1
+        self._job = None
+        self._chunks = None
+        self._buffer = []
+        self._offset = 0
+        self._nrows = 0
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+    @property
+    def connection(self):
+        """
+        the connection this cursor was created from (read-only)
+        """
+        return self._connection
+
+    @property
+    def description(self):
+        """
+        a read-only sequence of 2-item seqences.  Each seqence describes
+        a column in the results, giving its name and type_code.  None before
+        a query has been executed.
+        """
+        return self._description
+
+    @property
+    def rowcount(self):
+        """
+        the number of rows in the result (read-only), or -1 as long as
+        not all of them have been read.
+        """
+        return self._rowcount
+
+    @property
+    def arraysize(self):
+        """
+        the number of rows that will be returned by returned by a call to
+        fetchmany().  This defaults to 1, but can be changed.
+        """
+        return self._arraysize
+
+    @arraysize.setter
+    def arraysize(self, value):
+        if not value:
+            value = 1
+        self._arraysize = value
+
+    def execute(self, operation, parameters=None):
+        """Run an ADQL query on the service.
+
+        Parameters
+        ----------
+        operation : str
+            the ADQL query
+        parameters : sequence or mapping
+            not supported; must be empty.
+
+        Returns
+        -------
+        TAPCursor :
+            this cursor, such that calls to the fetch methods can be
+            chained.
+        """
+        if parameters:
+            raise NotSupportedError("query parameters are not supported")
+        if self._closed or self._connection.closed:
+            raise InterfaceError("the cursor is closed")
+
+        self._reset()
+        chunk_size = max(self.arraysize, self._connection._chunk_rows)
+        with _dal_errors():
+            self._job, self._chunks = self._connection._run(
+                operation, chunk_size)
+            try:
+                # the column descriptions come with the first chunk
+                chunk = next(self._chunks)
+            except BaseException:
+                self._reset()
+                raise
+
+        self._description = tuple(
+            (field.name, _type_code(field.datatype))
+            for field in chunk.fields)
+        self._add(chunk)
+        return self
+
+    def executemany(self, operation, seq_of_parameters):
+        """Not supported, as queries cannot have parameters.
+        """
+        raise NotSupportedError("query parameters are not supported")
+
+    def setinputsizes(self, sizes):
+        """Do nothing.  This is provided for compliance with the Python
+        Database API.
+        """
+        pass
+
+    def setoutputsize(self, size, column=None):
+        """Do nothing.  This is provided for compliance with the Python
+        Database API.
+        """
+        pass
+
+    def _add(self, chunk):
+        if len(chunk.array):
+            self._buffer.append(chunk.array)
+            self._nrows += len(chunk.array)
+
+    def _fill(self, count):
+        # read chunks until count rows are buffered or the result is done
+        while self._chunks is not None and (
+                sum(len(array) for array in self._buffer) - self._offset
+                < count):
+            with _dal_errors():
+                try:
+                    chunk = next(self._chunks)
+                except StopIteration:
+                    self._rowcount = self._nrows
+                    self._finish()
+                    return
+                except BaseException:
+                    self._reset()
+                    raise
+            self._add(chunk)
+
+    def _fetch(self, count):
+        if self._description is None:
+            raise ProgrammingError("no query has been executed")
+
+        self._fill(count)
+        out = []
+        while self._buffer and len(out) < count:
+            array = self._buffer[0]
+            stop = min(len(array), self._offset + count - len(out))
+            out.extend(_rows(
+                array[name][self._offset:stop] for name in array.dtype.names))
+            if stop == len(array):
+                self._buffer.pop(0)
+                self._offset = 0
+            else:
+                self._offset = stop
+        return out
+
+    def fetchone(self):
+        """Return the next row of the query response table.
+
+        Returns
+        -------
+        list :
+            The response is a list wherein each element is the value of the
+            corresponding table field, or None when no more rows are
+            available.
+        """
+        rows = self._fetch(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size=None):
+        """Fetch the next block of rows from the query result.
+
+        Parameters
+        ----------
+        size : int
+            The number of rows to return (default: cursor.arraysize).
+
+        Returns
+        -------
+        list of lists :
+            A list of lists, one per row.  An empty sequence is returned when
+            no more rows are available.
+        """
+        if not size:
+            size = self.arraysize
+        return self._fetch(size)
+
+    def fetchall(self):
+        """Fetch all remaining rows from the result set.
+
+        Returns
+        -------
+        list of lists :
+            A list of lists, one per row.  An empty sequence is returned when
+            no more rows are available.
+        """
+        return self._fetch(float("inf"))
+
+    def _finish(self):
+        # stop reading the response and delete the job, if any
+        if self._chunks is not None:
+            self._chunks.close()
+            self._chunks = None
+        if self._job is not None:
+            try:
+                self._job.delete()
+            except DALServiceError:
+                pass
+            self._job = None
+
+    def _reset(self):
+        self._finish()
+        self._description = None
+        self._rowcount = -1
+        self._buffer = []
+        self._offset = 0
+        self._nrows = 0
+
+    def close(self):
+        """Close the cursor, stop reading the current result and delete its
+        job, if any.
+        """
+        self._reset()
+        self._closed = True
 
 
 class Cursor(Iter):
@@ -138,14 +557,7 @@ class Cursor(Iter):
         out = []
         for name in flds:
             fld = self.resultset.getdesc(name)
-            typ = STRING
-            if fld.datatype in ("short", "int", "long", "float", "double",
-                                "floatComplex", "doubleComplex", "boolean"):
-                typ = NUMBER
-            elif fld.datatype in "char unicodeChar unsignedByte".split():
-                typ = STRING
-
-            out.append((name, typ))
+            out.append((name, _type_code(fld.datatype)))
 
         return tuple(out)
 
@@ -198,14 +610,8 @@ class Cursor(Iter):
             The response is a tuple wherein each element is the value of the
             corresponding table field.
         """
-        try:
-            rec = self.next()
-            out = []
-            for name in self.resultset.fieldnames:
-                out.append(rec[name])
-            return out
-        except StopIteration:
-            return None
+        rows = self._fetch(1)
+        return rows[0] if rows else None
 
     def fetchmany(self, size=None):
         """Fetch the next block of rows from the query result.
@@ -224,10 +630,7 @@ class Cursor(Iter):
         """
         if not size:
             size = self.arraysize
-        out = []
-        for _ in range(size):
-            out.append(self.fetchone())
-        return out
+        return self._fetch(size)
 
     def fetchall(self):
         """Fetch all remaining rows from the result set.
@@ -239,9 +642,19 @@ class Cursor(Iter):
             no more rows are available.  If a DictCursor is used then the
             output consists of a list of dictionaries, one per row.
         """
+        return self._fetch(self._rowcount - self.pos)
+
+    def _fetch(self, count):
+        # take the rows column-wise from the results table rather than
+        # creating a record per row
+        if count < 1:
+            return []
+
         out = []
-        for _ in range(self._rowcount - self.pos):
-            out.append(self.fetchone())
+        for batch in self.resultset.iter_batches(count, start=self.pos):
+            out = _rows(batch.values())
+            break
+        self.pos += len(out)
         return out
 
     def scroll(self, value, mode="relative"):
@@ -0,0 +1,451 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Downloading datasets: resumable transfers of single datasets and the
+datasets behind many records concurrently.
+"""
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+from time import sleep
+from urllib.parse import urlparse
+
+import requests
+
+from .exceptions import DALServiceError
+from ..utils.cache import make_cache_key
+
+__all__ = ["download_datasets", "download_resumable", "fetch_to_cache"]
+
+DEFAULT_BUFSIZE = 524288
+
+# the seconds to wait before the n-th retry of a failed transfer are
+# RETRY_DELAY * n
+RETRY_DELAY = 1.0
+
+# HTTP status codes worth retrying a transfer for
+_TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+
+_CONTENT_RANGE = re.compile(r"bytes\s+(\d+)-(\d+)/(\d+|\*)")
+
+
+def write_atomically(inp, path, *, bufsize=None):
+    """
+    copy the binary stream ``inp`` to ``path`` through a temporary file in
+    the same directory, such that ``path`` only ever holds complete data.
+
+    Returns the number of bytes written.
+    """
+    fd, tmppath = tempfile.mkstemp(
+        dir=os.path.dirname(path) or ".",
+        prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            shutil.copyfileobj(inp, out, bufsize or DEFAULT_BUFSIZE)
+            size = out.tell()
+        os.replace(tmppath, path)
+    except BaseException:
+        try:
+            os.remove(tmppath)
+        except OSError:
+            pass
+        raise
+    return size
+
+
+class _TransientError(Exception):
+    pass
+
+
+def _read_partmeta(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _transfer(session, url, partpath, metapath, *, timeout, bufsize):
+    # one attempt to complete partpath; returns the final size
+    meta = _read_partmeta(metapath)
+    offset = 0
+    if meta and meta.get("url") == url and os.path.exists(partpath):
+        offset = os.path.getsize(partpath)
+    else:
+        _remove(partpath, metapath)
+
+    # byte offsets only work on the undecoded data
+    headers = {"Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = "bytes={}-".format(offset)
+        validator = meta.get("etag") or meta.get("last_modified")
+        if validator:
+            headers["If-Range"] = validator
+
+    try:
+        response = session.get(
+            url, stream=True, timeout=timeout, headers=headers)
+    except (requests.ConnectionError, requests.Timeout) as ex:
+        raise _TransientError(str(ex)) from ex
+
+    with response:
+        if response.status_code == 416 and offset:
+            # the part file may already be complete ("bytes */<size>")
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total == str(offset):
+                return offset
+            _remove(partpath, metapath)
+            raise _TransientError("requested range not satisfiable")
+
+        try:
+            response.raise_for_status()
+        except requests.HTTPError as ex:
+            if response.status_code in _TRANSIENT_STATUS:
+                raise _TransientError(str(ex)) from ex
+            raise
+
+        total = None
+        if response.status_code == 206:
+            match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+            if not match or int(match.group(1)) != offset:
+                _remove(partpath, metapath)
+                raise _TransientError("unexpected Content-Range")
+            if match.group(3) != "*":
+                total = int(match.group(3))
+            mode = "ab"
+        else:
+            # the server sent everything, e.g., because it ignores ranges
+            # or the dataset has changed
+            offset = 0
+            if "Content-Length" in response.headers:
+                total = int(response.headers["Content-Length"])
+            mode = "wb"
+
+        meta = {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")}
+        if meta["etag"] or meta["last_modified"]:
+            with open(metapath, "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        else:
+            # without validators, we cannot safely resume
+            _remove(metapath)
+
+        try:
+            with open(partpath, mode) as out:
+                for chunk in response.iter_content(bufsize):
+                    out.write(chunk)
+                size = out.tell()
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as ex:
+            raise _TransientError(str(ex)) from ex
+
+    if total is not None and size != total:
+        raise _TransientError(
+            "incomplete transfer: got {} of {} bytes".format(size, total))
+    return size
+
+
+def download_resumable(
+        session, url, path, *, timeout=None, bufsize=None, retries=3):
+    """
+    download ``url`` to ``path``, resuming interrupted transfers.
+
+    The data is written to ``path + ".part"``, which is renamed to ``path``
+    once its size matches what the server announced.  If a part file from
+    an earlier attempt exists, only the rest is requested using an HTTP
+    ``Range`` request, guarded by the ETag or Last-Modified date of the
+    earlier response; if the server does not honour the range or the
+    dataset has changed, the download starts over.  Connection errors,
+    timeouts, truncated transfers and transient HTTP errors (5xx, 408, 429)
+    are retried up to ``retries`` times, continuing where the transfer
+    broke off.
+
+    Returns
+    -------
+    int
+        the size of the file
+
+    Raises
+    ------
+    DALServiceError
+        if the dataset cannot be retrieved
+    """
+    partpath = path + ".part"
+    metapath = partpath + ".json"
+    bufsize = bufsize or DEFAULT_BUFSIZE
+
+    attempt = 0
+    while True:
+        try:
+            size = _transfer(
+                session, url, partpath, metapath,
+                timeout=timeout, bufsize=bufsize)
+            break
+        except _TransientError as ex:
+            attempt += 1
+            if attempt > retries:
+                if isinstance(ex.__cause__, requests.RequestException):
+                    raise DALServiceError.from_except(ex.__cause__, url)
+                raise DALServiceError(str(ex), url=url)
+            sleep(RETRY_DELAY * attempt)
+        except requests.RequestException as ex:
+            raise DALServiceError.from_except(ex, url)
+
+    os.replace(partpath, path)
+    _remove(metapath)
+    return size
+
+
+def fetch_to_cache(
+        cache, session, url, *, timeout=None, bufsize=None, overflow=None):
+    """
+    make sure the dataset at ``url`` is in ``cache`` and return the path of
+    the cached file.
+
+    Entries are keyed by the URL.  An existing entry is revalidated with
+    the server if it was stored with an ETag or Last-Modified date, using
+    a conditional request; it is downloaded again if the server sends a
+    new version.  Entries without such validators are used as they are.
+
+    Datasets larger than the cache's ``max_size`` are not cached.  If the
+    server does not announce their size, this is noticed while writing,
+    and writing to the cache stops there.
+
+    Parameters
+    ----------
+    cache : `~pyvo.utils.cache.DiskCache`
+        the dataset cache
+    session : `requests.Session`
+        the session to make the request with
+    url : str
+        the URL of the dataset
+    timeout : float
+        the timeout for the request
+    bufsize : int
+        a buffer size in bytes for copying the data to disk
+    overflow : file
+        a writable binary file.  If given, a dataset too large for the
+        cache is written there in full instead, so that it need not be
+        downloaded again.
+
+    Returns
+    -------
+    str or None
+        the path of the cached file, or None if the dataset is too large
+        for the cache
+
+    Raises
+    ------
+    DALServiceError
+        if the dataset cannot be retrieved
+    """
+    key = make_cache_key("dataset", url)
+    found = cache.lookup(key)
+    headers = {}
+    if found is not None:
+        path, meta = found
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        elif meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        else:
+            return path
+
+    try:
+        response = session.get(
+            url, stream=True, timeout=timeout, headers=headers)
+        response.raise_for_status()
+    except requests.RequestException as ex:
+        raise DALServiceError.from_except(ex, url)
+
+    with response:
+        if response.status_code == 304 and found is not None:
+            return found[0]
+
+        chunks = response.iter_content(bufsize or DEFAULT_BUFSIZE)
+        try:
+            length = response.headers.get("Content-Length")
+            if (cache.max_size is not None and length
+                    and int(length) > cache.max_size):
+                _copy_chunks(chunks, overflow)
+                return None
+
+            with cache.writer(
+                    key, url=url,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified")
+            ) as writer:
+                for chunk in chunks:
+                    if (cache.max_size is not None
+                            and writer.tell() + len(chunk) > cache.max_size):
+                        # hand over what was read rather than fetching it
+                        # again; the entry is discarded
+                        if overflow is not None:
+                            writer.copy_to(overflow)
+                            overflow.write(chunk)
+                            _copy_chunks(chunks, overflow)
+                        writer.close()
+                        return None
+                    writer.write(chunk)
+        except requests.RequestException as ex:
+            raise DALServiceError.from_except(ex, url)
+
+    found = cache.lookup(key)
+    return found[0] if found else None
+
+
+def _copy_chunks(chunks, out):
+    if out is None:
+        return
+    for chunk in chunks:
+        out.write(chunk)
+
+
+def expected_size(record):
+    """
+    return the size in bytes a record announces for its dataset and
+    whether that size is exact, or ``(None, False)`` if it gives none.
+
+    ``content_length`` (datalink) is exact, ``access_estsize`` (ObsCore,
+    in kB) is an estimate.
+    """
+    for name, factor, exact in (
+            ("content_length", 1, True), ("access_estsize", 1024, False)):
+        try:
+            value = record.get(name)
+            if value is not None and int(value) > 0:
+                return int(value) * factor, exact
+        except (TypeError, ValueError):
+            continue
+    return None, False
+
+
+def _is_complete(path, record):
+    # files are only ever renamed into place once complete, so only an
+    # exact size that does not match marks them as outdated
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+
+    expected, exact = expected_size(record)
+    return not exact or size == expected
+
+
+def _make_filenames(records, directory):
+    filenames, seen = [], {}
+    for record in records:
+        base = record.suggest_dataset_basename().replace(os.sep, "_")
+        if os.altsep:
+            base = base.replace(os.altsep, "_")
+        ext = record.suggest_extension(default="dat")
+
+        name = "{}.{}".format(base, ext)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        if count:
+            name = "{}-{}.{}".format(base, count, ext)
+        filenames.append(os.path.join(directory, name))
+    return filenames
+
+
+def _fail(entry, ex):
+    entry["status"] = "failed"
+    entry["error"] = "{}: {}".format(type(ex).__name__, ex)
+
+
+def download_datasets(
+        records, directory, *, workers=8, max_per_host=4, timeout=None,
+        bufsize=None, overwrite=False, manifest=None):
+    """
+    download the datasets of ``records`` into ``directory`` concurrently.
+
+    See `pyvo.dal.DALResults.cachedatasets` for the parameters.
+
+    Returns
+    -------
+    list of dict
+        the manifest entries, in the order of ``records``
+    """
+    records = list(records)
+    os.makedirs(directory, exist_ok=True)
+    filenames = _make_filenames(records, directory)
+
+    entries = []
+    queues = OrderedDict()  # the indexes of the records to fetch, by host
+    for index, (record, filename) in enumerate(zip(records, filenames)):
+        entry = {
+            "index": index,
+            "url": None,
+            "filename": filename,
+            "status": None,
+            "size": None,
+            "error": None,
+        }
+        entries.append(entry)
+        try:
+            url = entry["url"] = record.getdataurl()
+            if not url:
+                entry["status"] = "nourl"
+            elif not overwrite and _is_complete(filename, record):
+                entry["status"] = "skipped"
+                entry["size"] = os.path.getsize(filename)
+            else:
+                queues.setdefault(urlparse(url).netloc, deque()).append(index)
+        except Exception as ex:
+            _fail(entry, ex)
+
+    def fetch(index):
+        entry = entries[index]
+        try:
+            records[index].cachedataset(
+                filename=filenames[index], timeout=timeout, bufsize=bufsize)
+            entry["size"] = os.path.getsize(filenames[index])
+            entry["status"] = "downloaded"
+        except Exception as ex:
+            _fail(entry, ex)
+
+    # downloads are only handed to the pool when their host has a free
+    # slot, so no worker waits for a host
+    running = {}
+    per_host = Counter()
+
+    def submit_ready():
+        submitted = True
+        while submitted and len(running) < workers:
+            submitted = False
+            for host, queue in queues.items():
+                if (queue and per_host[host] < max_per_host
+                        and len(running) < workers):
+                    running[executor.submit(fetch, queue.popleft())] = host
+                    per_host[host] += 1
+                    submitted = True
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                per_host[running.pop(future)] -= 1
+            submit_ready()
+
+    if manifest:
+        write_atomically(
+            io.BytesIO(json.dumps(entries, indent=1).encode("utf-8")),
+            os.path.join(directory, manifest))
+
+    return entries
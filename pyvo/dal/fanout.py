@@ -0,0 +1,203 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Running the same search against many DAL services concurrently.
+"""
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+import copy
+from time import monotonic
+
+from .exceptions import DALServiceError
+
+__all__ = ["search", "SearchFailure"]
+
+
+class SearchFailure:
+    """
+    The outcome of a service search that did not produce results.
+
+    Instances are returned in place of a results object by `search`, such
+    that a failing service does not abort the whole batch.
+    """
+
+    def __init__(self, service, error):
+        """
+        Parameters
+        ----------
+        service : `~pyvo.dal.DALService`
+            the service that failed
+        error : Exception
+            the exception raised by the search, or a
+            `~pyvo.dal.DALServiceError` if the search timed out.
+        """
+        self._service = service
+        self._error = error
+
+    def __repr__(self):
+        return "<SearchFailure {}: {!r}>".format(
+            getattr(self._service, "baseurl", self._service), self._error)
+
+    @property
+    def service(self):
+        """
+        the service that failed
+        """
+        return self._service
+
+    @property
+    def error(self):
+        """
+        the exception describing the failure
+        """
+        return self._error
+
+    def raise_error(self):
+        """
+        raise the exception describing the failure
+        """
+        raise self._error
+
+
+class _DeadlineSession:
+    """
+    A proxy of a session that passes the time left until ``deadline`` as
+    the timeout of each request made without one.
+    """
+
+    def __init__(self, session, deadline):
+        self._session = session
+        self._deadline = deadline
+
+    def _with_timeout(self, kwargs):
+        if kwargs.get("timeout") is None:
+            # a timeout of 0 would mean no timeout to some adapters
+            kwargs["timeout"] = max(self._deadline - monotonic(), 1e-3)
+        return kwargs
+
+    def request(self, method, url, **kwargs):
+        return self._session.request(method, url, **self._with_timeout(kwargs))
+
+    def get(self, url, **kwargs):
+        return self._session.get(url, **self._with_timeout(kwargs))
+
+    def post(self, url, **kwargs):
+        return self._session.post(url, **self._with_timeout(kwargs))
+
+    def put(self, url, **kwargs):
+        return self._session.put(url, **self._with_timeout(kwargs))
+
+    def delete(self, url, **kwargs):
+        return self._session.delete(url, **self._with_timeout(kwargs))
+
+    def head(self, url, **kwargs):
+        return self._session.head(url, **self._with_timeout(kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+def search(services, *, max_workers=8, timeout=None, **keywords):
+    """
+    send the same search query to several services concurrently.
+
+    The ``search()`` methods of the services are run on a bounded thread
+    pool, and their outcomes are yielded as they complete, i.e., not
+    necessarily in the order of ``services``.
+
+    Parameters
+    ----------
+    services : iterable of `~pyvo.dal.DALService`
+        the services to query, e.g. ``SCSService``, ``SIA2Service``,
+        ``SSAService`` or ``TAPService`` instances.  As the same keywords
+        are passed to all of them, they should normally be of the same type.
+    max_workers : int
+        the maximal number of searches running at the same time.
+    timeout : float
+        the maximal time in seconds a single search may take, counted from
+        when it is submitted, i.e., including the time it waits for a free
+        worker.  It is also passed as the timeout of the search's HTTP
+        requests, so hung services release their workers; requests made
+        later through the results are not bounded by it.  Searches
+        exceeding it are reported as failures, and their results are
+        discarded.
+    **keywords :
+        the search parameters passed to each service's ``search()``
+
+    Yields
+    ------
+    tuple
+        pairs of the service and the outcome of its search, which is
+        either a `~pyvo.dal.DALResults` instance or a `SearchFailure`.
+
+    Examples
+    --------
+    >>> for service, result in search(services, pos=pos, radius=0.1):  # doctest: +SKIP
+    ...     if not isinstance(result, SearchFailure):
+    ...         print(service.baseurl, len(result))
+    """
+    services = list(services)
+    if not services:
+        return
+
+    submitted = {}
+
+    def deadline(index):
+        return submitted[index] + timeout
+
+    def run(index):
+        service = services[index]
+        session = getattr(service, "_session", None)
+        if timeout is None or not session:
+            return service.search(**keywords)
+
+        # bound the HTTP requests of the search by the deadline, so a hung
+        # service does not keep its worker
+        service = copy.copy(service)
+        service._session = _DeadlineSession(session, deadline(index))
+        result = service.search(**keywords)
+        # later requests through the results (datasets, datalinks) are
+        # not part of the search
+        if getattr(result, "_session", None) is service._session:
+            result._session = session
+        return result
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {}
+    try:
+        for index in range(len(services)):
+            submitted[index] = monotonic()
+            pending[executor.submit(run, index)] = index
+
+        while pending:
+            wait_timeout = None
+            if timeout is not None:
+                wait_timeout = max(0, min(
+                    deadline(index) for index in pending.values()) - monotonic())
+
+            done, _ = wait(pending, timeout=wait_timeout,
+                           return_when=FIRST_COMPLETED)
+
+            for future in done:
+                service = services[pending.pop(future)]
+                try:
+                    outcome = future.result()
+                except Exception as ex:
+                    outcome = SearchFailure(service, ex)
+                yield service, outcome
+
+            if timeout is None:
+                continue
+
+            now = monotonic()
+            for future, index in list(pending.items()):
+                if now >= deadline(index):
+                    # searches still waiting for a worker are not started
+                    future.cancel()
+                    del pending[future]
+                    service = services[index]
+                    yield service, SearchFailure(service, DALServiceError(
+                        "Search timed out after {} seconds".format(timeout),
+                        url=getattr(service, "baseurl", None)))
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
@@ -4,9 +4,11 @@ A module for parsing and working with mimetypes
 """
 
 import mimetypes
+import os
 from email.message import Message
+import tempfile
 
-from astropy.io.fits import HDUList
+from astropy.io import fits
 
 from ..utils.http import use_session
 
@@ -53,7 +55,8 @@ def mime2extension(mimetype, default=None):
     return ext
 
 
-def mime_object_maker(url, mimetype, *, session=None):
+def mime_object_maker(
+        url, mimetype, *, session=None, lazy=False, cache=None, timeout=None):
     """
     return a data object suitable for the mimetype given.
     this will either return a astropy fits object or a pyvo DALResults object,
@@ -67,6 +70,18 @@ def mime_object_maker(url, mimetype, *, session=None):
         the content mimetype
     session : object
         optional session to use for network requests
+    lazy : bool
+        if True, FITS files are opened for reading through HTTP range
+        requests: the headers are read when the HDUs are accessed and
+        the data of an HDU when it is used (see
+        `~pyvo.dal.remotefits.open_remote_fits`).
+    cache : `~pyvo.utils.cache.DiskCache`
+        if given, FITS files and images are downloaded to this cache (or
+        taken from it if they are still current), and FITS files are
+        opened memory-mapped from there.  Lazy reads bypass the cache.
+        Datasets too large for the cache are kept in a temporary file.
+    timeout : float
+        the timeout in seconds for the requests downloading the data
 
     Raises
     ------
@@ -74,7 +89,7 @@ def mime_object_maker(url, mimetype, *, session=None):
     """
     if not mimetype:
         raise ValueError('mimetype required')
-    session = use_session(session)
+    session = use_session(session, url=url)
     msg = Message()
     msg['content-type'] = mimetype
     pp = msg.get_params()
@@ -85,16 +100,42 @@ def mime_object_maker(url, mimetype, *, session=None):
         raise ValueError("Can't parse mimetype \"{}\"".format(full_type))
 
     if mtype[0] == 'text':
-        return session.get(url).text
-
-    if mtype[1] == 'fits' or mtype[1] == 'x-fits':
-        response = session.get(url)
-        return HDUList.fromstring(response.content)
+        return session.get(url, timeout=timeout).text
+
+    is_fits = mtype[1] == 'fits' or mtype[1] == 'x-fits'
+    if is_fits and lazy:
+        from .remotefits import open_remote_fits
+        return open_remote_fits(session, url, timeout=timeout)
+
+    path = overflow = None
+    if cache and (is_fits or mtype[0] == 'image'):
+        from .download import fetch_to_cache
+        with tempfile.TemporaryFile() as tmp:
+            path = fetch_to_cache(
+                cache, session, url, timeout=timeout, overflow=tmp)
+            if not path:
+                # too large for the cache; the data is in the temporary
+                # file, which is read through a read-only handle of its own
+                tmp.flush()
+                overflow = os.fdopen(os.dup(tmp.fileno()), 'rb')
+                overflow.seek(0)
+
+    if is_fits:
+        if path:
+            return fits.open(path, memmap=True)
+        if overflow:
+            return fits.open(overflow)
+        response = session.get(url, timeout=timeout)
+        return fits.HDUList.fromstring(response.content)
 
     if mtype[0] == 'image':
         from PIL import Image
         from io import BytesIO
-        response = session.get(url)
+        if path:
+            return Image.open(path)
+        if overflow:
+            return Image.open(overflow)
+        response = session.get(url, timeout=timeout)
         bio = BytesIO(response.content)
         return Image.open(bio)
 
@@ -0,0 +1,450 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Running TAP queries too large for a single request in partitions.
+
+The query is run once per partition, the partitions concurrently, and the
+parts are put together into a single result.  A partition is either an ADQL
+condition selecting part of the rows, or a chunk of the rows of an uploaded
+table.  Partitions that still overflow the output limit are split in halves
+and run again.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import warnings
+
+import numpy as np
+
+from astropy.table import Table
+
+from .exceptions import DALOverflowWarning, DALQueryError, DALServiceError
+from .fanout import SearchFailure
+
+__all__ = [
+    "RangePartition", "NullPartition", "value_partitions",
+    "healpix_partitions", "run_partitioned", "run_upload_join"]
+
+#: the placeholder for the partition condition in partitioned queries
+PLACEHOLDER = "{partition}"
+
+#: the default number of rows of an uploaded table per query
+DEFAULT_CHUNK_ROWS = 50000
+
+
+class RangePartition:
+    """
+    the rows of a query in which ``column`` lies between ``lower``
+    (inclusive) and ``upper`` (exclusive, unless ``inclusive`` is set).
+
+    Parameters
+    ----------
+    column : str
+        the name of the column, preferably an indexed one
+    lower : int or float
+        the lower bound
+    upper : int or float
+        the upper bound
+    inclusive : bool
+        whether ``upper`` belongs to the partition
+    """
+
+    def __init__(self, column, lower, upper, *, inclusive=False):
+        self.column = column
+        self.lower = lower
+        self.upper = upper
+        self.inclusive = inclusive
+
+    def __repr__(self):
+        return "<RangePartition {}>".format(self.condition)
+
+    def __str__(self):
+        return self.condition
+
+    @property
+    def condition(self):
+        """
+        the ADQL condition selecting the rows of this partition
+        """
+        return "{column} >= {lower} AND {column} {op} {upper}".format(
+            column=self.column, lower=self.lower, upper=self.upper,
+            op="<=" if self.inclusive else "<")
+
+    def split(self):
+        """
+        return the two halves of this partition, or None if it cannot be
+        split any further.
+        """
+        if isinstance(self.lower, (int, np.integer)) and isinstance(
+                self.upper, (int, np.integer)):
+            middle = (self.lower + self.upper + int(self.inclusive)) // 2
+            if middle <= self.lower:
+                return None
+        else:
+            middle = (self.lower + self.upper) / 2
+            if not self.lower < middle < self.upper:
+                return None
+
+        return [
+            RangePartition(self.column, self.lower, middle),
+            RangePartition(
+                self.column, middle, self.upper, inclusive=self.inclusive)]
+
+
+class NullPartition:
+    """
+    the rows of a query in which ``column`` is NULL, which no range of
+    values selects.
+
+    Parameters
+    ----------
+    column : str
+        the name of the column
+    """
+
+    def __init__(self, column):
+        self.column = column
+
+    def __repr__(self):
+        return "<NullPartition {}>".format(self.condition)
+
+    def __str__(self):
+        return self.condition
+
+    @property
+    def condition(self):
+        """
+        the ADQL condition selecting the rows of this partition
+        """
+        return "{} IS NULL".format(self.column)
+
+    def split(self):
+        """
+        return None, as this partition cannot be split.
+        """
+        return None
+
+
+def _with_nulls(partitions, column, nulls):
+    if nulls:
+        partitions.append(NullPartition(column))
+    return partitions
+
+
+def value_partitions(column, lower, upper, count, *, nulls=True):
+    """
+    partition the values of ``column`` from ``lower`` to ``upper``
+    (inclusive) into ``count`` ranges of equal width.
+
+    Integer bounds give ranges with integer bounds.  Unless ``nulls`` is
+    False, a `NullPartition` for the rows without a value comes last.
+
+    Returns
+    -------
+    list of `RangePartition` and `NullPartition`
+    """
+    if count < 1 or upper < lower:
+        raise ValueError("cannot make {} partitions from {} to {}".format(
+            count, lower, upper))
+
+    if isinstance(lower, (int, np.integer)) and isinstance(
+            upper, (int, np.integer)):
+        bounds = [lower + (upper + 1 - lower) * index // count
+                  for index in range(count + 1)]
+        # ranges narrower than one value would be empty
+        bounds = sorted(set(bounds))
+        return _with_nulls(
+            [RangePartition(column, start, stop)
+             for start, stop in zip(bounds, bounds[1:])], column, nulls)
+
+    bounds = np.linspace(lower, upper, count + 1).tolist()
+    partitions = [RangePartition(column, start, stop)
+                  for start, stop in zip(bounds, bounds[1:])]
+    partitions[-1].inclusive = True
+    return _with_nulls(partitions, column, nulls)
+
+
+def healpix_partitions(column, order, *, column_order, scale=1, nulls=True):
+    """
+    partition a query into the HEALPix pixels of ``order``, given a column
+    with the (nested) HEALPix index of a finer order ``column_order``.
+
+    Parameters
+    ----------
+    column : str
+        the name of the column containing the HEALPix index
+    order : int
+        the order of the partitions; there will be ``12 * 4**order``
+    column_order : int
+        the HEALPix order of the indices in ``column``
+    scale : int
+        a factor by which the indices are multiplied in ``column``; for
+        instance, Gaia's ``source_id`` contains the index of order 12 times
+        ``2**35``.
+    nulls : bool
+        whether to add a `NullPartition` for the rows without an index
+        after the pixels
+
+    Returns
+    -------
+    list of `RangePartition` and `NullPartition`
+    """
+    if not 0 <= order <= column_order:
+        raise ValueError("the order must be between 0 and {}".format(
+            column_order))
+
+    step = 4 ** (column_order - order) * scale
+    return _with_nulls(
+        [RangePartition(column, pixel * step, (pixel + 1) * step)
+         for pixel in range(12 * 4 ** order)], column, nulls)
+
+
+def _condition(partition):
+    if isinstance(partition, str):
+        return partition
+    return partition.condition
+
+
+def _split(partition):
+    # plain ADQL conditions cannot be split
+    if isinstance(partition, str):
+        return None
+    return partition.split()
+
+
+def _is_overflow(votable):
+    status = None
+    for info in votable.iter_info():
+        if info.name.lower() == "query_status":
+            status = info.value
+    return (status or "").lower() == "overflow"
+
+
+def _merge(parts, overflow):
+    # put the rows of all parts into the results table of the first one
+    # such that the remaining metadata (e.g., datalink) is kept
+    votable = parts[0].votable
+    parts[0].resultstable.array = np.ma.concatenate(
+        [part.resultstable.array for part in parts])
+
+    for info in votable.iter_info():
+        if info.name.lower() == "query_status":
+            info.value = "OVERFLOW" if overflow else "OK"
+    return votable
+
+
+class _RowChunk:
+    """
+    the rows ``start`` to ``stop`` of a table to upload, with their row
+    numbers added in ``column``.
+    """
+
+    def __init__(self, table, start, stop, column):
+        self._table = table
+        self.start = start
+        self.stop = stop
+        self.column = column
+
+    def __str__(self):
+        return "rows {} to {}".format(self.start, self.stop - 1)
+
+    @property
+    def table(self):
+        chunk = self._table[self.start:self.stop]
+        chunk[self.column] = np.arange(self.start, self.stop)
+        return chunk
+
+    def split(self):
+        if self.stop - self.start < 2:
+            return None
+        middle = (self.start + self.stop) // 2
+        return [_RowChunk(self._table, self.start, middle, self.column),
+                _RowChunk(self._table, middle, self.stop, self.column)]
+
+
+def _hardlimit(service, maxrec):
+    if maxrec is None:
+        try:
+            return service.hardlimit
+        except DALServiceError:
+            pass
+    return maxrec
+
+
+def _run_parts(service, parts, make_params, *, mode, max_workers, maxrec,
+               retries, **keywords):
+    # runs the query of each part, splitting the parts that overflow and
+    # retrying failures other than query errors; returns the results in the
+    # order of the parts and the parts that overflowed but cannot be split
+    if mode not in ("sync", "async"):
+        raise ValueError("mode must be sync or async")
+
+    # parts are identified by their position, with halves of split parts
+    # appending 0 or 1, so sorting them restores the order
+    pending = [((index,), part, 0) for index, part in enumerate(parts)]
+    done = []
+    truncated = []
+
+    while pending:
+        outcomes = _run_queries(
+            service, [make_params(part) for _, part, _ in pending],
+            mode=mode, max_workers=max_workers, maxrec=maxrec, **keywords)
+
+        rerun = []
+        for (key, part, failures), outcome in zip(pending, outcomes):
+            if isinstance(outcome, SearchFailure):
+                if (failures >= retries
+                        or isinstance(outcome.error, DALQueryError)):
+                    outcome.raise_error()
+                rerun.append((key, part, failures + 1))
+                continue
+
+            if _is_overflow(outcome.votable):
+                halves = _split(part)
+                if halves:
+                    rerun.extend(
+                        (key + (index,), half, 0)
+                        for index, half in enumerate(halves))
+                    continue
+                truncated.append(part)
+            done.append((key, outcome))
+        pending = rerun
+
+    if truncated:
+        warnings.warn(
+            "Partial result set. Parts exceeding the output limit: {}".format(
+                ", ".join(str(part) for part in truncated)),
+            category=DALOverflowWarning)
+
+    done.sort(key=lambda item: item[0])
+    return [outcome for _, outcome in done], truncated
+
+
+def run_partitioned(
+        service, query, partitions, *, mode="sync", max_workers=4,
+        retries=2, maxrec=None, **keywords):
+    """
+    run a query for each of ``partitions`` on ``service`` and put the
+    results together.
+
+    See `pyvo.dal.TAPService.run_partitioned` for the parameters.
+
+    Returns
+    -------
+    `~pyvo.dal.TAPResults`
+    """
+    from .tap import TAPResults
+
+    if PLACEHOLDER not in query:
+        raise ValueError(
+            "the query has no {} placeholder for the partition condition"
+            .format(PLACEHOLDER))
+    partitions = list(partitions)
+    if not partitions:
+        raise ValueError("no partitions to run the query for")
+
+    def make_params(partition):
+        return {"query": query.replace(
+            PLACEHOLDER, "({})".format(_condition(partition)))}
+
+    parts, truncated = _run_parts(
+        service, partitions, make_params, mode=mode, max_workers=max_workers,
+        maxrec=_hardlimit(service, maxrec), retries=retries, **keywords)
+    return TAPResults(
+        _merge(parts, truncated), url=parts[0].queryurl,
+        session=service._session)
+
+
+def run_upload_join(
+        service, query, uploads, *, chunk_rows=DEFAULT_CHUNK_ROWS,
+        workers=4, split=None, index_column="pyvo_row", mode="sync",
+        retries=2, maxrec=None, **keywords):
+    """
+    run ``query`` on ``service`` for chunks of the rows of an uploaded
+    table and put the results together.
+
+    See `pyvo.dal.TAPService.run_upload_join` for the parameters.
+
+    Returns
+    -------
+    `~pyvo.dal.TAPResults`
+    """
+    from .query import DALResults
+    from .tap import TAPResults
+
+    if split is None:
+        tables = [name for name, content in uploads.items()
+                  if isinstance(content, (Table, DALResults))]
+        if len(tables) != 1:
+            raise ValueError(
+                "pass the name of the upload to split in chunks as split")
+        split = tables[0]
+
+    table = uploads[split]
+    if isinstance(table, DALResults):
+        table = table.to_table()
+    if not isinstance(table, Table):
+        raise ValueError("only table uploads can be split in chunks")
+    if index_column in table.colnames:
+        raise ValueError("the upload already has a column {}".format(
+            index_column))
+
+    # an empty table still makes one (empty) chunk
+    chunks = [
+        _RowChunk(table, start, min(start + chunk_rows, len(table)),
+                  index_column)
+        for start in range(0, max(len(table), 1), chunk_rows)]
+
+    def make_params(chunk):
+        return {"query": query, "uploads": {**uploads, split: chunk.table}}
+
+    parts, truncated = _run_parts(
+        service, chunks, make_params, mode=mode, max_workers=workers,
+        maxrec=_hardlimit(service, maxrec), retries=retries, **keywords)
+
+    votable = _merge(parts, truncated)
+    result_table = parts[0].resultstable
+    names = [field.name.lower() for field in result_table.fields]
+    if index_column.lower() in names:
+        # restore the input order within the chunks, too
+        array = result_table.array
+        column = array.dtype.names[names.index(index_column.lower())]
+        result_table.array = array[
+            np.argsort(array[column].data, kind="stable")]
+
+    return TAPResults(votable, url=parts[0].queryurl, session=service._session)
+
+
+def _run_queries(service, params, *, mode, max_workers, maxrec, **keywords):
+    # returns a TAPResults or SearchFailure for each dictionary of query
+    # parameters, in order; overflow warnings are left to the caller
+    from .tap import TAPResults
+
+    if mode == "async":
+        outcomes = [None] * len(params)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DALOverflowWarning)
+            for index, outcome in service.run_async_batch(
+                    params, max_running=max_workers, maxrec=maxrec,
+                    **keywords):
+                outcomes[index] = outcome
+        return outcomes
+
+    def run(query_params):
+        # the votables are turned into results in the calling thread, as
+        # warning filters are not thread-safe
+        tapquery = service.create_query(
+            maxrec=maxrec, **query_params, **keywords)
+        return tapquery.execute_votable(), tapquery.queryurl
+
+    outcomes = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run, query_params)
+                   for query_params in params]
+        for future in futures:
+            try:
+                votable, url = future.result()
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore", DALOverflowWarning)
+                    outcomes.append(TAPResults(
+                        votable, url=url, session=service._session))
+            except Exception as ex:
+                outcomes.append(SearchFailure(service, ex))
+    return outcomes
@@ -20,15 +20,18 @@ other externally defined table.  In this case there is no VO defined
 standard data model.  Usually the field names are used to uniquely
 identify table columns.
 """
-__all__ = ["DALService", "DALQuery", "DALResults", "Record"]
+__all__ = ["DALService", "DALQuery", "DALResults", "Record",
+           "enable_response_cache", "disable_response_cache",
+           "enable_dataset_cache", "disable_dataset_cache"]
 
+import hashlib
+import io
+import numpy as np
 import os
-import shutil
 import re
 import requests
 from collections.abc import Mapping
 
-import collections
 
 from warnings import warn
 
@@ -37,15 +40,103 @@ from astropy.io.votable import parse as votableparse
 from astropy.io.votable.ucd import parse_ucd
 from astropy.utils.exceptions import AstropyDeprecationWarning
 
+from .download import download_datasets, download_resumable
 from .mimetype import mime_object_maker
+from .remotefits import read_remote_headers
+from .streaming import iter_votable_chunks, DEFAULT_CHUNK_SIZE
+from .uploads import (
+    iter_binary2_votable, iter_gzip, MultipartBody, VOTABLE_MIME,
+    DEFAULT_CHUNK_ROWS as DEFAULT_UPLOAD_CHUNK_ROWS,
+    DEFAULT_BLOCKSIZE as DEFAULT_UPLOAD_BLOCKSIZE)
 from .exceptions import (DALFormatError, DALServiceError, DALQueryError,
                          DALOverflowWarning)
 
 from .. import samp
 
+from ..utils.cache import DiskCache, make_cache_key
 from ..utils.decorators import stream_decode_content
 from ..utils.http import use_session
 
+# the response cache used by queries not configuring their own
+_response_cache = None
+
+# the cache for the datasets retrieved through Record.getdataobj
+_dataset_cache = None
+
+
+def enable_response_cache(directory, *, ttl=86400, max_size=2**30):
+    """
+    Cache the responses of DAL queries on disk.
+
+    Once enabled, queries with the same URL, parameters and uploads are
+    answered from the cache until the entry expires.  Queries can opt out
+    or force a refresh through their ``cache`` and ``cache_policy``
+    attributes.  Asynchronous TAP jobs are not cached.
+
+    Parameters
+    ----------
+    directory : str
+        the directory to keep the cached responses in
+    ttl : float
+        the time in seconds after which cached responses expire.
+        Pass None to never expire responses.
+    max_size : int
+        the maximal size of the cache in bytes.  Least recently used
+        responses are removed when it is exceeded.
+
+    Returns
+    -------
+    `~pyvo.utils.cache.DiskCache`
+        the response cache
+    """
+    global _response_cache
+    _response_cache = DiskCache(directory, ttl=ttl, max_size=max_size)
+    return _response_cache
+
+
+def disable_response_cache():
+    """
+    Stop caching DAL query responses.  Cached files are kept.
+    """
+    global _response_cache
+    _response_cache = None
+
+
+def enable_dataset_cache(directory, *, max_size=2**34):
+    """
+    Cache the datasets retrieved through `Record.getdataobj` on disk.
+
+    Once enabled, FITS files and images are downloaded to the cache and
+    taken from there on later calls for the same access URL, as long as
+    the server confirms (by their ETag or modification date) that they
+    have not changed.  Cached FITS files are opened memory-mapped, so large
+    images need not fit into memory.
+
+    Parameters
+    ----------
+    directory : str
+        the directory to keep the cached datasets in
+    max_size : int
+        the maximal size of the cache in bytes.  Least recently used
+        datasets are removed when it is exceeded.
+
+    Returns
+    -------
+    `~pyvo.utils.cache.DiskCache`
+        the dataset cache
+    """
+    global _dataset_cache
+    _dataset_cache = DiskCache(directory, max_size=max_size)
+    return _dataset_cache
+
+
+def disable_dataset_cache():
+    """
+    Stop caching datasets.  Cached files are kept.
+    """
+    global _dataset_cache
+    _dataset_cache = None
+
 
 class DALService:
     """
@@ -68,7 +159,7 @@ class DALService:
         """
         self._baseurl = baseurl
         self._capability_description = capability_description
-        self._session = use_session(session)
+        self._session = use_session(session, url=baseurl)
 
     @property
     def baseurl(self):
@@ -145,6 +236,16 @@ class DALQuery(dict):
 
     _ex = None
 
+    #: the `~pyvo.utils.cache.DiskCache` to serve responses from.  If None,
+    #: the cache set up by `enable_response_cache` (if any) is used; set
+    #: this to False to not cache this query.
+    cache = None
+
+    #: how to use the response cache: ``"use"`` serves cached responses,
+    #: ``"refresh"`` re-runs the query and replaces the cached response,
+    #: ``"bypass"`` neither reads nor writes the cache.
+    cache_policy = "use"
+
     def __init__(self, baseurl, *, session=None, **keywords):
         """
         initialize the query object with a baseurl
@@ -153,7 +254,7 @@ class DALQuery(dict):
             baseurl = baseurl.decode("utf-8")
 
         self._baseurl = baseurl.rstrip("?")
-        self._session = use_session(session)
+        self._session = use_session(session, url=self._baseurl)
 
         self.update({key.upper(): value for key, value in keywords.items()})
 
@@ -196,14 +297,49 @@ class DALQuery(dict):
             f.close()
         return out
 
-    @stream_decode_content
     def execute_stream(self, *, post=False):
         """
         Submit the query and return the raw response as a file stream.
 
+        If a response cache is in use (see `enable_response_cache` and
+        ``cache_policy``), the response is served from or written to it.
+
         No exceptions are raised here because non-2xx responses might still
         contain payload. They can be raised later by calling ``raise_if_error``
         """
+        cache = self.cache if self.cache is not None else _response_cache
+        if not cache or self.cache_policy == "bypass":
+            return self._execute_stream(post=post)
+
+        key = self._cache_key(post=post)
+        if key is None:
+            return self._execute_stream(post=post)
+
+        if self.cache_policy != "refresh":
+            cached = cache.open(key)
+            if cached is not None:
+                self._ex = None
+                return cached
+
+        stream = self._execute_stream(post=post)
+        if self._ex:
+            # don't cache error documents
+            return stream
+        return _CachingStream(stream, cache.writer(key, url=self.queryurl))
+
+    def _cache_key(self, *, post=False):
+        """
+        the key of this query's response in the response cache.
+
+        Subclasses sending more than the query parameters (e.g. uploads)
+        must add them here.  None means the query cannot be cached.
+        """
+        return make_cache_key(
+            "POST" if post else "GET", self.queryurl.rstrip("/"),
+            sorted((k, str(v)) for k, v in self.items()))
+
+    @stream_decode_content
+    def _execute_stream(self, *, post=False):
         response = self.submit(post=post)
 
         try:
@@ -254,12 +390,68 @@ class DALQuery(dict):
         DALFormatError
         DALQueryError
         """
+        stream = None
         try:
-            return votableparse(self.execute_stream(post=post).read)
+            stream = self.execute_stream(post=post)
+            _hold_commit(stream)
+            votable = votableparse(stream.read)
         except Exception as e:
+            if stream is not None:
+                stream.close()
             self.raise_if_error()
             raise DALFormatError(e, self.queryurl)
 
+        if _is_successful(votable):
+            _finish_stream(stream)
+        else:
+            # error and overflow documents are not cached
+            stream.close()
+        return votable
+
+    def execute_iter(self, *, chunk_size=DEFAULT_CHUNK_SIZE, post=False):
+        """
+        Submit the query and iterate over the rows of the result in chunks
+        while the response is being read.
+
+        Unlike `execute_votable`, this never holds the complete result in
+        memory.
+
+        Parameters
+        ----------
+        chunk_size : int
+            the number of rows per chunk
+        post : bool
+            whether to send the query as a POST request
+
+        Yields
+        ------
+        `astropy.io.votable.tree.TableElement`
+            table elements carrying the field metadata of the result table,
+            with the next ``chunk_size`` rows as a masked structured numpy
+            array in their ``array`` attribute.
+
+        Raises
+        ------
+        DALServiceError
+           for errors connecting to or communicating with the service
+        DALQueryError
+           for errors either in the input query syntax or
+           other user errors detected by the service
+        DALFormatError
+           for errors parsing the VOTable response
+        """
+        stream = self.execute_stream(post=post)
+        _hold_commit(stream)
+        try:
+            yield from _iter_stream_chunks(
+                stream, chunk_size=chunk_size, url=self.queryurl,
+                raise_if_error=self.raise_if_error)
+        except BaseException:
+            stream.close()
+            raise
+
+        _finish_stream(stream)
+
     def raise_if_error(self):
         """
         Raise if there was an error on http level.
@@ -277,6 +469,96 @@ class DALQuery(dict):
         return self.baseurl
 
 
+class _CachingStream:
+    """
+    a response stream that copies what is read from it into a cache entry.
+
+    The entry is only committed once the response has been read completely
+    and, with ``autocommit`` off, `finish` is called.
+    """
+
+    def __init__(self, raw, writer):
+        self._raw = raw
+        self._writer = writer
+        self.autocommit = True
+
+    def read(self, size=-1, **kwargs):
+        data = self._raw.read(size, **kwargs)
+        if data:
+            self._writer.write(data)
+        if self.autocommit and (not data or size is None or size < 0):
+            self._writer.commit()
+        return data
+
+    def finish(self):
+        """
+        read what the consumer left unread, commit the cache entry and
+        close the stream.
+        """
+        while self.read(65536):
+            pass
+        self._writer.commit()
+        self.close()
+
+    def close(self):
+        self._writer.close()
+        self._raw.close()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+
+def _iter_stream_chunks(stream, *, chunk_size, url, raise_if_error=None):
+    # translate parse errors like execute_votable does
+    chunks = iter_votable_chunks(stream.read, chunk_size=chunk_size, url=url)
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        except DALQueryError:
+            raise
+        except Exception as e:
+            if raise_if_error:
+                raise_if_error()
+            raise DALFormatError(e, url)
+        yield chunk
+
+
+def _hold_commit(stream):
+    # responses parsed here are only cached once they have been checked
+    if isinstance(stream, _CachingStream):
+        stream.autocommit = False
+
+
+def _is_successful(votable):
+    # whether no QUERY_STATUS (or the cone search Error INFO) reports an
+    # error or an overflow anywhere in the document
+    def infos(element):
+        yield from element.infos
+        for resource in element.resources:
+            yield from infos(resource)
+        for table in getattr(element, "tables", ()):
+            yield from table.infos
+
+    for info in infos(votable):
+        if (info.name.lower() == "query_status"
+                and (info.value or "").lower() != "ok"):
+            return False
+        if info.name == "Error":
+            return False
+    return True
+
+
+def _finish_stream(stream):
+    # parsers may stop reading before the end of the response; make sure
+    # cached responses are committed and cache files are closed
+    if isinstance(stream, _CachingStream):
+        stream.finish()
+    elif isinstance(stream, io.BufferedReader):
+        stream.close()
+
+
 class DALResults:
     """
     Results from a DAL query.  It provides random access to records in
@@ -295,12 +577,27 @@ class DALResults:
 
         Uses the optional session to make the request.
         """
-        session = use_session(session)
+        session = use_session(session, url=result_url)
         return cls(
             votableparse(cls._from_result_url(result_url, session).read),
             url=result_url,
             session=session)
 
+    @classmethod
+    def iter_result_url(cls, result_url, *, chunk_size=DEFAULT_CHUNK_SIZE, session=None):
+        """
+        Iterate over the rows of the result at ``result_url`` in chunks,
+        as with `DALQuery.execute_iter`.
+
+        Uses the optional session to make the request.
+        """
+        session = use_session(session, url=result_url)
+        stream = cls._from_result_url(result_url, session)
+        try:
+            yield from _iter_stream_chunks(stream, chunk_size=chunk_size, url=result_url)
+        finally:
+            stream.close()
+
     def __init__(self, votable, *, url=None, session=None):
         """
         initialize the cursor.  This constructor is not typically called
@@ -329,7 +626,7 @@ class DALResults:
         self._votable = votable
 
         self._url = url
-        self._session = use_session(session)
+        self._session = use_session(session, url=url)
 
         self._status = self._findstatus(votable)
         if self._status[0].lower() not in ("ok", "overflow"):
@@ -459,6 +756,40 @@ class DALResults:
         """
         return QTable(self.resultstable.to_table(use_names_over_ids=True))
 
+    def to_arrow(self):
+        """
+        Returns an Apache Arrow table with the result rows.
+
+        This requires the optional dependency pyarrow.  Numeric columns are
+        converted without going through astropy tables, and masked values
+        become nulls.  The column metadata (ID, UCD, utype, unit, ...) is
+        kept in the metadata of the arrow fields.
+
+        Returns
+        -------
+        `pyarrow.Table`
+        """
+        from .arrow import table_to_arrow
+        return table_to_arrow(self.resultstable)
+
+    def to_parquet(self, path, **kwargs):
+        """
+        Writes the result rows to a Parquet file.
+
+        This requires the optional dependency pyarrow.
+
+        Parameters
+        ----------
+        path : str or file-like
+            where to write the Parquet data to
+        **kwargs :
+            further arguments for `pyarrow.parquet.write_table`, e.g.,
+            ``compression``
+        """
+        table = self.to_arrow()
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(table, path, **kwargs)
+
     @property
     def table(self):
         warn(AstropyDeprecationWarning(
@@ -515,41 +846,27 @@ class DALResults:
         return the field name that has a given UCD value or None if the UCD
         is not found.
         """
-        search_ucds = set(parse_ucd(ucd, has_colon=True))
-
-        for field in (field for field in self.fielddescs if field.ucd):
-            field_ucds = set(parse_ucd(field.ucd, has_colon=True))
-
-            if search_ucds & field_ucds:
-                return field.name
-
-        return None
+        return _get_column_index(self).by_ucd(ucd)
 
     def fieldname_with_utype(self, utype):
         """
         return the field name that has a given UType value or None if the UType
         is not found.
         """
-        try:
-            iterchain = (
-                self.getdesc(fieldname) for fieldname in self.fieldnames)
-            iterchain = (field for field in iterchain if field.utype == utype)
-            return next(iterchain).name
-        except StopIteration:
-            return None
+        return _get_column_index(self).by_utype(utype)
 
     def getcolumn(self, name):
         """
         return a numpy array containing the values for the column with the
         given name
         """
-        try:
-            if name not in self.fieldnames:
-                name = self.resultstable.get_field_by_id(name).name
+        index = _get_column_index(self)
+        if name not in index.names:
+            name = index.by_id(name) or name
+            if name not in index.names:
+                raise KeyError("No such column: {}".format(name))
 
-            return self.resultstable.array[name]
-        except KeyError:
-            raise KeyError("No such column: {}".format(name))
+        return self.resultstable.array[name]
 
     def getrecord(self, index):
         """
@@ -620,9 +937,10 @@ class DALResults:
            which describe the column
 
         """
-        if name not in self._fldnames:
+        try:
+            return self.fielddescs[_get_column_index(self).names[name]]
+        except KeyError:
             raise KeyError(name)
-        return self.resultstable.get_field_by_id_or_name(name)
 
     def __iter__(self):
         """
@@ -640,6 +958,118 @@ class DALResults:
             yield out
             pos += 1
 
+    def iter_batches(self, size, *, columns=None, start=0, as_table=False):
+        """
+        iterate over the result in batches of rows, column by column.
+
+        In contrast to iterating over the result itself, this does not
+        create an object per row; the batches are slices of the columns of
+        the results table.
+
+        Parameters
+        ----------
+        size : int
+           the number of rows per batch; the last batch may be shorter.
+        columns : list of str
+           the names (or IDs) of the columns to include; by default,
+           all columns are included.
+        start : int
+           the index of the first row to include
+        as_table : bool
+           if True, yield `astropy.table.Table` instances rather than
+           dictionaries of arrays.
+
+        Yields
+        ------
+        dict or `astropy.table.Table`
+           a dictionary mapping the column names to (masked) numpy arrays
+           holding the values of the rows in the batch, or, with
+           ``as_table``, a table of these rows.
+
+        Raises
+        ------
+        KeyError
+           if one of ``columns`` is not a recognized column name
+        """
+        if size < 1:
+            raise ValueError("size must be positive")
+
+        if columns is None:
+            names = list(self.fieldnames)
+        else:
+            index = _get_column_index(self)
+            names = []
+            for name in columns:
+                if name not in index.names:
+                    name = index.by_id(name) or name
+                    if name not in index.names:
+                        raise KeyError("No such column: {}".format(name))
+                names.append(name)
+
+        if as_table:
+            source = self.to_table()[names]
+        else:
+            array = self.resultstable.array
+            source = {name: array[name] for name in names}
+
+        for pos in range(max(start, 0), len(self), size):
+            if as_table:
+                yield source[pos:pos + size]
+            else:
+                yield {name: column[pos:pos + size]
+                       for name, column in source.items()}
+
+    def cachedatasets(
+            self, dir=".", *, workers=8, max_per_host=4, timeout=None,
+            bufsize=None, overwrite=False, manifest="manifest.json"):
+        """
+        download the datasets described by the records of this result into
+        a directory, several at a time.
+
+        The files are named after the records' ``suggest_dataset_basename()``
+        and ``suggest_extension()``; a counter is appended if several
+        records suggest the same name.  Downloads are written to temporary
+        files that are renamed once complete, so existing files are complete
+        and are not downloaded again unless their size differs from the
+        exact size the record announces (``content_length``).  Downloads
+        only take a worker when their host has a free slot, so downloads
+        from busy hosts do not hold up those from others.
+
+        Parameters
+        ----------
+        dir : str
+           the directory to write the files to; it is created if necessary.
+        workers : int
+           the maximal number of downloads running at the same time.
+        max_per_host : int
+           the maximal number of concurrent downloads from a single host.
+        timeout : float
+           the time in seconds to allow for a successful connection with the
+           server of a dataset.
+        bufsize : int
+           a buffer size in bytes for copying the data to disk
+           (default: 0.5 MB)
+        overwrite : bool
+           if True, download datasets even when their files already exist.
+        manifest : str
+           the name of a JSON file in ``dir`` to write the returned manifest
+           to; pass None to not write one.
+
+        Returns
+        -------
+        list of dict
+           a manifest entry per record, in the order of the records.  Each
+           has the keys ``index``, ``url``, ``filename``, ``size``,
+           ``error`` and ``status``, the latter being one of
+           ``downloaded``, ``skipped`` (the file already existed),
+           ``nourl`` (the record has no dataset URL) or ``failed`` (with
+           a description of the problem in ``error``).
+        """
+        return download_datasets(
+            self, dir, workers=workers, max_per_host=max_per_host,
+            timeout=timeout, bufsize=bufsize, overwrite=overwrite,
+            manifest=manifest)
+
     def broadcast_samp(self, *, client_name=None):
         """
         Broadcast the table to ``client_name`` via SAMP
@@ -658,6 +1088,101 @@ class DALResults:
         return Cursor(self)
 
 
+class _ColumnIndex:
+    """
+    the positions of the columns of a result by name, ID, UCD and utype.
+
+    An index is built once per result and shared by all of its records.
+    The name index is built right away, the others once they are first
+    needed.
+    """
+
+    def __init__(self, results):
+        self._results = results
+        self._fieldnames = tuple(results.fieldnames)
+        self.names = {name: pos for pos, name in enumerate(self._fieldnames)}
+        self._meta = None
+        self._ucd_lookups = {}
+
+    def _get_meta(self):
+        if self._meta is None:
+            ids, utypes, ucds = {}, {}, {}
+            dataurl = None
+            for pos, field in enumerate(self._results.resultstable.fields):
+                if field.ID is not None:
+                    ids.setdefault(field.ID, pos)
+                if field.utype is not None:
+                    utypes.setdefault(field.utype, pos)
+
+                if field.ucd:
+                    try:
+                        atoms = parse_ucd(field.ucd, has_colon=True)
+                    except ValueError:
+                        atoms = []
+                    # every word counts, so "pos.eq.ra;meta.main" is
+                    # found both for pos.eq.ra and meta.main
+                    for atom in atoms:
+                        ucds.setdefault(atom, pos)
+
+                if dataurl is None and (
+                        (field.utype and "access.reference" in field.utype.lower())
+                        or (field.ucd and "meta.dataset" in field.ucd
+                            and "meta.ref.url" in field.ucd)):
+                    dataurl = pos
+
+            self._meta = ids, utypes, ucds, dataurl
+        return self._meta
+
+    def _name(self, pos):
+        if pos is None:
+            return None
+        return self._fieldnames[pos]
+
+    def by_id(self, id_):
+        """
+        the name of the column with the XML ID ``id_``, or None
+        """
+        return self._name(self._get_meta()[0].get(id_))
+
+    def by_utype(self, utype):
+        """
+        the name of the first column with the given utype, or None
+        """
+        return self._name(self._get_meta()[1].get(utype))
+
+    def by_ucd(self, ucd):
+        """
+        the name of the first column sharing a UCD word with ``ucd``,
+        or None
+        """
+        try:
+            return self._ucd_lookups[ucd]
+        except KeyError:
+            pass
+
+        ucds = self._get_meta()[2]
+        positions = [ucds[atom] for atom in parse_ucd(ucd, has_colon=True)
+                     if atom in ucds]
+        name = self._name(min(positions)) if positions else None
+        self._ucd_lookups[ucd] = name
+        return name
+
+    @property
+    def dataurl(self):
+        """
+        the name of the column containing dataset access URLs, or None
+        """
+        return self._name(self._get_meta()[3])
+
+
+def _get_column_index(results):
+    try:
+        return results._columnindex
+    except AttributeError:
+        index = results._columnindex = _ColumnIndex(results)
+        return index
+
+
 class Record(Mapping):
     """
     one record from a DAL query result.  The column values are accessible
@@ -666,31 +1191,53 @@ class Record(Mapping):
     additional functions for access to service type-specific data.
     """
 
+    __slots__ = ("_results", "_index", "_session", "_row", "_fieldindex",
+                 "_overrides", "_dsname_no")
+
     def __init__(self, results, index, *, session=None):
         self._results = results
         self._index = index
         self._session = use_session(session)
-        self._mapping = collections.OrderedDict(
-            zip(
-                results.fieldnames,
-                results.resultstable.array.data[index]
-            )
-        )
+        # values are only looked up when asked for; this raises an
+        # IndexError right away for indices beyond the table, though.
+        self._row = results.resultstable.array.data[index]
+        self._fieldindex = _get_column_index(results).names
+        self._overrides = None
+        self._dsname_no = 0  # used by make_dataset_filename
+
+    def _getvalue(self, name):
+        if self._overrides and name in self._overrides:
+            return self._overrides[name]
+        return self._row[self._fieldindex[name]]
+
+    def _setvalue(self, name, value):
+        """
+        replace the value of the column ``name`` in this record only,
+        e.g., by a parsed form of it.
+        """
+        if name not in self._fieldindex:
+            raise KeyError("No such column: {}".format(name))
+        if self._overrides is None:
+            self._overrides = {}
+        self._overrides[name] = value
 
     def __getitem__(self, key):
         try:
-            if key not in self._mapping:
-                key = self._results.resultstable.get_field_by_id(key).name
+            if key not in self._fieldindex:
+                name = _get_column_index(self._results).by_id(key)
+                if name is None:
+                    raise KeyError(key)
+                key = name
 
-            return self._mapping[key]
+            return self._getvalue(key)
         except KeyError:
             raise KeyError("No such column: {}".format(key))
 
     def __iter__(self):
-        return iter(self._mapping)
+        return iter(self._fieldindex)
 
     def __len__(self):
-        return len(self._mapping)
+        return len(self._fieldindex)
 
     def __repr__(self):
         return repr(tuple(self.values()))
@@ -700,7 +1247,10 @@ class Record(Mapping):
         This method mimics the dict get method and adds a decode parameter
         to allow decoding of binary strings.
         """
-        out = self._mapping.get(key, default)
+        if key in self._fieldindex:
+            out = self._getvalue(key)
+        else:
+            out = default
 
         if decode and isinstance(out, bytes):
             out = out.decode('ascii')
@@ -738,24 +1288,73 @@ class Record(Mapping):
         to retrieve the dataset described by this record.  None is returned
         if no such column exists.
         """
-        for fieldname in self._results.fieldnames:
-            field = self._results.getdesc(fieldname)
-            if (field.utype and "access.reference" in field.utype.lower()) or (
-                    field.ucd and "meta.dataset" in field.ucd
-                    and "meta.ref.url" in field.ucd
-            ):
-                out = self[fieldname]
-                if isinstance(out, bytes):
-                    out = out.decode('utf-8')
-                return out
-        return None
+        fieldname = _get_column_index(self._results).dataurl
+        if fieldname is None:
+            return None
+
+        out = self[fieldname]
+        if isinstance(out, bytes):
+            out = out.decode('utf-8')
+        return out
 
-    def getdataobj(self):
+    def getdataobj(self, lazy=False, cache=None, timeout=None):
         """
         return the appropriate data object suitable for the data content behind
         this record.
+
+        Parameters
+        ----------
+        lazy : bool
+           if True and the dataset is a FITS file, return an
+           `~astropy.io.fits.HDUList` that reads the headers and the data
+           of the HDUs from the server as they are accessed, using HTTP
+           range requests.  If the server does not support them, the whole
+           file is downloaded.  Lazy reads bypass the dataset cache.
+        cache : `~pyvo.utils.cache.DiskCache`
+           the cache to keep FITS files and images in.  If None, the cache
+           set up by `enable_dataset_cache` (if any) is used; pass False to
+           not use a cache.  Cached FITS files are opened memory-mapped.
+        timeout : float
+           the timeout in seconds for the requests downloading the data
+        """
+        if cache is None:
+            cache = _dataset_cache
+        return mime_object_maker(
+            self.getdataurl(), self.getdataformat(),
+            session=self._session, lazy=lazy, cache=cache, timeout=timeout)
+
+    def getheaders(self, timeout=None):
+        """
+        return the headers of the HDUs of the FITS dataset described by this
+        record.
+
+        The headers are read block by block using HTTP range requests, so
+        the data of the HDUs is not transferred unless the server does not
+        support such requests.
+
+        Parameters
+        ----------
+        timeout : float
+           the time in seconds to allow for each request to the server.
+
+        Returns
+        -------
+        list of `astropy.io.fits.Header`
+           the headers, starting with the primary header
+
+        Raises
+        ------
+        KeyError
+           if no dataset access URL is included in the record
+        DALServiceError
+           if the dataset cannot be retrieved
+        DALFormatError
+           if the dataset is not a FITS file
         """
-        return mime_object_maker(self.getdataurl(), self.getdataformat())
+        url = self._get_dataset_url()
+        if not url:
+            raise KeyError("no dataset access URL recognized in record")
+        return read_remote_headers(self._session, url, timeout=timeout)
 
     @stream_decode_content
     def getdataset(self, timeout=None):
@@ -804,12 +1403,24 @@ class Record(Mapping):
 
         return response.raw
 
-    def cachedataset(self, *, filename=None, dir=".", timeout=None, bufsize=None):
+    def _get_dataset_url(self):
+        # the URL getdataset() retrieves the dataset from
+        return self.getdataurl()
+
+    def cachedataset(
+            self, *, filename=None, dir=".", timeout=None, bufsize=None,
+            retries=3):
         """
         retrieve the dataset described by this record and write it out to
         a file with the given name.  If the file already exists, it will be
         over-written.
 
+        The data is first written to a file with the extension ``.part``
+        that is renamed when the download is complete.  If a download is
+        interrupted, calling this method again with the same file name
+        continues it where it broke off, provided the server supports
+        HTTP range requests and the dataset has not changed.
+
         Parameters
         ----------
         filename : str
@@ -828,35 +1439,29 @@ class Record(Mapping):
         bufsize : int
            a buffer size in bytes for copying the data to disk
            (default: 0.5 MB)
+        retries : int
+           how often to resume the download after transient failures, such
+           as broken connections or server errors, before giving up.
 
         Raises
         ------
         KeyError
             if no datast access URL is included in the record
-        URLError
-           if the dataset access URL is invalid
-        HTTPError
-           if an HTTP error occurs while accessing the dataset
-        socket.timeout
-           if the timeout is exceeded before a connection is established.
-           (note: subclass of IOError)
+        DALServiceError
+           if the dataset cannot be retrieved
         IOError
             if an error occurs while writing out the dataset
         """
-        if not bufsize:
-            bufsize = 524288
-
         if not filename:
             filename = self.make_dataset_filename(dir=dir)
 
-        inp = self.getdataset(timeout)
-        try:
-            with open(filename, 'wb') as out:
-                shutil.copyfileobj(inp, out)
-        finally:
-            inp.close()
+        url = self._get_dataset_url()
+        if not url:
+            raise KeyError("no dataset access URL recognized in record")
 
-    _dsname_no = 0  # used by make_dataset_filename
+        download_resumable(
+            self._session, url, filename, timeout=timeout, bufsize=bufsize,
+            retries=retries)
 
     def make_dataset_filename(self, *, dir=".", base=None, ext=None):
         """
@@ -988,6 +1593,14 @@ class Upload:
         except Exception:
             self._is_file = False
         self._is_fileobj = hasattr(content, "read")
+        # where iter_content starts reading file objects, so that they can
+        # be read again
+        self._start = None
+        if self._is_fileobj:
+            try:
+                self._start = content.tell()
+            except (AttributeError, OSError):
+                pass
         self._is_table = isinstance(content, Table)
         self._is_resultset = isinstance(content, DALResults)
 
@@ -1052,6 +1665,91 @@ class Upload:
         finally:
             return fileobj
 
+    def iter_content(self, *, chunk_rows=DEFAULT_UPLOAD_CHUNK_ROWS):
+        """
+        Yield the content of a local resource as byte strings.
+
+        Tables and results are serialized as BINARY2 VOTable ``chunk_rows``
+        rows at a time, files are read in blocks, so the content is never
+        held in memory as a whole.
+
+        Raises
+        ------
+        ValueError
+            if theres no valid local resource
+        """
+        if not self.is_inline:
+            raise ValueError(
+                "Upload {name} doesn't refer to a local resource".format(
+                    name=self.name))
+
+        if isinstance(self._content, (Table, DALResults)):
+            table = self._content
+            if isinstance(table, DALResults):
+                table = table.to_table()
+            yield from iter_binary2_votable(table, chunk_rows=chunk_rows)
+            return
+
+        if self._is_fileobj:
+            fileobj = self._content
+            if self._start is not None:
+                fileobj.seek(self._start)
+        else:
+            fileobj = open(self._content, "rb")
+
+        try:
+            while True:
+                chunk = fileobj.read(DEFAULT_UPLOAD_BLOCKSIZE)
+                if not chunk:
+                    break
+                if isinstance(chunk, str):
+                    chunk = chunk.encode("utf-8")
+                yield chunk
+        finally:
+            if fileobj is not self._content:
+                fileobj.close()
+
+    @property
+    def content_type(self):
+        """
+        The MIME type of the serialized content, or None if it is unknown
+        """
+        if isinstance(self._content, (Table, DALResults)):
+            return VOTABLE_MIME
+        return None
+
+    def content_hash(self):
+        """
+        A digest of the upload content, or None if it cannot be computed
+        without consuming the content.
+
+        Tables are digested from their metadata and column buffers rather
+        than their serialization.
+        """
+        if not self.is_inline:
+            return hashlib.sha256(self.uri().encode("utf-8")).hexdigest()
+
+        if isinstance(self._content, (Table, DALResults)):
+            table = self._content
+            if isinstance(table, DALResults):
+                table = table.to_table()
+            return _table_digest(table)
+
+        pos = None
+        if self._is_fileobj:
+            try:
+                pos = self._content.tell()
+            except (AttributeError, OSError):
+                return None
+
+        digest = hashlib.sha256()
+        for chunk in self.iter_content():
+            digest.update(chunk)
+
+        if pos is not None:
+            self._content.seek(pos)
+        return digest.hexdigest()
+
     def uri(self):
         """
         The URI pointing to the result
@@ -1079,6 +1777,27 @@ class Upload:
         return value.format(name=self.name, uri=self.uri())
 
 
+def _table_digest(table):
+    # a digest of everything that goes into the VOTable serialization of
+    # table, without serializing it
+    digest = hashlib.sha256()
+    digest.update(repr(sorted(table.meta.items(), key=str)).encode("utf-8"))
+    for column in table.itercols():
+        info = column.info
+        digest.update(repr((
+            info.name, column.dtype.str, column.shape, str(info.unit),
+            info.description, info.format,
+            sorted((info.meta or {}).items(), key=str))).encode("utf-8"))
+        data = np.ma.getdata(column)
+        if data.dtype.hasobject:
+            for value in data:
+                digest.update(repr(value).encode("utf-8"))
+        else:
+            digest.update(np.ascontiguousarray(data).tobytes())
+        digest.update(np.ascontiguousarray(np.ma.getmaskarray(column)).tobytes())
+    return digest.hexdigest()
+
+
 class UploadList(list):
     """
     This class extends the native python list with utility functions for
@@ -1098,6 +1817,36 @@ class UploadList(list):
         """
         return ";".join(upload.query_part() for upload in self)
 
+    def multipart_body(self, fields, *, compression=None):
+        """
+        Returns a `~pyvo.dal.uploads.MultipartBody` posting the form
+        ``fields`` and the content of the inline uploads, or None if there
+        are no inline uploads.
+
+        Parameters
+        ----------
+        fields : iterable
+            (name, value) pairs of the other request parameters
+        compression : str
+            ``"gzip"`` to compress the uploaded content
+        """
+        if compression not in (None, "gzip"):
+            raise ValueError(
+                "Unsupported upload compression: {}".format(compression))
+
+        def chunks(upload):
+            if compression == "gzip":
+                return lambda: iter_gzip(upload.iter_content())
+            return upload.iter_content
+
+        files = [
+            (upload.name, chunks(upload), upload.content_type, compression)
+            for upload in self if upload.is_inline]
+
+        if not files:
+            return None
+        return MultipartBody(fields, files)
+
 
 _image_mt_re = re.compile(r'^image/(\w+)')
 _text_mt_re = re.compile(r'^text/(\w+)')
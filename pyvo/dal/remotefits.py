@@ -0,0 +1,236 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Partial reads of remote FITS files through HTTP range requests.
+
+FITS files consist of HDUs made of 2880-byte blocks, a header followed by
+the data.  With a seekable file, astropy reads the headers block by block
+and only reads the data of an HDU when it is accessed, skipping over the
+rest.  `RangeFile` provides such a file for a URL, turning reads into
+``Range`` requests, so that the headers of a large dataset (or a single
+extension) can be had without transferring the whole file.
+"""
+import io
+
+import requests
+
+from astropy.io import fits
+
+from .download import _CONTENT_RANGE
+from .exceptions import DALFormatError, DALServiceError
+
+__all__ = ["RangeFile", "open_remote_fits", "read_remote_headers"]
+
+FITS_BLOCK = 2880
+
+# the bytes fetched at least per request; a few blocks cover typical
+# headers in one go
+DEFAULT_READAHEAD = 8 * FITS_BLOCK
+
+# compressed files are read sequentially anyway
+_COMPRESSED_MAGIC = (b"\x1f\x8b", b"BZh", b"PK\x03\x04")
+
+
+class RangeFile(io.RawIOBase):
+    """
+    a read-only, seekable file over the resource at ``url``.
+
+    Reads are served by HTTP ``Range`` requests of at least ``readahead``
+    bytes.  If the server ignores ranges (i.e., sends the whole resource
+    with a 200 status), does not announce the total size, or sends
+    compressed data, the whole resource is downloaded on the first request
+    and served from memory; ``ranges_supported`` tells which of the two
+    happened.
+
+    Parameters
+    ----------
+    session : `requests.Session`
+        the session to make the requests with
+    url : str
+        the URL of the resource
+    timeout : float
+        the timeout for each request
+    readahead : int
+        the minimal number of bytes to request at a time
+    """
+
+    def __init__(self, session, url, *, timeout=None,
+                 readahead=DEFAULT_READAHEAD):
+        super().__init__()
+        self.name = url
+        self.mode = "rb"
+        self._session = session
+        self._url = url
+        self._timeout = timeout
+        self._readahead = readahead
+        self._pos = 0
+        self._size = None
+        self._validator = None
+        self._buffer = b""
+        self._bufstart = 0
+        self._full = None
+        self.requests = 0
+
+    @property
+    def ranges_supported(self):
+        """
+        True if the resource is read through range requests
+        """
+        self._probe()
+        return self._full is None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            self._probe()
+            pos = self._size + offset
+        else:
+            raise ValueError("invalid whence ({})".format(whence))
+        if pos < 0:
+            raise OSError("negative seek position {}".format(pos))
+        self._pos = pos
+        return pos
+
+    def readinto(self, buffer):
+        data = self._read(self._pos, len(buffer))
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+    def _get(self, start=None, stop=None, validator=None):
+        # byte offsets only work on the undecoded data
+        headers = {"Accept-Encoding": "identity"}
+        if start is not None:
+            headers["Range"] = "bytes={}-{}".format(start, stop - 1)
+        if validator:
+            headers["If-Range"] = validator
+        self.requests += 1
+        try:
+            response = self._session.get(
+                self._url, headers=headers, timeout=self._timeout)
+            response.raise_for_status()
+        except requests.RequestException as ex:
+            raise DALServiceError.from_except(ex, self._url)
+        return response
+
+    def _use_full(self, response):
+        self._full = response.content
+        self._size = len(self._full)
+        self._buffer = b""
+
+    def _probe(self):
+        if self._size is not None:
+            return
+
+        response = self._get(0, self._readahead)
+        match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+        if (response.status_code != 206 or not match
+                or match.group(1) != "0" or match.group(3) == "*"
+                or response.content.startswith(_COMPRESSED_MAGIC)):
+            if response.status_code == 206:
+                response = self._get()
+            self._use_full(response)
+            return
+
+        self._size = int(match.group(3))
+        self._validator = (
+            response.headers.get("ETag") or response.headers.get("Last-Modified"))
+        self._buffer = response.content
+        self._bufstart = 0
+
+    def _read(self, pos, size):
+        self._probe()
+        if self._full is not None:
+            return self._full[pos:pos + size]
+
+        size = max(0, min(size, self._size - pos))
+        if not size:
+            return b""
+
+        offset = pos - self._bufstart
+        if 0 <= offset and offset + size <= len(self._buffer):
+            return self._buffer[offset:offset + size]
+
+        stop = min(pos + max(size, self._readahead), self._size)
+        response = self._get(pos, stop, self._validator)
+        match = _CONTENT_RANGE.match(response.headers.get("Content-Range", ""))
+        if response.status_code != 206 or not match:
+            # the server changed its mind or the resource has changed; the
+            # headers read so far may no longer apply to a changed file
+            if self._validator:
+                raise DALServiceError(
+                    "dataset changed while reading it", url=self._url)
+            self._use_full(response)
+            return self._full[pos:pos + size]
+        if int(match.group(1)) != pos:
+            raise DALServiceError("unexpected Content-Range", url=self._url)
+
+        self._buffer = response.content
+        self._bufstart = pos
+        return self._buffer[:size]
+
+
+def open_remote_fits(session, url, *, timeout=None):
+    """
+    open the remote FITS file at ``url`` for lazy reading.
+
+    Only the headers are read when the HDUs are accessed, the data of an
+    HDU is fetched when its ``data`` attribute is first used.  Servers
+    that do not support range requests get the whole file downloaded.
+
+    Parameters
+    ----------
+    session : `requests.Session`
+        the session to make the requests with
+    url : str
+        the URL of the FITS file
+    timeout : float
+        the timeout for each request
+
+    Returns
+    -------
+    `astropy.io.fits.HDUList`
+
+    Raises
+    ------
+    DALServiceError
+        if the file cannot be retrieved
+    DALFormatError
+        if it is not a FITS file
+    """
+    fileobj = RangeFile(session, url, timeout=timeout)
+    try:
+        return fits.open(fileobj, lazy_load_hdus=True, cache=False)
+    except OSError as ex:
+        raise DALFormatError(ex, url)
+
+
+def read_remote_headers(session, url, *, timeout=None):
+    """
+    return the headers of all HDUs in the remote FITS file at ``url``,
+    reading as little of the file as the server permits.
+
+    See `open_remote_fits` for the parameters.
+
+    Returns
+    -------
+    list of `astropy.io.fits.Header`
+    """
+    hdulist = open_remote_fits(session, url, timeout=timeout)
+    try:
+        return [hdu.header for hdu in hdulist]
+    except OSError as ex:
+        raise DALFormatError(ex, url)
+    finally:
+        hdulist.close()
@@ -0,0 +1,382 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Running many asynchronous TAP queries with a bounded number of jobs, and
+watching the phases of many jobs at once.
+"""
+from collections.abc import Mapping
+from concurrent.futures import Future, FIRST_COMPLETED, ThreadPoolExecutor, wait
+import threading
+from time import monotonic, sleep
+
+from .exceptions import DALServiceError
+from .fanout import SearchFailure
+
+__all__ = ["JobWatcher", "run_async_jobs"]
+
+# the seconds to wait before the n-th retry of a job submission the service
+# refused for lack of capacity are SUBMIT_RETRY_DELAY * n
+SUBMIT_RETRY_DELAY = 5.0
+
+# HTTP status codes with which services turn down jobs when busy
+_BUSY_STATUS = {429, 503}
+
+FINAL_PHASES = frozenset({"COMPLETED", "ERROR", "ABORTED"})
+
+_ACTIVE_PHASES = frozenset({"QUEUED", "EXECUTING"})
+
+# phases from which a job will not reach a final phase by itself
+_INACTIVE_PHASES = frozenset({"PENDING", "HELD", "SUSPENDED", "ARCHIVED"})
+
+
+class JobWatcher:
+    """
+    watches the phases of many `~pyvo.dal.AsyncTAPJob` instances of one
+    service from a single thread.
+
+    Instead of each job polling its own URL, the watcher reads the phases
+    of all jobs from the service's job list, one request for all jobs, and
+    only fetches the full description of the jobs that have finished.
+    While a single job is watched, it uses the blocking WAIT of UWS 1.1
+    instead, which returns as soon as the job's phase changes; a job
+    watched meanwhile cuts the wait short.
+    Jobs missing from the job list (e.g., because the service does not
+    list them) are polled individually.
+
+    The polling interval starts at ``min_interval`` and grows up to
+    ``max_interval`` while nothing happens.
+
+    Use it as a context manager, or call ``close()`` when done.
+
+    Parameters
+    ----------
+    service : `~pyvo.dal.TAPService`
+        the service running the jobs
+    min_interval : float
+        the initial time in seconds between polls
+    max_interval : float
+        the maximal time in seconds between polls
+    timeout : float
+        the timeout for each request
+    wait_time : int
+        the maximal time in seconds the service is asked to block in a
+        UWS 1.1 WAIT request
+
+    Examples
+    --------
+    >>> with JobWatcher(service) as watcher:  # doctest: +SKIP
+    ...     futures = [watcher.watch(job.run()) for job in jobs]
+    ...     for future in concurrent.futures.as_completed(futures):
+    ...         print(future.result().phase)
+    """
+
+    def __init__(self, service, *, min_interval=0.5, max_interval=10.,
+                 timeout=60., wait_time=30):
+        self._service = service
+        self._min_interval = min_interval
+        self._max_interval = max_interval
+        self._timeout = timeout
+        self._wait_time = wait_time
+        self._cond = threading.Condition()
+        self._watched = {}
+        self._closed = False
+        self._thread = None
+
+        #: the number of polling requests made
+        self.requests = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def watch(self, job, *, phases=None, callback=None):
+        """
+        start watching ``job`` until it reaches one of ``phases``.
+
+        Parameters
+        ----------
+        job : `~pyvo.dal.AsyncTAPJob`
+            the job to watch; it should have been started
+        phases : set of str
+            the phases to wait for; by default, the final phases
+            COMPLETED, ERROR and ABORTED.
+        callback : callable
+            a function called with the future once the job has reached
+            one of ``phases`` (or watching it failed)
+
+        Returns
+        -------
+        `concurrent.futures.Future`
+            a future resolving to the job with up-to-date metadata once it
+            has reached one of ``phases``, or raising a
+            `~pyvo.dal.DALServiceError` if it will not get there
+        """
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("the job watcher is closed")
+            self._watched[job.job_id] = (
+                job, future, frozenset(phases or FINAL_PHASES))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="pyvo-job-watcher", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return future
+
+    def close(self):
+        """
+        stop watching; the futures of jobs still watched are cancelled.
+        """
+        with self._cond:
+            self._closed = True
+            watched = list(self._watched.values())
+            self._watched.clear()
+            self._cond.notify_all()
+        for _, future, _ in watched:
+            future.cancel()
+
+    def _poll_job(self, job, *, wait):
+        self.requests += 1
+        if wait and self._wait_time:
+            job._update(
+                wait_for_statechange=True, timeout=self._timeout,
+                wait_time=self._wait_time)
+        else:
+            job._update(timeout=self._timeout)
+        return job._job.phase
+
+    def _wait_single(self, job_id, job):
+        # the blocking WAIT runs on a helper thread, so that jobs watched
+        # while it is pending do not have to wait for it to return
+        outcome = Future()
+
+        def run():
+            try:
+                outcome.set_result(self._poll_job(job, wait=True))
+            except Exception as ex:
+                outcome.set_exception(ex)
+            with self._cond:
+                self._cond.notify_all()
+
+        threading.Thread(target=run, name="pyvo-job-wait", daemon=True).start()
+        with self._cond:
+            while not outcome.done():
+                if self._closed or set(self._watched) != {job_id}:
+                    # poll all jobs instead; the phase of this one is
+                    # picked up from the job list
+                    return {}
+                self._cond.wait()
+        return {job_id: outcome.result()}
+
+    def _poll(self, watched):
+        # returns the phases of the watched jobs that are known now
+        if len(watched) == 1:
+            job_id, (job, _, _) = next(iter(watched.items()))
+            if self._wait_time:
+                return self._wait_single(job_id, job)
+            return {job_id: self._poll_job(job, wait=False)}
+
+        # the phases a started job can be in; asking for these rather than
+        # all jobs keeps out the old jobs a user may have on the service
+        listed_phases = set(_ACTIVE_PHASES | _INACTIVE_PHASES).union(
+            *(phases for _, _, phases in watched.values()))
+        try:
+            self.requests += 1
+            listed = {
+                jobref.jobid: jobref.phase
+                for jobref in self._service.get_job_list(
+                    phases=sorted(listed_phases))}
+        except Exception:
+            listed = {}
+
+        phases = {}
+        for job_id, (job, _, _) in watched.items():
+            if job_id in listed:
+                phases[job_id] = listed[job_id]
+            else:
+                # not every service lists all jobs
+                phases[job_id] = self._poll_job(job, wait=False)
+        return phases
+
+    def _resolve(self, watched, phases):
+        finished = 0
+        for job_id, phase in phases.items():
+            job, future, wanted = watched[job_id]
+            if phase in wanted:
+                if phase != job._job.phase:
+                    # fetch the full description, e.g. with the results
+                    job._update(timeout=self._timeout)
+                error = None
+            elif phase in _INACTIVE_PHASES or phase in FINAL_PHASES:
+                error = DALServiceError(
+                    "Job {} is {}; it will not reach {}".format(
+                        job_id, phase, ", ".join(sorted(wanted))),
+                    url=job.url)
+            else:
+                continue
+
+            with self._cond:
+                if self._watched.pop(job_id, None) is None:
+                    continue
+            finished += 1
+            if future.set_running_or_notify_cancel():
+                if error is None:
+                    future.set_result(job)
+                else:
+                    future.set_exception(error)
+        return finished
+
+    def _run(self):
+        interval = self._min_interval
+        while True:
+            with self._cond:
+                while not self._watched and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                watched = dict(self._watched)
+
+            started = monotonic()
+            try:
+                finished = self._resolve(watched, self._poll(watched))
+            except Exception as ex:
+                # give up on all watched jobs rather than failing silently
+                with self._cond:
+                    for job_id in watched:
+                        self._watched.pop(job_id, None)
+                for _, future, _ in watched.values():
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(ex)
+                continue
+
+            if finished:
+                interval = self._min_interval
+                continue
+
+            remaining = interval - (monotonic() - started)
+            interval = min(self._max_interval, interval * 1.5)
+            if remaining > 0:
+                with self._cond:
+                    # jobs watched since the poll are polled right away
+                    if not self._closed and set(self._watched) <= set(watched):
+                        self._cond.wait(remaining)
+
+
+def _submit(service, params, retries):
+    attempt = 0
+    while True:
+        try:
+            return service.submit_job(**params)
+        except DALServiceError as ex:
+            attempt += 1
+            if ex.code not in _BUSY_STATUS or attempt > retries:
+                raise
+            sleep(SUBMIT_RETRY_DELAY * attempt)
+
+
+def _discard(job, *, abort=False):
+    try:
+        if abort:
+            job.abort()
+        job.delete()
+    except DALServiceError:
+        pass
+
+
+def run_async_jobs(
+        service, queries, *, max_running=4, timeout=600., submit_retries=3,
+        **keywords):
+    """
+    run many queries as asynchronous jobs on ``service``, at most
+    ``max_running`` at a time.
+
+    See `pyvo.dal.TAPService.run_async_batch` for the parameters.
+
+    Yields
+    ------
+    tuple
+        pairs of the index of a query in ``queries`` and its outcome,
+        either a `~pyvo.dal.TAPResults` or a `~pyvo.dal.SearchFailure`,
+        in the order in which the jobs finish.
+    """
+    queries = list(queries)
+    running = {}
+    fetching = {}
+
+    def params(index):
+        out = dict(keywords)
+        if isinstance(queries[index], Mapping):
+            out.update(queries[index])
+        else:
+            out["query"] = queries[index]
+        return out
+
+    def fetch(job):
+        try:
+            job.raise_if_error()
+            return job.fetch_result()
+        finally:
+            _discard(job)
+
+    # results are fetched on worker threads so that downloading them
+    # holds up neither the submission of new jobs nor other downloads
+    fetcher = ThreadPoolExecutor(max_workers=max_running)
+    with JobWatcher(service, timeout=timeout) as watcher:
+        try:
+            next_index = 0
+            while next_index < len(queries) or running or fetching:
+                # jobs whose results are downloading do not count against
+                # max_running, but new ones wait while downloads lag behind
+                while (next_index < len(queries) and len(running) < max_running
+                       and len(fetching) <= max_running):
+                    index = next_index
+                    next_index += 1
+                    try:
+                        job = _submit(service, params(index), submit_retries)
+                    except Exception as ex:
+                        yield index, SearchFailure(service, ex)
+                        continue
+                    try:
+                        job.run()
+                    except Exception as ex:
+                        _discard(job)
+                        yield index, SearchFailure(service, ex)
+                        continue
+                    running[watcher.watch(job)] = index, job
+
+                if not running and not fetching:
+                    continue
+
+                done, _ = wait(
+                    set(running) | set(fetching), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in running:
+                        index, job = running.pop(future)
+                        try:
+                            future.result()
+                        except Exception as ex:
+                            _discard(job)
+                            yield index, SearchFailure(service, ex)
+                            continue
+                        fetching[fetcher.submit(fetch, job)] = index, job
+                    else:
+                        index, _ = fetching.pop(future)
+                        try:
+                            outcome = future.result()
+                        except Exception as ex:
+                            outcome = SearchFailure(service, ex)
+                        yield index, outcome
+        finally:
+            # the consumer stopped early: abort the running jobs and drop
+            # the results not yet fetched
+            for _, job in running.values():
+                _discard(job, abort=True)
+            for future, (_, job) in fetching.items():
+                if future.cancel():
+                    _discard(job)
+            fetcher.shutdown(wait=False)
@@ -27,6 +27,7 @@ from astropy.units import Unit, Quantity
 from astropy.io.votable.tree import Field
 from astropy.table import Table
 
+from .continuation import run_cone_continued
 from .query import DALResults, DALQuery, DALService, Record
 from .adhoc import DatalinkResultsMixin, DatalinkRecordMixin
 
@@ -185,6 +186,59 @@ class SCSService(DALService):
         """
         return self.create_query(pos=pos, radius=radius, verbosity=verbosity, **keywords).execute()
 
+    def search_continued(
+            self, pos, radius=1.0, *, verbosity=2, key=None, max_depth=4,
+            max_workers=4, progress=None, **keywords):
+        """
+        submit a simple Cone Search query and, if the result overflows the
+        service's output limit, search the cone again in smaller cones
+        until all matching records are found.
+
+        The cone is covered by seven cones of half its radius, which are
+        split in the same way while they overflow, up to ``max_depth``
+        times.  Records outside the original cone and records found before
+        are dropped.
+
+        Parameters
+        ----------
+        pos : astropy.coordinates.SkyCoord
+            the position of the center of the circular search region, as
+            in `search`.
+        radius : `~astropy.units.Quantity` or float
+            the radius of the circular search region, as in `search`.
+        verbosity : int
+            an integer value that indicates the volume of columns
+            to return in the result table.
+        key : str
+            the name of a column identifying the records; by default, the
+            column with the UCD ``ID_MAIN`` (or ``meta.id;meta.main``).
+        max_depth : int
+            how often a cone may be split
+        max_workers : int
+            the maximal number of queries running at the same time
+        progress : callable
+            called with a `~pyvo.dal.continuation.Progress` after each
+            query
+        **keywords :
+           additional parameters for all queries, as in `search`.
+
+        Returns
+        -------
+        SCSResults
+            a container holding a table of all matching catalog records
+        """
+        query = self.create_query(pos=pos, radius=radius)
+
+        def make_query(ra, dec, radius):
+            return self.create_query(
+                pos=(ra, dec), radius=radius, verbosity=verbosity, **keywords)
+
+        return run_cone_continued(
+            make_query, SCSResults, query["RA"], query["DEC"], query["SR"],
+            key=key or _record_id,
+            positions=_record_positions, max_depth=max_depth,
+            max_workers=max_workers, progress=progress, session=self._session)
+
     def create_query(self, pos=None, *, radius=None, verbosity=None, **keywords):
         """
         create a query object that constraints can be added to and then
@@ -413,6 +467,31 @@ class SCSQuery(DALQuery):
         return SCSResults(self.execute_votable(), url=self.queryurl, session=self._session)
 
 
+def _fieldname_with_ucd(results, *ucds):
+    # the name of the column with exactly one of ucds (case-insensitive),
+    # as SCS services use UCD1 or UCD1+
+    ucds = {ucd.lower() for ucd in ucds}
+    for name, field in zip(results.fieldnames, results.fielddescs):
+        if (field.ucd or "").lower() in ucds:
+            return name
+    return None
+
+
+def _record_id(results):
+    # the column identifying the records of SCSResults
+    return _fieldname_with_ucd(results, "ID_MAIN", "meta.id;meta.main")
+
+
+def _record_positions(results):
+    # the positions of the records of SCSResults
+    ra = _fieldname_with_ucd(results, "POS_EQ_RA_MAIN", "pos.eq.ra;meta.main")
+    dec = _fieldname_with_ucd(
+        results, "POS_EQ_DEC_MAIN", "pos.eq.dec;meta.main")
+    if ra is None or dec is None:
+        return None
+    return results.getcolumn(ra), results.getcolumn(dec), 0
+
+
 class SCSResults(DatalinkResultsMixin, DALResults):
     """
     The list of matching catalog records resulting from a catalog (SCS) query.
@@ -537,6 +616,8 @@ class SCSRecord(DatalinkRecordMixin, Record):
     function (or the [*key*] operator) where *key* is table column name.
     """
 
+    __slots__ = ()
+
     @property
     def pos(self):
         """
@@ -662,6 +662,8 @@ class SIARecord(SodaRecordMixin, DatalinkRecordMixin, Record):
     operator) where *key* is table column name.
     """
 
+    __slots__ = ()
+
     def getdataformat(self):
         """
         return the mimetype of the dataset described by this record.
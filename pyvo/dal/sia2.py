@@ -18,6 +18,7 @@ from astropy.time import Time
 from astropy.utils.decorators import deprecated
 from astropy.utils.exceptions import AstropyDeprecationWarning
 
+from .continuation import run_cone_continued
 from .query import DALResults, DALQuery, DALService, Record
 from .adhoc import DatalinkResultsMixin, AxisParamMixin, SodaRecordMixin, DatalinkRecordMixin
 from .params import IntervalQueryParam, StrQueryParam, EnumQueryParam
@@ -225,6 +226,58 @@ class SIA2Service(DALService, AvailabilityMixin, CapabilityMixin):
                          res_format=res_format, maxrec=maxrec,
                          session=self._session, **kwargs).execute()
 
+    def search_continued(
+            self, pos, *, key="obs_publisher_did", maxrec=None, max_depth=4,
+            max_workers=4, progress=None, **kwargs):
+        """
+        Performs a SIA2 search in a circle and, if the result overflows the
+        output limit, searches the circle again in smaller circles until
+        all matching datasets are found.
+
+        The circle is covered by seven circles of half its radius, which
+        are split in the same way while they overflow, up to ``max_depth``
+        times.  Datasets found before and datasets that, by their position
+        and field of view, cannot overlap the original circle are dropped.
+
+        Parameters
+        ----------
+        pos : tuple
+            the circle to search as a tuple of right ascension, declination
+            and radius, in degrees unless given as quantities
+        key : str
+            the name of a column identifying the datasets
+        maxrec : int
+            the maximum records to return per query
+        max_depth : int
+            how often a circle may be split
+        max_workers : int
+            the maximal number of queries running at the same time
+        progress : callable
+            called with a `~pyvo.dal.continuation.Progress` after each
+            query
+        **kwargs :
+            further constraints for all queries, as in `search`
+
+        See Also
+        --------
+        pyvo.dal.sia2.SIA2Query
+        """
+        try:
+            ra, dec, radius = (u.Quantity(value, u.deg).value for value in pos)
+        except (TypeError, ValueError):
+            raise ValueError(
+                "pos must be a circle of right ascension, declination "
+                "and radius")
+
+        def make_query(ra, dec, radius):
+            return SIA2Query(self.query_ep, pos=(ra, dec, radius),
+                             maxrec=maxrec, session=self._session, **kwargs)
+
+        return run_cone_continued(
+            make_query, SIA2Results, ra, dec, radius, key=key,
+            positions=_dataset_positions, max_depth=max_depth,
+            max_workers=max_workers, progress=progress, session=self._session)
+
 
 class SIA2Query(DALQuery, AxisParamMixin):
     """
@@ -471,6 +524,17 @@ class SIA2Query(DALQuery, AxisParamMixin):
         return SIA2Results(self.execute_votable(), url=self.queryurl, session=self._session)
 
 
+def _dataset_positions(results):
+    # the centers of the datasets of SIA2Results and how far these may be
+    # from a region the datasets overlap
+    if "s_ra" not in results.fieldnames or "s_dec" not in results.fieldnames:
+        return None
+    slack = 0
+    if "s_fov" in results.fieldnames:
+        slack = np.ma.filled(results.getcolumn("s_fov") / 2, 0)
+    return results.getcolumn("s_ra"), results.getcolumn("s_dec"), slack
+
+
 class SIA2Results(DatalinkResultsMixin, DALResults):
     """
     The list of matching images resulting from an image (SIA2) query.
@@ -432,6 +432,8 @@ class SLARecord(Record):
     function (or the [*key*] operator) where *key* is table column name.
     """
 
+    __slots__ = ()
+
     @property
     def title(self):
         """
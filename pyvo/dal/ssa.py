@@ -40,6 +40,7 @@ from astropy.units import spectral as spectral_equivalencies
 from astropy.io.votable.tree import Field
 from astropy.table import Table
 
+from .continuation import run_cone_continued
 from .query import DALResults, DALQuery, DALService, Record
 from .mimetype import mime2extension
 from .adhoc import DatalinkResultsMixin, DatalinkRecordMixin, SodaRecordMixin
@@ -211,6 +212,60 @@ class SSAService(DALService):
         return self.create_query(
             pos=pos, diameter=diameter, band=band, time=time, format=format, **keywords).execute()
 
+    def search_continued(
+            self, pos, *, diameter, key=None, max_depth=4, max_workers=4,
+            progress=None, **keywords):
+        """
+        submit a SSA query and, if the result overflows the service's
+        output limit, search the region again in smaller cones until all
+        matching spectra are found.
+
+        The region is covered by seven cones of half its size, which are
+        split in the same way while they overflow, up to ``max_depth``
+        times.  Spectra outside the original region and spectra found
+        before are dropped.
+
+        Parameters
+        ----------
+        pos : `~astropy.coordinates.SkyCoord` class or sequence of two floats
+            the position of the center of the circular search region.
+            assuming icrs decimal degrees if unit is not specified.
+        diameter : `~astropy.units.Quantity` class or scalar float
+            the diameter of the circular region around pos in which to search.
+            assuming icrs decimal degrees if unit is not specified.
+        key : str
+            the name of a column identifying the spectra; by default, the
+            column with the utype ``ssa:Access.Reference``.
+        max_depth : int
+            how often a cone may be split
+        max_workers : int
+            the maximal number of queries running at the same time
+        progress : callable
+            called with a `~pyvo.dal.continuation.Progress` after each
+            query
+        **keywords :
+           further constraints for all queries, as in `search`.
+
+        Returns
+        -------
+        SSAResults
+           a container holding a table of all matching spectra
+        """
+        query = self.create_query(pos=pos, diameter=diameter)
+        ra, dec = (float(value) for value in query["POS"].split(","))
+
+        def make_query(ra, dec, radius):
+            return self.create_query(
+                pos=(ra, dec), diameter=2 * radius, **keywords)
+
+        return run_cone_continued(
+            make_query, SSAResults, ra, dec, query["SIZE"] / 2,
+            key=key or (
+                lambda results: results.fieldname_with_utype(
+                    "ssa:Access.Reference")),
+            positions=_spectrum_positions, max_depth=max_depth,
+            max_workers=max_workers, progress=progress, session=self._session)
+
     def create_query(
             self, pos=None, *, diameter=None, band=None, time=None, format=None,
             request="queryData", **keywords):
@@ -575,6 +630,15 @@ class SSAQuery(DALQuery):
         return SSAResults(self.execute_votable(), url=self.queryurl, session=self._session)
 
 
+def _spectrum_positions(results):
+    # the positions of the spectra of SSAResults
+    name = results.fieldname_with_utype("ssa:Target.Pos")
+    if name is None:
+        return None
+    pos = results.getcolumn(name)
+    return pos[:, 0], pos[:, 1], 0
+
+
 class SSAResults(DatalinkResultsMixin, DALResults):
     """
     The list of matching images resulting from a spectrum (SSA) query.
@@ -661,6 +725,8 @@ class SSARecord(SodaRecordMixin, DatalinkRecordMixin, Record):
     operator) where *key* is table column name.
     """
 
+    __slots__ = ()
+
     @property
     def ra(self):
         """
@@ -0,0 +1,402 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Reading VOTable responses in chunks of rows while they arrive.
+
+astropy's VOTable parser only returns once the whole document has been
+read.  The functions here re-use astropy for the table metadata and the
+field converters, but hand out the rows of the results table in fixed-size
+chunks, so memory use is bounded by the chunk size and the first rows are
+available long before the transfer is complete.
+"""
+import base64
+import copy
+import io
+import re
+from warnings import warn
+
+from astropy.io.votable import conf as votable_conf
+from astropy.io.votable.converters import bitarray_to_bool
+from astropy.io.votable.tree import VOTableFile
+from astropy.utils.xml import iterparser
+
+from .exceptions import DALFormatError, DALQueryError, DALOverflowWarning
+
+__all__ = ["iter_votable_chunks"]
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# the number of bytes read from the response at a time
+STREAM_BLOCK_SIZE = 2 ** 16
+
+
+def _until_data(iterator, state):
+    # pass on events up to and including the start of the first DATA
+    # element; astropy's parsers then finish the elements they are in.
+    for event in iterator:
+        yield event
+        if event[0] and event[1] == "DATA":
+            state["data"] = True
+            return
+
+
+def _check_status(infos, url):
+    for info in infos:
+        if info.name.lower() == "query_status":
+            _handle_status(info.value, info.content, url)
+
+
+def _handle_status(value, content, url):
+    if value.lower() == "error":
+        raise DALQueryError(content, value, url)
+    elif value.lower() == "overflow":
+        warn("Partial result set. Potential causes MAXREC, async storage space, etc.",
+             category=DALOverflowWarning)
+
+
+def _header_infos(votable, table):
+    # QUERY_STATUS may be in the VOTABLE, in the RESOURCE or in the TABLE
+    infos = list(votable.infos)
+    for resource in votable.resources:
+        infos.extend(resource.infos)
+    infos.extend(table.infos)
+    return infos
+
+
+def _make_chunk(table, rows, masks, config):
+    chunk = copy.copy(table)
+    chunk.create_arrays(nrows=len(rows), config=config)
+    if rows:
+        chunk.array[:] = rows
+        chunk.array.mask[:] = masks
+    return chunk
+
+
+def _iter_tabledata(iterator, fields, config, chunk_size):
+    parsers = [field.converter.parse for field in fields]
+    binparsers = [field.converter.binparse for field in fields]
+    row_default = [field.converter.default for field in fields]
+    mask_default = [True] * len(fields)
+
+    rows, masks = [], []
+    for start, tag, data, pos in iterator:
+        if start and tag == "TR":
+            row = row_default[:]
+            row_mask = mask_default[:]
+            i = 0
+            binary = False
+            for start, tag, data, pos in iterator:
+                if start:
+                    binary = data.get("encoding") == "base64"
+                elif tag == "TD":
+                    if i >= len(fields):
+                        raise ValueError(
+                            "row at line {} has more cells than FIELDs".format(pos[0]))
+                    if binary:
+                        read = io.BytesIO(base64.b64decode(data.encode("ascii"))).read
+                        row[i], row_mask[i] = binparsers[i](read)
+                    else:
+                        row[i], row_mask[i] = parsers[i](data, config, pos)
+                    i += 1
+                elif tag == "TR":
+                    break
+
+            rows.append(tuple(row))
+            masks.append(tuple(row_mask))
+            if len(rows) == chunk_size:
+                yield rows, masks
+                rows, masks = [], []
+
+        elif not start and tag == "TABLEDATA":
+            break
+
+    if rows:
+        yield rows, masks
+
+
+class _StreamSplitter:
+    """
+    a read function for the XML parser that holds back the content of
+    STREAM elements; it is read in pieces through `read_stream` instead,
+    so the parser never has to collect the text of a whole STREAM.
+
+    astropy's parser takes a short read for the end of the document, so
+    where the text handed out stops early, before a STREAM start tag or
+    after it, it is padded with blanks.
+    """
+    _stream_start = re.compile(rb"<(?:[\w.-]+:)?STREAM\b[^>]*>")
+
+    # how far to look for STREAM start tags crossing the end of a read
+    _lookahead = 1024
+
+    def __init__(self, read, blocksize=STREAM_BLOCK_SIZE):
+        self._read = read
+        self._blocksize = blocksize
+        self._buffer = b""
+        self._eof = False
+        self.in_stream = False
+
+    def _fill(self):
+        if self._eof:
+            return False
+        data = self._read(self._blocksize)
+        if not data:
+            self._eof = True
+            return False
+        self._buffer += data
+        return True
+
+    def read(self, size):
+        """
+        the next ``size`` bytes of XML text for the parser, ending after
+        the start tag of a STREAM at the latest.
+        """
+        while self.in_stream:
+            # the content of the STREAM was not read; skip it
+            self.read_stream(self._blocksize)
+
+        while len(self._buffer) < size + self._lookahead and self._fill():
+            pass
+
+        end = min(size, len(self._buffer))
+        for match in self._stream_start.finditer(self._buffer):
+            if match.start() >= end:
+                break
+            if match.group().endswith(b"/>"):
+                continue
+            if match.end() <= size:
+                end = match.end()
+                self.in_stream = True
+            else:
+                end = match.start()
+            break
+
+        out, self._buffer = self._buffer[:end], self._buffer[end:]
+        if self.in_stream or self._buffer:
+            out += b" " * (size - len(out))
+        return out
+
+    def read_stream(self, size):
+        """
+        the next piece of the content of the current STREAM; empty when it
+        is exhausted.
+        """
+        if self.in_stream and not self._buffer:
+            self._fill()
+        # base64 has no "<"; it starts the end tag
+        end = self._buffer.find(b"<")
+        if end == -1:
+            end = len(self._buffer)
+        if not self.in_stream or end == 0:
+            self.in_stream = False
+            return b""
+
+        end = min(end, size)
+        out, self._buffer = self._buffer[:end], self._buffer[end:]
+        return out
+
+
+class _Base64Reader:
+    """
+    decodes base64 text from ``read_text`` in pieces whose length is a
+    multiple of 4, keeping only the undecoded rest in memory.
+    """
+
+    def __init__(self, read_text, blocksize=STREAM_BLOCK_SIZE):
+        self._read_text = read_text
+        self._blocksize = blocksize
+        self._text = b""
+        self._data = b""
+        self._pos = 0
+        self.max_buffered = 0
+
+    def read(self, length):
+        while len(self._data) - self._pos < length:
+            text = self._read_text(self._blocksize)
+            if not text:
+                break
+            self._text += text.translate(None, b" \t\r\n")
+            usable = len(self._text) - len(self._text) % 4
+            self._data = self._data[self._pos:] + base64.b64decode(
+                self._text[:usable])
+            self._pos = 0
+            self._text = self._text[usable:]
+            self.max_buffered = max(
+                self.max_buffered, len(self._data) + len(self._text))
+
+        result = self._data[self._pos:self._pos + length]
+        self._pos += len(result)
+        if len(result) != length:
+            raise EOFError
+        return result
+
+
+def _open_stream(iterator, stream):
+    # returns a function reading the decoded content of the STREAM of a
+    # BINARY or BINARY2 element, or None if there is none
+    for start, tag, data, pos in iterator:
+        if tag == "STREAM":
+            if start:
+                if "href" in data:
+                    raise NotImplementedError(
+                        "Remote STREAMs cannot be read in chunks")
+                if data.get("encoding", "base64") != "base64":
+                    raise NotImplementedError(
+                        "Inline STREAMs with {} encoding cannot be read"
+                        .format(data["encoding"]))
+                if stream.in_stream:
+                    return _Base64Reader(stream.read_stream).read
+            else:
+                # the parser has collected the text after all
+                text = [data.encode("ascii")]
+                return _Base64Reader(
+                    lambda size: text.pop() if text else b"").read
+    return None
+
+
+def _iter_binary(mode, careful_read, fields, chunk_size):
+    if careful_read is None:
+        return
+
+    binparsers = [field.converter.binparse for field in fields]
+    is_string = [field.datatype in ("char", "unicodeChar") for field in fields]
+    nmaskbytes = (len(fields) + 7) // 8
+
+    rows, masks = [], []
+    while True:
+        row_mask = []
+        try:
+            if mode == 2:
+                row_mask = [
+                    flag and not string for flag, string in zip(
+                        bitarray_to_bool(careful_read(nmaskbytes), len(fields)),
+                        is_string)]
+            row = []
+            for i, binparse in enumerate(binparsers):
+                value, value_mask = binparse(careful_read)
+                row.append(value)
+                if mode == 1:
+                    row_mask.append(value_mask)
+                else:
+                    row_mask[i] = row_mask[i] or value_mask
+        except EOFError:
+            break
+
+        rows.append(tuple(row))
+        masks.append(tuple(row_mask))
+        if len(rows) == chunk_size:
+            yield rows, masks
+            rows, masks = [], []
+
+    if rows:
+        yield rows, masks
+
+
+def _iter_rows(iterator, fields, config, chunk_size, stream):
+    for start, tag, data, pos in iterator:
+        if not start:
+            continue
+
+        if tag == "TABLEDATA":
+            return _iter_tabledata(iterator, fields, config, chunk_size)
+        elif tag == "BINARY":
+            return _iter_binary(
+                1, _open_stream(iterator, stream), fields, chunk_size)
+        elif tag == "BINARY2":
+            return _iter_binary(
+                2, _open_stream(iterator, stream), fields, chunk_size)
+        else:
+            raise NotImplementedError(
+                "{} serialization cannot be read in chunks".format(tag))
+    return iter(())
+
+
+def iter_votable_chunks(read, *, chunk_size=DEFAULT_CHUNK_SIZE, url=None):
+    """
+    Parse a VOTable from ``read`` and yield the rows of its first table
+    in chunks.
+
+    The document is parsed as it comes in.  The base64 text of BINARY and
+    BINARY2 tables is decoded piece by piece, so it is never held in
+    memory as a whole.
+
+    Parameters
+    ----------
+    read : callable or file-like
+        the source of the VOTable document
+    chunk_size : int
+        the number of rows per chunk; the last chunk may be shorter.
+    url : str
+        the URL of the document, used in error messages
+
+    Yields
+    ------
+    `astropy.io.votable.tree.TableElement`
+        copies of the table element (with fields, params and infos from the
+        table header) whose ``array`` holds the next ``chunk_size`` rows as
+        a masked structured numpy array.
+
+    Raises
+    ------
+    DALQueryError
+        if the document's QUERY_STATUS is ERROR
+    DALFormatError
+        if the document has no table or its serialization cannot be read
+        in chunks
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be positive")
+
+    config = {
+        "invalid": "exception",
+        "verify": votable_conf.verify,
+        "chunk_size": chunk_size,
+        "filename": url,
+    }
+
+    if not callable(read):
+        read = read.read
+    stream = _StreamSplitter(read)
+
+    with iterparser.get_xml_iterator(stream.read) as iterator:
+        state = {"data": False}
+        votable = VOTableFile(config=config, pos=(1, 1)).parse(
+            _until_data(iterator, state), config)
+
+        tables = list(votable.iter_tables())
+        if not state["data"] or not tables:
+            # no rows; this may still be a valid empty table or an error
+            _check_status(
+                _header_infos(votable, tables[0]) if tables else votable.infos, url)
+            if not tables:
+                raise DALFormatError(
+                    reason="VOTable response missing results table", url=url)
+            yield _make_chunk(tables[-1], [], [], config)
+            return
+
+        table = tables[-1]
+        _check_status(_header_infos(votable, table), url)
+        fields = table.fields
+        if not fields:
+            raise DALFormatError(
+                reason="response table missing column descriptions.", url=url)
+
+        try:
+            chunks = _iter_rows(iterator, fields, config, chunk_size, stream)
+        except NotImplementedError as ex:
+            raise DALFormatError(reason=str(ex), url=url)
+
+        yielded = False
+        for rows, masks in chunks:
+            yielded = True
+            yield _make_chunk(table, rows, masks, config)
+        if not yielded:
+            yield _make_chunk(table, [], [], config)
+
+        # QUERY_STATUS may also follow the data
+        status = None
+        for start, tag, data, pos in iterator:
+            if start and tag == "INFO" and data.get("name", "").lower() == "query_status":
+                status = data.get("value", "")
+            elif not start and tag == "INFO" and status is not None:
+                _handle_status(status, data, url)
+                status = None
@@ -13,13 +13,20 @@ from astropy.io.votable import parse as votableparse
 
 from .query import (
     DALResults, DALQuery, DALService, Record, UploadList,
-    DALServiceError, DALQueryError)
-from .vosi import AvailabilityMixin, CapabilityMixin, VOSITables
+    DALServiceError, DALQueryError, _iter_stream_chunks)
+from .continuation import run_continued
+from .partition import DEFAULT_CHUNK_ROWS, run_partitioned, run_upload_join
+from .scheduler import run_async_jobs
+from .streaming import DEFAULT_CHUNK_SIZE
+from .vosi import (
+    AvailabilityMixin, CapabilityMixin, VOSITables, _cached_metadata,
+    _peek_cached_metadata)
 from .adhoc import DatalinkResultsMixin, DatalinkRecordMixin, SodaRecordMixin
 
 from ..io import vosi, uws
 from ..io.vosi import tapregext as tr
 
+from ..utils.cache import make_cache_key
 from ..utils.formatting import para_format_desc
 from ..utils.http import use_session
 from ..utils.prototype import prototype_feature
@@ -38,6 +45,40 @@ TABLE_UPLOAD_FORMAT = {'tsv': 'text/tab-separated-values',
 # file formats supported by table create and their corresponding MIME types
 TABLE_DEF_FORMAT = {'VOSITable': 'text/xml',
                     'VOTable': 'application/x-votable+xml'}
+# VOTable serializations to request for query results if the service offers
+# them, cheapest to parse first, with their TAPRegExt ids and MIME types
+RESULT_FORMATS = [
+    ("ivo://ivoa.net/std/TAPRegExt#output-votable-binary2",
+     "application/x-votable+xml;serialization=binary2"),
+    ("ivo://ivoa.net/std/TAPRegExt#output-votable-binary",
+     "application/x-votable+xml;serialization=binary")]
+
+
+def _normalize_mime(mime):
+    return mime.replace(" ", "").lower()
+
+
+def _choose_result_format(outputformats):
+    """
+    returns the RESPONSEFORMAT to request for the cheapest-to-parse result
+    format among the `~pyvo.io.vosi.tapregext.OutputFormat` instances
+    in ``outputformats``, or None if none of `RESULT_FORMATS` is offered.
+    """
+    by_id, by_mime = {}, {}
+    for outputformat in outputformats:
+        if outputformat.ivo_id:
+            by_id.setdefault(outputformat.ivo_id.lower(), outputformat)
+        for name in [outputformat.mime, *outputformat.aliases]:
+            if name:
+                by_mime.setdefault(_normalize_mime(name), outputformat)
+
+    for ivo_id, mime in RESULT_FORMATS:
+        outputformat = by_id.get(ivo_id.lower()) or by_mime.get(
+            _normalize_mime(mime))
+        if outputformat is not None:
+            return outputformat.mime or next(iter(outputformat.aliases), mime)
+
+    return None
 
 
 def _from_ivoa_format(datetime_str):
@@ -107,7 +148,14 @@ class TAPService(DALService, AvailabilityMixin, CapabilityMixin):
     _tables = None
     _examples = None
 
-    def __init__(self, baseurl, *, capability_description=None, session=None):
+    #: ``"gzip"`` to compress the content of inline uploads in queries to
+    #: this service.  TAPRegExt has no way to declare support for this, so
+    #: it is only enabled on request; most services recognize compressed
+    #: uploads by their content.
+    upload_compression = None
+
+    def __init__(self, baseurl, *, capability_description=None, session=None,
+                 response_format="auto"):
         """
         instantiate a Table Access Protocol service
 
@@ -117,9 +165,16 @@ class TAPService(DALService, AvailabilityMixin, CapabilityMixin):
            the base URL that should be used for forming queries to the service.
         session : object
            optional session to use for network requests
+        response_format : str
+           the RESPONSEFORMAT to request for query results.  By default
+           ("auto"), the fastest-to-parse VOTable serialization the service
+           offers is used once its capabilities are known; None leaves the
+           choice to the service.
         """
         super().__init__(baseurl, session=session, capability_description=capability_description)
 
+        self._response_format = response_format
+
         # Check if the session has an update_from_capabilities attribute.
         # This means that the session is aware of IVOA capabilities,
         # and can use this information in processing network requests.
@@ -141,6 +196,49 @@ class TAPService(DALService, AvailabilityMixin, CapabilityMixin):
         raise DALServiceError("Invalid TAP service: Does not"
             " expose a tr:TableAccess capability")
 
+    @property
+    def response_format(self):
+        """
+        the RESPONSEFORMAT requested for query results, or None if the
+        service's default is used.
+
+        Unless set explicitly, this is BINARY2 or BINARY VOTable if the
+        service lists one of them among its output formats.  No request is
+        made for this: the capabilities are only consulted once they have
+        been loaded, or if they are in the metadata cache (see
+        `~pyvo.dal.enable_metadata_cache`); until then, the service default
+        is used.  A RESPONSEFORMAT passed to the query methods takes
+        precedence.
+        """
+        if self._response_format != "auto":
+            return self._response_format
+
+        capabilities = self.__dict__.get("capabilities")
+        if capabilities is None:
+            capabilities = _peek_cached_metadata(self.baseurl, "capabilities")
+            if capabilities is None:
+                return None
+
+        for capability in capabilities:
+            if isinstance(capability, tr.TableAccess):
+                self._response_format = _choose_result_format(
+                    capability.outputformats)
+                break
+        else:
+            self._response_format = None
+        return self._response_format
+
+    @response_format.setter
+    def response_format(self, response_format):
+        self._response_format = response_format
+
+    def _with_response_format(self, keywords):
+        response_format = self.response_format
+        if response_format is None or any(
+                key.upper() == "RESPONSEFORMAT" for key in keywords):
+            return keywords
+        return dict(keywords, RESPONSEFORMAT=response_format)
+
     @property
     def tables(self):
         """
@@ -149,28 +247,34 @@ class TAPService(DALService, AvailabilityMixin, CapabilityMixin):
         if self._tables is None:
             tables_url = '{}/tables'.format(self.baseurl)
 
-            response = self._session.get(tables_url, stream=True)
-
-            try:
-                response.raise_for_status()
-            except requests.RequestException as ex:
-                raise DALServiceError.from_except(ex, tables_url)
-
-            # requests doesn't decode the content by default
-            response.raw.read = partial(response.raw.read, decode_content=True)
-
             self._tables = VOSITables(
-                vosi.parse_tables(response.raw.read), tables_url)
+                _cached_metadata(
+                    tables_url, "tables",
+                    partial(self._get_metadata, tables_url),
+                    lambda response: vosi.parse_tables(
+                        response.raw.read, lazy=True)),
+                tables_url)
         return self._tables
 
-    def _parse_examples(self, examples_uri, *, depth=0):
-        """returns the TAP queries from a DALI examples URI.
+    def _get_metadata(self, url, headers=None):
+        response = self._session.get(url, stream=True, headers=headers)
+
+        try:
+            response.raise_for_status()
+        except requests.RequestException as ex:
+            raise DALServiceError.from_except(ex, url)
+        return response
+
+    def _parse_examples(self, examples_uri, *, depth=0, response=None):
+        """returns the texts of the TAP queries from a DALI examples URI
+        (or its ``response`` if already retrieved).
         """
         if depth > 5:
             raise DALServiceError("Suspecting endless recursion when"
                 " parsing TAP examples")
 
-        response = self._session.get(examples_uri, stream=True)
+        if response is None:
+            response = self._session.get(examples_uri, stream=True)
         if response.status_code == 404:
             return []
 
@@ -186,14 +290,13 @@ class TAPService(DALService, AvailabilityMixin, CapabilityMixin):
         except Exception as ex:
             raise DALServiceError.from_except(ex, examples_uri)
 
-        examples = [TAPQuery(self.baseurl, example.text)
-            for example in exampleElements]
+        texts = [example.text for example in exampleElements]
 
         for continuation in root.findall('.//*[@property="continuation"]'):
-            examples.extend(
-                self._parse_examples(continuation.get("href"), depth=depth + 1))
+            texts.extend(self._parse_examples(
+                continuation.get("href"), depth=depth + 1))
 
-        return examples
+        return texts
 
     @property
     def examples(self):
@@ -203,7 +306,19 @@ class TAPService(DALService, AvailabilityMixin, CapabilityMixin):
         if self._examples is None:
             examples_url = '{}/examples'.format(self.baseurl)
 
-            self._examples = self._parse_examples(examples_url)
+            def fetch(headers):
+                try:
+                    return self._session.get(
+                        examples_url, stream=True, headers=headers)
+                except requests.RequestException as ex:
+                    raise DALServiceError.from_except(ex, examples_url)
+
+            # the query texts are cached rather than the query objects
+            texts = _cached_metadata(
+                examples_url, "examples", fetch,
+                lambda response: self._parse_examples(
+                    examples_url, response=response))
+            self._examples = [TAPQuery(self.baseurl, text) for text in texts]
         return self._examples
 
     @property
@@ -319,7 +434,8 @@ class TAPService(DALService, AvailabilityMixin, CapabilityMixin):
         """
         job = AsyncTAPJob.create(
             self.baseurl, query, language=language, maxrec=maxrec, uploads=uploads,
-            session=self._session, **keywords)
+            session=self._session, upload_compression=self.upload_compression,
+            **self._with_response_format(keywords))
         job = job.run().wait()
         job.raise_if_error()
         result = job.fetch_result()
@@ -327,6 +443,232 @@ class TAPService(DALService, AvailabilityMixin, CapabilityMixin):
 
         return result
 
+    def run_async_batch(
+            self, queries, *, max_running=4, timeout=600., submit_retries=3,
+            **keywords):
+        """
+        runs many queries as async jobs, keeping at most ``max_running`` of
+        them executing on the service at a time, and yields their results as
+        the jobs finish.
+
+        A new job is submitted as soon as one finishes.  Results are
+        fetched right away on up to ``max_running`` threads, while further
+        jobs run, and each job is deleted on the service once its result is
+        in or it has failed.  If the service turns down a job
+        because it is busy (HTTP 429 or 503), the submission is retried
+        later.  When the iteration is stopped early, jobs still running are
+        aborted and no further jobs are submitted.
+
+        Parameters
+        ----------
+        queries : iterable
+            the queries to run, either as query strings or as dictionaries
+            of `submit_job` arguments (e.g., ``query`` and ``uploads``)
+        max_running : int
+            the maximal number of jobs executing on the service at the same
+            time; finished jobs stay until their results are fetched.
+        timeout : float
+            the timeout in seconds for each request while waiting for a job.
+        submit_retries : int
+            how often to retry submitting a job the service turned down
+            because it was busy.
+        **keywords :
+            further arguments to `submit_job` common to all queries,
+            e.g. ``language`` or ``maxrec``
+
+        Yields
+        ------
+        tuple
+            pairs of the index of a query in ``queries`` and its outcome,
+            which is either a `TAPResults` instance or a
+            `~pyvo.dal.SearchFailure` with the error that made the job fail.
+
+        Examples
+        --------
+        >>> queries = [query_template.format(field) for field in fields]  # doctest: +SKIP
+        >>> for index, result in service.run_async_batch(queries, max_running=8):  # doctest: +SKIP
+        ...     if isinstance(result, SearchFailure):
+        ...         print(fields[index], result.error)
+        """
+        return run_async_jobs(
+            self, queries, max_running=max_running, timeout=timeout,
+            submit_retries=submit_retries, **keywords)
+
+    def run_partitioned(
+            self, query, partitions, *, mode="sync", max_workers=4,
+            retries=2, maxrec=None, **keywords):
+        """
+        runs a query too large for a single response in partitions and
+        returns the concatenated result.
+
+        ``query`` contains the placeholder ``{partition}`` where an ADQL
+        condition selecting the rows of a partition is inserted, e.g.
+        ``SELECT * FROM gaia.dr3lite WHERE {partition} AND phot_g_mean_mag
+        < 18``.  One query per partition is run, at most ``max_workers`` at
+        a time, and the rows of the results are put together in the order
+        of ``partitions``.  Partitions whose result overflows the output
+        limit are split in halves and run again where they can be split;
+        otherwise, the result is marked as an overflow.
+
+        Parameters
+        ----------
+        query : str
+            the query with the ``{partition}`` placeholder
+        partitions : list
+            the partitions, e.g. from `~pyvo.dal.partition.value_partitions`
+            or `~pyvo.dal.partition.healpix_partitions`; plain ADQL
+            conditions (which are not split further) work as well.  Rows
+            that no partition selects, e.g. those with NULL values, are
+            not in the result.
+        mode : str
+            run the queries as ``sync`` queries or as ``async`` jobs
+        max_workers : int
+            the maximal number of queries running at the same time
+        retries : int
+            how often to retry a failed partition; query errors are not
+            retried
+        maxrec : int
+            the maximum records to return per partition; defaults to the
+            service's hard limit
+        **keywords :
+            further arguments to `create_query` or `submit_job` common to
+            all partitions
+
+        Returns
+        -------
+        TAPResults
+            the rows of all partitions
+
+        Raises
+        ------
+        ValueError
+            if the query has no placeholder or there are no partitions
+        DALServiceError, DALQueryError
+            if the query of any partition fails
+
+        Examples
+        --------
+        >>> from pyvo.dal.partition import value_partitions  # doctest: +SKIP
+        >>> result = service.run_partitioned(  # doctest: +SKIP
+        ...     "SELECT * FROM ivoa.obscore WHERE {partition}",
+        ...     value_partitions("t_min", 50000., 60000., 10))
+        """
+        return run_partitioned(
+            self, query, partitions, mode=mode, max_workers=max_workers,
+            retries=retries, maxrec=maxrec, **keywords)
+
+    def run_continued(
+            self, query, *, key, mode="sync", maxrec=None, progress=None,
+            **keywords):
+        """
+        runs a query and, while the result overflows the output limit,
+        follow-up queries fetching the remaining rows, and returns all rows
+        as one result.
+
+        The query is run as a subquery ordered by ``key``; each follow-up
+        query asks for the rows after the last key received, so no row is
+        transferred twice.  ``key`` must therefore identify the rows
+        uniquely, and the service must support subqueries in FROM.
+
+        Parameters
+        ----------
+        query : str
+            the query string
+        key : str
+            the name of a result column with unique values, e.g. a
+            primary key
+        mode : str
+            run the queries as ``sync`` queries or as ``async`` jobs
+        maxrec : int
+            the maximum records to return per query; defaults to the
+            service default
+        progress : callable
+            called with a `~pyvo.dal.continuation.Progress` after each
+            query
+        **keywords :
+            further arguments to `run_sync` or `run_async`
+
+        Returns
+        -------
+        TAPResults
+            all rows of the query, in the order of ``key``
+
+        Raises
+        ------
+        DALServiceError, DALQueryError
+            if one of the queries fails
+
+        Examples
+        --------
+        >>> result = service.run_continued(  # doctest: +SKIP
+        ...     "SELECT source_id, ra, dec FROM gaia.dr3lite"
+        ...     " WHERE phot_g_mean_mag < 12", key="source_id",
+        ...     progress=print)
+        """
+        return run_continued(
+            self, query, key=key, mode=mode, maxrec=maxrec, progress=progress,
+            **keywords)
+
+    def run_upload_join(
+            self, query, uploads, *, chunk_rows=DEFAULT_CHUNK_ROWS, workers=4,
+            split=None, index_column="pyvo_row", mode="sync", retries=2,
+            maxrec=None, **keywords):
+        """
+        runs a query joining against a large uploaded table in chunks of
+        its rows and returns the combined result.
+
+        The uploaded table is cut into chunks of ``chunk_rows`` rows, each
+        with an added column ``index_column`` containing the row numbers in
+        the full table, and ``query`` is run for each chunk, at most
+        ``workers`` at a time.  If the query selects ``index_column``, the
+        result rows are put into the order of the uploaded rows; otherwise,
+        they are in the order of the chunks.  Chunks that fail other than
+        by a query error are retried, and chunks whose result overflows the
+        output limit are split in halves and run again.
+
+        Parameters
+        ----------
+        query : str
+            the query, e.g. ``SELECT u.pyvo_row, g.* FROM TAP_UPLOAD.t AS u
+            JOIN gaia.dr3lite AS g ON ...``
+        uploads : dict
+            a mapping from table names to objects containing a votable,
+            as in `run_sync`.
+        chunk_rows : int
+            the number of rows per chunk
+        workers : int
+            the maximal number of queries running at the same time
+        split : str
+            the name of the upload to cut into chunks; may be left out if
+            there is only one `~astropy.table.Table` or
+            `~pyvo.dal.DALResults` upload.
+        index_column : str
+            the name of the row number column added to the chunks
+        mode : str
+            run the queries as ``sync`` queries or as ``async`` jobs
+        retries : int
+            how often to retry a failed chunk
+        maxrec : int
+            the maximum records to return per chunk; defaults to the
+            service's hard limit
+        **keywords :
+            further arguments to `create_query` or `submit_job`
+
+        Returns
+        -------
+        TAPResults
+            the rows of all chunks
+
+        Raises
+        ------
+        DALServiceError, DALQueryError
+            if the query of a chunk fails for good
+        """
+        return run_upload_join(
+            self, query, uploads, chunk_rows=chunk_rows, workers=workers,
+            split=split, index_column=index_column, mode=mode,
+            retries=retries, maxrec=maxrec, **keywords)
+
     def submit_job(
             self, query, *, language="ADQL", maxrec=None, uploads=None,
             **keywords):
@@ -357,7 +699,8 @@ class TAPService(DALService, AvailabilityMixin, CapabilityMixin):
         """
         return AsyncTAPJob.create(
             self.baseurl, query, language=language, maxrec=maxrec, uploads=uploads,
-            session=self._session, **keywords)
+            session=self._session, upload_compression=self.upload_compression,
+            **self._with_response_format(keywords))
 
     def create_query(
             self, query=None, *, mode="sync", language="ADQL", maxrec=None,
@@ -384,9 +727,12 @@ class TAPService(DALService, AvailabilityMixin, CapabilityMixin):
         uploads : dict
             a mapping from table names to objects containing a votable.
         """
-        return TAPQuery(
+        tapquery = TAPQuery(
             self.baseurl, query, mode=mode, language=language, maxrec=maxrec,
-            uploads=uploads, session=self._session, **keywords)
+            uploads=uploads, session=self._session,
+            **self._with_response_format(keywords))
+        tapquery.upload_compression = self.upload_compression
+        return tapquery
 
     def get_job(self, job_id):
         """
@@ -616,7 +962,7 @@ class AsyncTAPJob:
     @classmethod
     def create(
             cls, baseurl, query, *, language="ADQL", maxrec=None, uploads=None,
-            session=None, **keywords):
+            session=None, upload_compression=None, **keywords):
         """
         creates a async tap job on the server under ``baseurl``
 
@@ -635,11 +981,18 @@ class AsyncTAPJob:
             a mapping from table names to objects containing a votable
         session : object
            optional session to use for network requests
+        upload_compression : str
+           ``"gzip"`` to compress the content of inline uploads
         """
         tapquery = TAPQuery(
             baseurl, query, mode="async", language=language, maxrec=maxrec,
             uploads=uploads, session=session, **keywords)
+        tapquery.upload_compression = upload_compression
         response = tapquery.submit()
+        try:
+            response.raise_for_status()
+        except requests.RequestException as ex:
+            raise DALServiceError.from_except(ex, tapquery.queryurl)
         job = cls(response.url, session=session)
         return job
 
@@ -653,7 +1006,7 @@ class AsyncTAPJob:
             the job url
         """
         self._url = url
-        self._session = use_session(session)
+        self._session = use_session(session, url=url)
         self._update()
 
     def __enter__(self):
@@ -671,17 +1024,24 @@ class AsyncTAPJob:
         except Exception:
             pass
 
-    def _update(self, wait_for_statechange=False, timeout=10.):
+    def _update(self, wait_for_statechange=False, timeout=10., wait_time=None):
         """
-        updates local job infos with remote values
+        updates local job infos with remote values.
+
+        With ``wait_for_statechange``, this blocks (on UWS 1.1 services)
+        until the phase changes, or at most ``wait_time`` seconds if given.
         """
         try:
             if wait_for_statechange:
+                params = {"WAIT": "-1"}
+                if wait_time is not None:
+                    params["WAIT"] = str(int(wait_time))
+                    phase = getattr(self._job, "phase", None)
+                    if phase:
+                        # only wait while the job is in the phase we know
+                        params["PHASE"] = phase
                 response = self._session.get(
-                    self.url, stream=True, timeout=timeout, params={
-                        "WAIT": "-1"
-                    }
-                )
+                    self.url, stream=True, timeout=timeout, params=params)
             else:
                 response = self._session.get(self.url, stream=True, timeout=timeout)
             response.raise_for_status()
@@ -821,18 +1181,17 @@ class AsyncTAPJob:
         upload a table to the job. the job must not been started.
         """
         uploads = UploadList.fromdict(kwargs)
-        files = {
-            upload.name: upload.fileobj()
-            for upload in uploads
-            if upload.is_inline
-        }
+        fields = [('UPLOAD', uploads.param())]
+        body = uploads.multipart_body(fields)
 
         try:
-            response = self._session.post(
-                '{}/parameters'.format(self.url),
-                data={'UPLOAD': uploads.param()},
-                files=files
-            )
+            if body is None:
+                response = self._session.post(
+                    '{}/parameters'.format(self.url), data=dict(fields))
+            else:
+                response = self._session.post(
+                    '{}/parameters'.format(self.url), data=body,
+                    headers={"Content-Type": body.content_type})
             response.raise_for_status()
         except requests.RequestException as ex:
             raise DALServiceError.from_except(ex, self.url)
@@ -991,10 +1350,7 @@ class AsyncTAPJob:
             msg = msg or "<No useful error from server>"
             raise DALQueryError("Query Error: " + msg, self.url)
 
-    def fetch_result(self):
-        """
-        returns the result votable if query is finished
-        """
+    def _get_result_response(self):
         try:
             response = self._session.get(self.result_uri, stream=True)
             response.raise_for_status()
@@ -1006,8 +1362,37 @@ class AsyncTAPJob:
 
         response.raw.read = partial(
             response.raw.read, decode_content=True)
+        return response
+
+    def fetch_result(self):
+        """
+        returns the result votable if query is finished
+        """
+        response = self._get_result_response()
         return TAPResults(votableparse(response.raw.read), url=self.result_uri, session=self._session)
 
+    def fetch_result_iter(self, *, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        iterates over the rows of the job result in chunks while it is
+        downloaded, as with `~pyvo.dal.DALQuery.execute_iter`.
+
+        Parameters
+        ----------
+        chunk_size : int
+            the number of rows per chunk
+
+        Yields
+        ------
+        `astropy.io.votable.tree.TableElement`
+            table elements with the next ``chunk_size`` rows in ``array``
+        """
+        response = self._get_result_response()
+        try:
+            yield from _iter_stream_chunks(
+                response.raw, chunk_size=chunk_size, url=self.result_uri)
+        finally:
+            response.close()
+
 
 class TAPQuery(DALQuery):
     """
@@ -1029,6 +1414,10 @@ class TAPQuery(DALQuery):
     allowing the caller to take greater control of the result processing.
     """
 
+    #: ``"gzip"`` to compress the content of inline uploads; None sends it
+    #: uncompressed.
+    upload_compression = None
+
     def __init__(
             self, baseurl, query, *, mode="sync", language="ADQL", maxrec=None,
             uploads=None, session=None, **keywords):
@@ -1116,6 +1505,17 @@ class TAPQuery(DALQuery):
         """
         return TAPResults(self.execute_votable(), url=self.queryurl, session=self._session)
 
+    def _cache_key(self, *, post=False):
+        uploads = []
+        for upload in self._uploads:
+            digest = upload.content_hash()
+            if digest is None:
+                return None
+            uploads.append((upload.name, digest))
+
+        # TAP queries are always posted
+        return make_cache_key(super()._cache_key(post=True), uploads)
+
     def submit(self, *, post=False):
         """
         Does the request part of the TAP query.
@@ -1125,14 +1525,14 @@ class TAPQuery(DALQuery):
         """
         url = self.queryurl
 
-        files = {
-            upload.name: upload.fileobj()
-            for upload in self._uploads
-            if upload.is_inline
-        }
-
-        response = self._session.post(
-            url, data=self, stream=True, files=files)
+        body = self._uploads.multipart_body(
+            self.items(), compression=self.upload_compression)
+        if body is None:
+            response = self._session.post(url, data=self, stream=True)
+        else:
+            response = self._session.post(
+                url, data=body, stream=True,
+                headers={"Content-Type": body.content_type})
         # requests doesn't decode the content by default
         response.raw.read = partial(response.raw.read, decode_content=True)
         return response
@@ -1226,4 +1626,4 @@ class TAPResults(DatalinkResultsMixin, DALResults):
 
 
 class TAPRecord(SodaRecordMixin, DatalinkRecordMixin, Record):
-    pass
+    __slots__ = ()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Tests for pyvo.dal.arrow
+"""
+from functools import partial
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from astropy.io.votable import from_table, parse as votableparse
+from astropy.table import Table, MaskedColumn
+from astropy.utils.data import get_pkg_data_contents
+
+from pyvo.dal import DALResults
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+get_pkg_data_contents = partial(
+    get_pkg_data_contents, package=__package__, encoding='binary')
+
+
+def _results(table, tabledata_format='tabledata'):
+    out = BytesIO()
+    from_table(table).to_xml(out, tabledata_format=tabledata_format)
+    return DALResults(votableparse(BytesIO(out.getvalue())))
+
+
+@pytest.fixture()
+def table():
+    table = Table({
+        'id': np.arange(5, dtype=np.int64),
+        'flux': MaskedColumn([1.5, 2.5, 0, 4.5, 5.5], mask=[0, 0, 1, 0, 0]),
+        'name': ['a', 'b', 'c', 'd', 'e'],
+        'pos': np.arange(10, dtype=np.float32).reshape(5, 2),
+    })
+    table['flux'].unit = 'Jy'
+    table['flux'].meta['ucd'] = 'phot.flux'
+    return table
+
+
+@pytest.mark.skipif('not HAS_PYARROW')
+@pytest.mark.parametrize('tabledata_format', ['tabledata', 'binary2'])
+def test_to_arrow(table, tabledata_format):
+    arrow = _results(table, tabledata_format).to_arrow()
+
+    assert arrow.column_names == ['id', 'flux', 'name', 'pos']
+    assert arrow.column('id').to_pylist() == [0, 1, 2, 3, 4]
+    assert arrow.column('flux').to_pylist() == [1.5, 2.5, None, 4.5, 5.5]
+    assert arrow.column('flux').null_count == 1
+    assert arrow.column('name').to_pylist() == ['a', 'b', 'c', 'd', 'e']
+    assert arrow.column('pos').to_pylist()[1] == [2, 3]
+
+    metadata = arrow.schema.field('flux').metadata
+    assert metadata[b'unit'] == b'Jy'
+    assert metadata[b'datatype'] == b'double'
+
+
+@pytest.mark.skipif('not HAS_PYARROW')
+def test_to_arrow_zero_copy():
+    results = _results(Table({'x': np.arange(1000, dtype=np.float64)}))
+    arrow = results.to_arrow()
+
+    buffer = arrow.column('x').chunk(0).buffers()[1]
+    assert buffer.address == results.getcolumn('x').data.ctypes.data
+
+
+@pytest.mark.skipif('not HAS_PYARROW')
+@pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W27")
+@pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W48")
+@pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+def test_to_parquet(tmp_path):
+    results = DALResults(votableparse(
+        BytesIO(get_pkg_data_contents('data/tap/obscore-image.xml'))))
+    path = str(tmp_path / 'result.parquet')
+
+    results.to_parquet(path)
+
+    parquet = pyarrow.parquet.read_table(path)
+    assert parquet.column_names == list(results.fieldnames)
+    assert parquet.num_rows == len(results)
+    assert parquet.column('access_url').to_pylist() == [
+        str(url) for url in results.getcolumn('access_url')]
+    assert parquet.column('t_exptime').null_count == len(results)
+    assert parquet.schema.field('s_ra').metadata[b'ucd'] == b'pos.eq.ra'
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Tests for pyvo.dal.continuation
+"""
+from io import BytesIO
+import re
+import threading
+from urllib.parse import parse_qsl, urlparse
+
+import numpy as np
+import pytest
+
+from astropy.coordinates import angular_separation
+from astropy.io.votable import from_table
+from astropy.io.votable.tree import Info
+from astropy.table import MaskedColumn, Table
+
+from pyvo.dal import TAPService, SCSService, DALOverflowWarning
+
+_CONTINUED = re.compile(
+    r"SELECT \* FROM \((.*)\) AS pyvo_continued(?: WHERE n > (\d+))?"
+    r" ORDER BY n$")
+
+
+def _votable(table, status, ucds=None):
+    votable = from_table(table)
+    votable.resources[0].type = 'results'
+    votable.resources[0].infos.append(Info(name='QUERY_STATUS', value=status))
+    for field in votable.get_first_table().fields:
+        field.ucd = (ucds or {}).get(field.name)
+    out = BytesIO()
+    votable.to_xml(out)
+    return out.getvalue()
+
+
+def _query_status(result):
+    # cone search results do not evaluate QUERY_STATUS themselves
+    for info in result.votable.iter_info():
+        if info.name == 'QUERY_STATUS':
+            return info.value
+
+
+@pytest.fixture()
+def tap_server(mocker):
+    queries = []
+
+    def callback(request, context):
+        params = dict(parse_qsl(request.body))
+        queries.append(params['QUERY'])
+        inner, last = _CONTINUED.match(params['QUERY']).groups()
+        assert inner == 'SELECT n, n * n AS sq FROM numbers'
+
+        values = np.arange(25)
+        if last is not None:
+            values = values[values > int(last)]
+        status = 'OK'
+        if len(values) > int(params['MAXREC']):
+            values = values[:int(params['MAXREC'])]
+            status = 'OVERFLOW'
+        return _votable(Table({'n': values, 'sq': values ** 2}), status)
+
+    with mocker.register_uri(
+            'POST', 'http://example.com/tap/sync', content=callback):
+        yield queries
+
+
+class _ConeServer:
+    """
+    a cone search service on a catalog of random positions returning at
+    most ``limit`` records.
+    """
+
+    def __init__(self, limit, nullkeys=(), ucds=True):
+        rng = np.random.default_rng(42)
+        self.ra = 10 + rng.uniform(-1, 1, 2000)
+        self.dec = 20 + rng.uniform(-1, 1, 2000)
+        self.limit = limit
+        self.nullkeys = list(nullkeys)
+        self.ucds = ucds
+        self.queries = 0
+        self.radii = []
+        self.returned = 0
+        self.lock = threading.Lock()
+
+    def in_cone(self, ra, dec, radius):
+        return np.rad2deg(angular_separation(
+            np.deg2rad(self.ra), np.deg2rad(self.dec),
+            np.deg2rad(ra), np.deg2rad(dec))) <= radius
+
+    def __call__(self, request, context):
+        params = dict(parse_qsl(urlparse(request.url).query))
+        index = np.nonzero(self.in_cone(
+            float(params['RA']), float(params['DEC']),
+            float(params['SR'])))[0]
+
+        status = 'OK'
+        if len(index) > self.limit:
+            index = index[:self.limit]
+            status = 'OVERFLOW'
+        with self.lock:
+            self.queries += 1
+            self.radii.append(float(params['SR']))
+            self.returned += len(index)
+
+        ids = MaskedColumn(index, mask=np.isin(index, self.nullkeys))
+        return _votable(
+            Table({'id': ids, 'ra': self.ra[index], 'dec': self.dec[index]}),
+            status, {'id': 'meta.id;meta.main', 'ra': 'pos.eq.ra;meta.main',
+                     'dec': 'pos.eq.dec;meta.main'} if self.ucds else None)
+
+
+def test_run_continued(tap_server):
+    service = TAPService('http://example.com/tap', response_format=None)
+    progress = []
+    result = service.run_continued(
+        'SELECT n, n * n AS sq FROM numbers', key='n', maxrec=10,
+        progress=progress.append)
+
+    assert list(result['n']) == list(range(25))
+    assert list(result['sq']) == [n ** 2 for n in range(25)]
+    assert result.query_status == 'OK'
+    assert len(tap_server) == 3
+    assert tap_server[2].endswith('WHERE n > 19 ORDER BY n')
+    assert [(p.queries, p.rows, p.pending) for p in progress] == [
+        (1, 10, 1), (2, 20, 1), (3, 25, 0)]
+
+
+def test_run_continued_async(tap_server, monkeypatch):
+    service = TAPService('http://example.com/tap', response_format=None)
+    calls = []
+
+    def run_async(query, **keywords):
+        # the jobs are run as sync queries against the mock service
+        calls.append(keywords)
+        return service.run_sync(query, **keywords)
+
+    monkeypatch.setattr(service, 'run_async', run_async)
+    result = service.run_continued(
+        'SELECT n, n * n AS sq FROM numbers', key='n', mode='async',
+        maxrec=10)
+
+    assert list(result['n']) == list(range(25))
+    assert len(calls) == len(tap_server) == 3
+    assert all(call['maxrec'] == 10 for call in calls)
+
+    with pytest.raises(ValueError):
+        service.run_continued('SELECT n FROM numbers', key='n', mode='batch')
+
+
+def test_cone_continued(mocker):
+    server = _ConeServer(limit=60)
+    with mocker.register_uri(
+            'GET', 'http://example.com/scs', content=server):
+        service = SCSService('http://example.com/scs')
+        progress = []
+        result = service.search_continued(
+            (10, 20), 0.5, progress=progress.append)
+
+    expected = np.nonzero(server.in_cone(10, 20, 0.5))[0]
+    assert len(expected) > 60
+    assert sorted(result['id']) == list(expected)
+    assert _query_status(result) == 'OK'
+    assert progress[-1].queries == server.queries > 1
+    assert progress[-1].rows == len(expected)
+    assert progress[-1].pending == 0
+
+
+def test_cone_continued_depth(mocker):
+    server = _ConeServer(limit=5)
+    with mocker.register_uri(
+            'GET', 'http://example.com/scs', content=server):
+        service = SCSService('http://example.com/scs')
+        with pytest.warns(DALOverflowWarning):
+            result = service.search_continued((10, 20), 0.5, max_depth=1)
+
+    assert server.queries == 8
+    assert _query_status(result) == 'OVERFLOW'
+    assert len(set(result['id'])) == len(result)
+
+
+def test_cone_continued_max_depth(mocker):
+    server = _ConeServer(limit=5)
+    with mocker.register_uri(
+            'GET', 'http://example.com/scs', content=server):
+        service = SCSService('http://example.com/scs')
+        with pytest.warns(DALOverflowWarning, match='49 cones'):
+            service.search_continued((10, 20), 0.5, max_depth=2)
+
+    # the cone, its 7 subcones and their 49 subcones, but no further
+    assert server.queries == 1 + 7 + 49
+    assert sorted(set(server.radii)) == pytest.approx(
+        [0.5 * 0.51 ** 2, 0.5 * 0.51, 0.5])
+
+
+def test_cone_continued_duplicates(mocker):
+    server = _ConeServer(limit=60, nullkeys=range(0, 2000, 50))
+    with mocker.register_uri(
+            'GET', 'http://example.com/scs', content=server):
+        service = SCSService('http://example.com/scs')
+        result = service.search_continued((10, 20), 0.5)
+
+    expected = np.nonzero(server.in_cone(10, 20, 0.5))[0]
+    # the overlapping subcones return many rows more than once...
+    assert server.returned > len(expected)
+    # ...but each row is kept once, also those without an id
+    assert len(result) == len(expected)
+    ids = result.to_table()['id']
+    assert sorted(ids.compressed()) == [i for i in expected if i % 50]
+    assert len(set(zip(result['ra'], result['dec']))) == len(expected)
+
+
+def test_cone_continued_unidentified(mocker):
+    server = _ConeServer(limit=60, nullkeys=range(0, 2000, 50), ucds=False)
+    with mocker.register_uri(
+            'GET', 'http://example.com/scs', content=server):
+        service = SCSService('http://example.com/scs')
+        with pytest.warns(DALOverflowWarning, match='without a key'):
+            result = service.search_continued((10, 20), 0.5, key='id')
+
+    # rows without an id or position are only taken from the first query
+    ids = result.to_table()['id']
+    assert ids.mask.sum() == 1
+    assert len(set(ids.compressed())) == len(ids.compressed())
+
+
+def test_cone_continued_progress(mocker):
+    server = _ConeServer(limit=5)
+    with mocker.register_uri(
+            'GET', 'http://example.com/scs', content=server):
+        service = SCSService('http://example.com/scs')
+        progress = []
+        with pytest.warns(DALOverflowWarning):
+            result = service.search_continued(
+                (10, 20), 0.5, max_depth=1, progress=progress.append)
+
+    assert [p.queries for p in progress] == list(range(1, 9))
+    # the subcones are known after the first query
+    assert [p.pending for p in progress] == [7, 6, 5, 4, 3, 2, 1, 0]
+    assert progress[0].rows == 5
+    assert all(a.rows <= b.rows for a, b in zip(progress, progress[1:]))
+    assert progress[-1].rows == len(result)
@@ -4,13 +4,20 @@
 Tests for pyvo.dal.datalink
 """
 from functools import partial
+from io import BytesIO
+import threading
+import time
+from urllib.parse import parse_qsl
 
+import numpy as np
 import pytest
 
 import pyvo as vo
-from pyvo.dal.adhoc import DatalinkResults
+from pyvo.dal import TAPResults, DALServiceError
+from pyvo.dal.adhoc import DatalinkQuery, DatalinkResults
 from pyvo.utils import vocabularies
 
+from astropy.io.votable import parse as votableparse
 from astropy.utils.data import get_pkg_data_contents, get_pkg_data_filename
 
 get_pkg_data_contents = partial(
@@ -135,6 +142,155 @@ def test_datalink_batch():
     assert len([_ for _ in results.iter_datalinks()]) == 3
 
 
+def test_datalink_byid():
+    datalinks = DatalinkResults(votableparse(
+        get_pkg_data_filename('data/datalink/cutout1.xml')))
+    first, second = (
+        'ivo://cadc.nrc.ca/MACHO?54150/cal054150r',
+        'ivo://cadc.nrc.ca/MACHO?54151/cal054151b')
+
+    views = list(datalinks.iter_byid())
+    assert [id_ for id_, _ in views] == [first, second]
+    assert [len(view) for _, view in views] == [3, 3]
+    assert [service.ID for service in views[1][1].iter_adhocservices()] == [
+        'soda-2d68bb35-50e4-459b-bfb2-ac2b5da1a5d1',
+        'soda-fadba418-47ec-4a3d-b8ab-8368f3081082']
+    # contiguous rows are not copied
+    assert np.shares_memory(
+        views[0][1].resultstable.array, datalinks.resultstable.array)
+    assert len(datalinks) == 6
+    assert len(list(datalinks.iter_adhocservices())) == 4
+
+    # interleaved IDs
+    datalinks.resultstable.array = datalinks.resultstable.array[
+        [0, 3, 1, 4, 2, 5]]
+    datalinks._byid = None
+    clone = datalinks.clone_byid(second)
+    assert list(clone['ID']) == [second] * 3
+    assert list(clone['service_def']) == list(views[1][1]['service_def'])
+
+    assert len(datalinks.clone_byid('ivo://unknown')) == 0
+
+
+_DATALINK_SOURCE = """<?xml version="1.0" encoding="UTF-8"?>
+<VOTABLE xmlns="http://www.ivoa.net/xml/VOTable/v1.3" version="1.3">
+  <RESOURCE type="results">
+    <TABLE>
+      <FIELD name="obs_publisher_did" ID="pubdid" datatype="char"
+        arraysize="*"/>
+      <DATA><TABLEDATA>{}</TABLEDATA></DATA>
+    </TABLE>
+  </RESOURCE>
+  <RESOURCE type="meta" utype="adhoc:service">
+    <PARAM name="standardID" datatype="char" arraysize="*"
+      value="ivo://ivoa.net/std/DataLink#links-1.0"/>
+    <PARAM name="accessURL" datatype="char" arraysize="*"
+      value="http://example.com/links"/>
+    <GROUP name="inputParams">
+      <PARAM name="ID" datatype="char" arraysize="*" ref="pubdid" value=""/>
+    </GROUP>
+  </RESOURCE>
+</VOTABLE>"""
+
+_LINKS = """<?xml version="1.0" encoding="UTF-8"?>
+<VOTABLE xmlns="http://www.ivoa.net/xml/VOTable/v1.3" version="1.3">
+  <RESOURCE type="results">
+    <TABLE>
+      <FIELD name="ID" datatype="char" arraysize="*"/>
+      <FIELD name="access_url" datatype="char" arraysize="*"/>
+      <FIELD name="service_def" datatype="char" arraysize="*"/>
+      <FIELD name="semantics" datatype="char" arraysize="*"/>
+      <DATA><TABLEDATA>{}</TABLEDATA></DATA>
+    </TABLE>
+  </RESOURCE>
+</VOTABLE>"""
+
+
+class _LinksServer:
+    """
+    a datalink service answering at most ``limit`` IDs per request and
+    failing for requests containing ``broken``.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.batches = []
+        self.running = self.max_running = 0
+        self.lock = threading.Lock()
+
+    def execute(self, execute):
+        # wraps DatalinkQuery.execute to count the requests in flight; the
+        # mocked requests themselves are not run concurrently
+        def wrapped(query, *args, **kwargs):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            try:
+                time.sleep(0.02)
+                return execute(query, *args, **kwargs)
+            finally:
+                with self.lock:
+                    self.running -= 1
+        return wrapped
+
+    def __call__(self, request, context):
+        ids = [value for key, value in parse_qsl(request.body) if key == 'ID']
+        with self.lock:
+            self.batches.append(ids)
+
+        if 'broken' in ids:
+            context.status_code = 500
+            return b''
+        rows = ''.join(
+            '<TR><TD>{0}</TD><TD>http://example.com/{0}/{1}</TD><TD/>'
+            '<TD>#{1}</TD></TR>'.format(id_, semantics)
+            for id_ in ids[:self.limit] for semantics in ('this', 'preview'))
+        return _LINKS.format(rows).encode('utf-8')
+
+
+def _datalink_source(ids):
+    return TAPResults(votableparse(BytesIO(_DATALINK_SOURCE.format(''.join(
+        '<TR><TD>{}</TD></TR>'.format(id_) for id_ in ids)).encode('utf-8'))))
+
+
+def test_datalink_pipelined(mocker, monkeypatch):
+    server = _LinksServer(limit=7)
+    monkeypatch.setattr(
+        DatalinkQuery, 'execute', server.execute(DatalinkQuery.execute))
+    ids = ['ds{}'.format(index) for index in range(40)] + ['ds3']
+    with mocker.register_uri(
+            'POST', 'http://example.com/links', content=server):
+        datalinks = list(_datalink_source(ids).iter_datalinks(max_workers=3))
+
+    assert [links['ID'][0] for links in datalinks] == ids
+    assert [list(links['semantics']) for links in datalinks] == [
+        ['#this', '#preview']] * len(ids)
+
+    # the first request probes the service limit
+    assert len(server.batches[0]) == 40
+    assert all(len(batch) <= 7 for batch in server.batches[1:])
+    assert sorted(sum((batch[:7] for batch in server.batches), [])) == sorted(
+        ids[:40])
+    assert 1 < server.max_running <= 3
+
+
+def test_datalink_pipelined_failure(mocker):
+    server = _LinksServer(limit=100)
+    ids = ['ds{}'.format(index) for index in range(10)]
+    ids[6] = 'broken'
+    with mocker.register_uri(
+            'POST', 'http://example.com/links', content=server):
+        datalinks = _datalink_source(ids).iter_datalinks(batch_size=4)
+        assert [next(datalinks)['ID'][0] for _ in range(6)] == ids[:6]
+        with pytest.raises(DALServiceError):
+            next(datalinks)
+
+    # the failing batch is retried ID by ID
+    assert ['ds4', 'ds5', 'broken', 'ds7'] in server.batches
+    assert ['ds5'] in server.batches
+    assert ['broken'] in server.batches
+
+
 @pytest.mark.usefixtures('proc', 'datalink_vocabulary')
 @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W27")
 @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Tests for pyvo.dal.dbapi2
+"""
+from io import BytesIO
+from urllib.parse import parse_qsl
+
+import numpy as np
+import pytest
+
+from astropy.io.votable import from_table
+from astropy.io.votable.tree import Info
+from astropy.table import MaskedColumn, Table
+
+from pyvo.dal import dbapi2, TAPService
+from pyvo.dal.tests.test_tap import ConcurrentAsyncTAPServer
+
+
+def _votable(table, status, content=None):
+    votable = from_table(table)
+    votable.resources[0].type = 'results'
+    info = Info(name='QUERY_STATUS', value=status)
+    info.content = content
+    votable.resources[0].infos.append(info)
+    out = BytesIO()
+    votable.to_xml(out)
+    return out.getvalue()
+
+
+@pytest.fixture()
+def sync_server(mocker):
+    queries = []
+
+    def callback(request, context):
+        query = dict(parse_qsl(request.body))['QUERY']
+        queries.append(query)
+        if 'broken' in query:
+            return _votable(Table({'n': []}), 'ERROR', 'syntax error')
+        if 'nulls' in query:
+            values = np.arange(5)
+            return _votable(Table({
+                'n': MaskedColumn(values, mask=values % 2 == 1),
+                'x': MaskedColumn(values / 2, mask=values == 4)}),
+                'OK')
+        values = np.arange(25)
+        return _votable(Table({'n': values, 'name': values.astype(str)}), 'OK')
+
+    with mocker.register_uri(
+            'POST', 'http://example.com/tap/sync', content=callback):
+        yield queries
+
+
+def test_connect(sync_server):
+    with dbapi2.connect('http://example.com/tap', chunk_rows=4) as conn:
+        assert isinstance(conn.service, TAPService)
+        cursor = conn.cursor()
+        assert cursor.description is None
+
+        assert cursor.execute('SELECT * FROM numbers') is cursor
+        assert sync_server == ['SELECT * FROM numbers']
+        assert [name for name, _ in cursor.description] == ['n', 'name']
+        assert cursor.description[0][1] == dbapi2.NUMBER
+        assert cursor.description[1][1] == dbapi2.STRING
+
+        # only the first chunk has been read
+        assert cursor.rowcount == -1
+        assert cursor._nrows == 4
+
+        assert cursor.fetchone() == [0, '0']
+        cursor.arraysize = 10
+        assert [row[0] for row in cursor.fetchmany()] == list(range(1, 11))
+        assert cursor._nrows == 12
+        assert [row[0] for row in cursor.fetchall()] == list(range(11, 25))
+        assert cursor.rowcount == 25
+        assert cursor.fetchone() is None
+        assert cursor.fetchmany(5) == []
+
+        cursor.execute('SELECT TOP 5 * FROM numbers')
+        assert [row[0] for row in cursor] == list(range(25))
+
+    assert conn.closed
+    with pytest.raises(dbapi2.InterfaceError):
+        cursor.execute('SELECT * FROM numbers')
+    with pytest.raises(dbapi2.InterfaceError):
+        conn.cursor()
+
+
+def test_arraysize_chunks(sync_server):
+    conn = dbapi2.connect('http://example.com/tap', chunk_rows=4)
+    cursor = conn.cursor()
+    cursor.arraysize = 20
+    cursor.execute('SELECT * FROM numbers')
+    assert cursor._nrows == 20
+    assert len(cursor.fetchmany()) == 20
+    assert len(cursor.fetchmany()) == 5
+    conn.close()
+
+
+def test_nulls(sync_server):
+    with dbapi2.connect('http://example.com/tap', chunk_rows=2) as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM nulls')
+        assert cursor.fetchall() == [
+            [0, 0], [None, 0.5], [2, 1], [None, 1.5], [4, None]]
+        conn.rollback()
+
+
+def test_nulls_legacy_cursor(sync_server):
+    results = TAPService('http://example.com/tap', response_format=None).run_sync(
+        'SELECT * FROM nulls')
+    cursor = results.cursor()
+
+    assert cursor.fetchone() == [0, 0]
+    assert cursor.fetchone() == [None, 0.5]
+    assert cursor.fetchmany(2) == [[2, 1], [None, 1.5]]
+    assert cursor.fetchone() == [4, None]
+    assert cursor.fetchone() is None
+
+    # Python scalars, whether or not there are NULLs in the rows fetched
+    cursor = results.cursor()
+    rows = [cursor.fetchone()] + cursor.fetchall()
+    assert all(type(row[0]) in (int, type(None)) for row in rows)
+    assert all(type(row[1]) in (float, type(None)) for row in rows)
+
+
+def test_errors(sync_server):
+    cursor = dbapi2.connect('http://example.com/tap').cursor()
+    with pytest.raises(dbapi2.ProgrammingError):
+        cursor.fetchall()
+    with pytest.raises(dbapi2.ProgrammingError):
+        cursor.execute('SELECT broken')
+    assert cursor.description is None
+    with pytest.raises(dbapi2.NotSupportedError):
+        cursor.execute('SELECT * FROM numbers WHERE n = ?', (1,))
+
+
+@pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+@pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W27")
+@pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W48")
+def test_async(mocker):
+    server = ConcurrentAsyncTAPServer()
+    for _ in server.use(mocker):
+        conn = dbapi2.connect(
+            TAPService('http://example.com/tap'), mode='async', chunk_rows=3)
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM ivoa.obscore')
+        assert len(cursor.fetchmany(4)) == 4
+        assert server._jobs
+
+        assert len(cursor.fetchall()) == 6
+        assert cursor.rowcount == 10
+        assert server.deleted == 1
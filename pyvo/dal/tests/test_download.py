@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Tests for pyvo.dal.download
+"""
+from io import BytesIO
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from astropy.io import fits
+from astropy.io.votable import parse as votableparse
+
+from pyvo.dal import DALResults, DALServiceError, Record
+from pyvo.dal import download
+from pyvo.dal.download import download_resumable, fetch_to_cache
+from pyvo.utils import cache as cache_module
+from pyvo.utils.cache import DiskCache
+from pyvo.utils.http import create_session
+
+RESULT = b"""<?xml version="1.0" encoding="utf-8"?>
+<VOTABLE xmlns="http://www.ivoa.net/xml/VOTable/v1.3" version="1.3">
+  <RESOURCE type="results">
+    <INFO name="QUERY_STATUS" value="OK"/>
+    <TABLE>
+      <FIELD name="access_url" datatype="char" arraysize="*"
+        utype="obscore:access.reference"/>
+      <FIELD name="content_length" datatype="long"/>
+      <DATA><TABLEDATA>
+        <TR><TD>http://a.example.com/data/0</TD><TD>10</TD></TR>
+        <TR><TD>http://a.example.com/data/1</TD><TD>10</TD></TR>
+        <TR><TD>http://a.example.com/data/2</TD><TD>10</TD></TR>
+        <TR><TD>http://b.example.com/data/3</TD><TD>10</TD></TR>
+        <TR><TD>http://b.example.com/data/broken</TD><TD>10</TD></TR>
+        <TR><TD></TD><TD>10</TD></TR>
+      </TABLEDATA></DATA>
+    </TABLE>
+  </RESOURCE>
+</VOTABLE>
+"""
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(download, 'RETRY_DELAY', 0)
+
+
+@pytest.fixture()
+def results():
+    return DALResults(votableparse(BytesIO(RESULT)))
+
+
+@pytest.fixture()
+def datasets(mocker):
+    lock = threading.Lock()
+    state = {"active": {}, "max_active": 0, "requests": 0}
+
+    def callback(request, context):
+        if request.url.endswith('broken'):
+            context.status_code = 500
+            return b'Internal Error'
+
+        host = request.url.split('/')[2]
+        with lock:
+            state["requests"] += 1
+            state["active"][host] = state["active"].get(host, 0) + 1
+            state["max_active"] = max(
+                state["max_active"], state["active"][host])
+        time.sleep(0.05)
+        with lock:
+            state["active"][host] -= 1
+        return b'0123456789'
+
+    with mocker.register_uri(
+        'GET', re.compile(r'http://[ab]\.example\.com/data/.*'), content=callback
+    ):
+        yield state
+
+
+def test_cachedatasets(results, datasets, tmp_path):
+    manifest = results.cachedatasets(
+        str(tmp_path), workers=4, max_per_host=2)
+
+    assert [entry['status'] for entry in manifest] == [
+        'downloaded', 'downloaded', 'downloaded', 'downloaded', 'failed',
+        'nourl']
+    assert datasets['max_active'] <= 2
+    assert manifest[4]['error'].startswith('DALServiceError')
+
+    filenames = [entry['filename'] for entry in manifest]
+    assert len(set(filenames)) == len(filenames)
+    for entry in manifest[:4]:
+        with open(entry['filename'], 'rb') as f:
+            assert f.read() == b'0123456789'
+        assert entry['size'] == 10
+
+    # no temporary files are left behind
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        [os.path.basename(name) for name in filenames[:4]] + ['manifest.json'])
+
+    with open(os.path.join(tmp_path, 'manifest.json')) as f:
+        assert json.load(f) == manifest
+
+
+def test_cachedatasets_skip(results, datasets, tmp_path):
+    results.cachedatasets(str(tmp_path), manifest=None)
+    requests_made = datasets['requests']
+
+    # a truncated file is downloaded again, complete ones are skipped
+    with open(os.path.join(tmp_path, 'dataset-1.dat'), 'wb') as f:
+        f.write(b'0123')
+
+    manifest = results.cachedatasets(str(tmp_path), manifest=None)
+    assert [entry['status'] for entry in manifest][:4] == [
+        'skipped', 'downloaded', 'skipped', 'skipped']
+    assert datasets['requests'] == requests_made + 1
+    assert not os.path.exists(os.path.join(tmp_path, 'manifest.json'))
+
+
+def test_cachedatasets_estimate(tmp_path):
+    # access_estsize is only an estimate; complete files are kept
+    results = DALResults(votableparse(BytesIO(RESULT.replace(
+        b'name="content_length"', b'name="access_estsize"'))))
+    path = os.path.join(tmp_path, 'dataset.dat')
+    with open(path, 'wb') as f:
+        f.write(b'0' * 5000)
+
+    entry = results.cachedatasets(str(tmp_path), manifest=None)[0]
+    assert entry['filename'] == path
+    assert entry['status'] == 'skipped'
+
+
+def test_cachedatasets_hosts(results, tmp_path, monkeypatch):
+    started = []
+    active = {}
+    lock = threading.Lock()
+
+    def cachedataset(self, *, filename, **kwargs):
+        host = self.getdataurl().split('/')[2]
+        with lock:
+            started.append(host)
+            active[host] = active.get(host, 0) + 1
+            assert active[host] == 1
+        time.sleep(0.05)
+        with open(filename, 'wb') as f:
+            f.write(b'0123456789')
+        with lock:
+            active[host] -= 1
+
+    monkeypatch.setattr(Record, 'cachedataset', cachedataset)
+    manifest = results.cachedatasets(
+        str(tmp_path), workers=2, max_per_host=1, manifest=None)
+
+    assert [entry['status'] for entry in manifest] == [
+        'downloaded'] * 5 + ['nourl']
+    # b.example.com does not wait behind the queue of a.example.com
+    assert started[:2] == ['a.example.com', 'b.example.com']
+
+
+DATA = bytes(range(256)) * 40
+
+
+class _FlakyServer:
+    """
+    serves DATA with range support, breaking off the first ``failures``
+    transfers after ``cut`` bytes.
+    """
+
+    def __init__(self, *, failures=1, cut=1000, etag='"v1"', ranges=True):
+        self.failures = failures
+        self.cut = cut
+        self.etag = etag
+        self.ranges = ranges
+        self.requests = []
+
+    def __call__(self, request, context):
+        self.requests.append(dict(request.headers))
+        start = 0
+        range_header = request.headers.get('Range')
+        if (self.ranges and range_header
+                and request.headers.get('If-Range') == self.etag):
+            start = int(range_header.split('=')[1].rstrip('-'))
+            context.status_code = 206
+            context.headers['Content-Range'] = 'bytes {}-{}/{}'.format(
+                start, len(DATA) - 1, len(DATA))
+        context.headers['ETag'] = self.etag
+
+        body = DATA[start:]
+        context.headers['Content-Length'] = str(len(body))
+        if self.failures:
+            self.failures -= 1
+            body = body[:self.cut]
+        return body
+
+
+def test_download_resumable(mocker, tmp_path):
+    server = _FlakyServer(failures=2)
+    path = str(tmp_path / 'cube.fits')
+    with mocker.register_uri('GET', 'http://example.com/cube', content=server):
+        size = download_resumable(
+            create_session(), 'http://example.com/cube', path)
+
+    assert size == len(DATA)
+    with open(path, 'rb') as f:
+        assert f.read() == DATA
+    assert os.listdir(tmp_path) == ['cube.fits']
+
+    assert 'Range' not in server.requests[0]
+    assert server.requests[1]['Range'] == 'bytes=1000-'
+    assert server.requests[2]['Range'] == 'bytes=2000-'
+    assert server.requests[2]['If-Range'] == '"v1"'
+
+
+def test_download_changed(mocker, tmp_path):
+    path = str(tmp_path / 'cube.fits')
+    with open(path + '.part', 'wb') as f:
+        f.write(b'x' * 1000)
+    with open(path + '.part.json', 'w') as f:
+        json.dump({'url': 'http://example.com/cube', 'etag': '"v0"'}, f)
+
+    # the dataset has changed, so the server sends everything
+    server = _FlakyServer(failures=0)
+    with mocker.register_uri('GET', 'http://example.com/cube', content=server):
+        download_resumable(create_session(), 'http://example.com/cube', path)
+
+    assert server.requests[0]['If-Range'] == '"v0"'
+    with open(path, 'rb') as f:
+        assert f.read() == DATA
+
+
+def test_download_gives_up(mocker, tmp_path):
+    server = _FlakyServer(failures=5)
+    path = str(tmp_path / 'cube.fits')
+    with mocker.register_uri('GET', 'http://example.com/cube', content=server):
+        with pytest.raises(DALServiceError):
+            download_resumable(
+                create_session(), 'http://example.com/cube', path, retries=2)
+
+    assert len(server.requests) == 3
+    assert not os.path.exists(path)
+    # what was transferred is kept for the next attempt
+    assert os.path.getsize(path + '.part') == 3000
+
+    server.failures = 0
+    with mocker.register_uri('GET', 'http://example.com/cube', content=server):
+        download_resumable(create_session(), 'http://example.com/cube', path)
+    assert server.requests[-1]['Range'] == 'bytes=3000-'
+    with open(path, 'rb') as f:
+        assert f.read() == DATA
+
+
+class _VersionedServer:
+    """
+    serves ``data`` with an ETag, answering conditional requests.
+    """
+
+    def __init__(self, data, etag='"v1"'):
+        self.data = data
+        self.etag = etag
+        self.sent = 0
+
+    def __call__(self, request, context):
+        context.headers['ETag'] = self.etag
+        if request.headers.get('If-None-Match') == self.etag:
+            context.status_code = 304
+            return b''
+        self.sent += 1
+        return self.data
+
+
+def test_fetch_to_cache(mocker, tmp_path):
+    cache = DiskCache(str(tmp_path))
+    server = _VersionedServer(DATA)
+    with mocker.register_uri('GET', 'http://example.com/cube', content=server):
+        path = fetch_to_cache(cache, create_session(), 'http://example.com/cube')
+        assert fetch_to_cache(
+            cache, create_session(), 'http://example.com/cube') == path
+        assert server.sent == 1
+
+        server.data, server.etag = b'changed', '"v2"'
+        path = fetch_to_cache(cache, create_session(), 'http://example.com/cube')
+        assert server.sent == 2
+
+    with open(path, 'rb') as f:
+        assert f.read() == b'changed'
+
+
+def test_fetch_to_cache_too_large(mocker, tmp_path):
+    cache = DiskCache(str(tmp_path), max_size=100)
+    with mocker.register_uri(
+            'GET', 'http://example.com/cube', content=_VersionedServer(DATA)):
+        assert fetch_to_cache(
+            cache, create_session(), 'http://example.com/cube') is None
+    assert cache.size() == 0
+
+
+@pytest.mark.parametrize('length', [False, True])
+def test_fetch_to_cache_overflow(mocker, monkeypatch, tmp_path, length):
+    cache = DiskCache(str(tmp_path), max_size=1000)
+    overflow = BytesIO()
+    written = []
+    write = cache_module._EntryWriter.write
+
+    def counting_write(self, data):
+        written.append(len(data))
+        return write(self, data)
+
+    monkeypatch.setattr(cache_module._EntryWriter, 'write', counting_write)
+
+    headers = {'Content-Length': str(len(DATA))} if length else {}
+    with mocker.register_uri(
+            'GET', 'http://example.com/cube', content=DATA, headers=headers):
+        assert fetch_to_cache(
+            cache, create_session(), 'http://example.com/cube', bufsize=256,
+            overflow=overflow) is None
+
+    assert overflow.getvalue() == DATA
+    # the cache is not written past its limit, and nothing is left behind
+    assert sum(written) <= 1000
+    assert not os.listdir(str(tmp_path))
+
+
+def test_getdataobj_too_large(mocker, tmp_path):
+    out = BytesIO()
+    fits.PrimaryHDU(np.arange(1000, dtype=np.int32)).writeto(out)
+    server = _VersionedServer(out.getvalue())
+    record = DALResults(votableparse(BytesIO(FITS_RESULT)))[0]
+    cache = DiskCache(str(tmp_path), max_size=1000)
+
+    with mocker.register_uri('GET', 'http://example.com/image.fits', content=server):
+        with record.getdataobj(cache=cache) as hdulist:
+            assert hdulist[0].data[-1] == 999
+
+    assert server.sent == 1
+    assert cache.size() == 0
+
+
+FITS_RESULT = b"""<?xml version="1.0" encoding="utf-8"?>
+<VOTABLE xmlns="http://www.ivoa.net/xml/VOTable/v1.3" version="1.3">
+  <RESOURCE type="results">
+    <INFO name="QUERY_STATUS" value="OK"/>
+    <TABLE>
+      <FIELD name="access_url" datatype="char" arraysize="*"
+        utype="obscore:access.reference"/>
+      <FIELD name="access_format" datatype="char" arraysize="*"
+        ucd="meta.code.mime"/>
+      <DATA><TABLEDATA>
+        <TR><TD>http://example.com/image.fits</TD><TD>image/fits</TD></TR>
+      </TABLEDATA></DATA>
+    </TABLE>
+  </RESOURCE>
+</VOTABLE>
+"""
+
+
+def test_getdataobj_cached(mocker, tmp_path):
+    out = BytesIO()
+    fits.PrimaryHDU(np.arange(100, dtype=np.int32)).writeto(out)
+    server = _VersionedServer(out.getvalue())
+    record = DALResults(votableparse(BytesIO(FITS_RESULT)))[0]
+    cache = DiskCache(str(tmp_path))
+
+    with mocker.register_uri('GET', 'http://example.com/image.fits', content=server):
+        for _ in range(2):
+            with record.getdataobj(cache=cache) as hdulist:
+                assert hdulist._file.memmap
+                assert hdulist[0].data[-1] == 99
+
+        with record.getdataobj(cache=False) as hdulist:
+            assert hdulist[0].data[-1] == 99
+
+    assert server.sent == 2
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Tests for pyvo.dal.fanout
+"""
+from contextlib import ExitStack
+from functools import partial
+from threading import Event
+from time import monotonic, sleep
+import re
+
+import pytest
+
+from pyvo.dal import SCSService, SCSResults, DALServiceError, multisearch
+from pyvo.dal.fanout import SearchFailure
+
+from astropy.utils.data import get_pkg_data_contents
+
+get_pkg_data_contents = partial(
+    get_pkg_data_contents, package=__package__, encoding='binary')
+
+
+@pytest.fixture()
+def scs(mocker):
+    def callback(request, context):
+        if 'broken' in request.url:
+            context.status_code = 500
+            return b'Internal Error'
+        return get_pkg_data_contents('data/scs/result.xml')
+
+    with mocker.register_uri(
+        'GET', re.compile('http://example.com/.*/scs.*'), content=callback
+    ) as matcher:
+        yield matcher
+
+
+class _SlowService:
+    baseurl = 'http://example.com/slow'
+
+    def __init__(self):
+        self.release = Event()
+
+    def search(self, **keywords):
+        self.release.wait(5)
+        return None
+
+
+@pytest.mark.usefixtures('scs')
+@pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+def test_multisearch():
+    services = [SCSService('http://example.com/{}/scs'.format(name))
+                for name in ('a', 'b', 'broken', 'c')]
+
+    outcomes = dict(
+        multisearch(services, max_workers=2, pos=(78, 2), radius=0.5))
+
+    assert set(outcomes) == set(services)
+    for service, outcome in outcomes.items():
+        if 'broken' in service.baseurl:
+            assert isinstance(outcome, SearchFailure)
+            assert outcome.service is service
+            assert isinstance(outcome.error, DALServiceError)
+            with pytest.raises(DALServiceError):
+                outcome.raise_error()
+        else:
+            assert isinstance(outcome, SCSResults)
+            assert len(outcome) == 1273
+
+
+def test_multisearch_empty():
+    assert list(multisearch([], pos=(78, 2))) == []
+
+
+def test_multisearch_timeout():
+    slow = _SlowService()
+    try:
+        outcomes = list(multisearch([slow], timeout=0.1))
+    finally:
+        slow.release.set()
+
+    assert len(outcomes) == 1
+    service, outcome = outcomes[0]
+    assert service is slow
+    assert isinstance(outcome, SearchFailure)
+    assert 'timed out' in str(outcome.error)
+
+
+def test_multisearch_timeout_queued():
+    # the second search waits for the worker the first one blocks
+    slow = [_SlowService(), _SlowService()]
+    start = monotonic()
+    try:
+        outcomes = list(multisearch(slow, max_workers=1, timeout=0.2))
+    finally:
+        for service in slow:
+            service.release.set()
+
+    assert monotonic() - start < 1
+    assert [service for service, _ in outcomes] == slow
+    assert all(isinstance(outcome, SearchFailure) for _, outcome in outcomes)
+
+
+@pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+def test_multisearch_request_timeout(mocker):
+    timeouts = []
+
+    def callback(request, context):
+        timeouts.append(request.timeout)
+        return get_pkg_data_contents('data/scs/result.xml')
+
+    with mocker.register_uri(
+        'GET', 'http://example.com/scs', content=callback
+    ):
+        service = SCSService('http://example.com/scs')
+        outcomes = list(multisearch([service], timeout=5, pos=(78, 2)))
+
+    assert isinstance(outcomes[0][1], SCSResults)
+    assert len(timeouts) == 1
+    assert 0 < timeouts[0] <= 5
+    # the service itself is not changed
+    assert not hasattr(service._session, '_deadline')
+
+
+@pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+def test_multisearch_deadline_results(mocker):
+    timeouts = []
+
+    def dataset(request, context):
+        timeouts.append(request.timeout)
+        return b'data'
+
+    with ExitStack() as stack:
+        stack.enter_context(mocker.register_uri(
+            'GET', 'http://example.com/scs',
+            content=get_pkg_data_contents('data/scs/result.xml')))
+        stack.enter_context(mocker.register_uri(
+            'GET', 'http://example.com/dataset', content=dataset))
+        service = SCSService('http://example.com/scs')
+        (_, result), = multisearch([service], timeout=0.1, pos=(78, 2))
+        sleep(0.2)
+
+        # the deadline of the search has passed; later requests do not
+        # inherit it
+        record = result.getrecord(0)
+        assert record._session.get('http://example.com/dataset').content == b'data'
+
+    assert timeouts == [None]
@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Tests for pyvo.dal.partition
+"""
+from email.parser import BytesParser
+from io import BytesIO
+import re
+import threading
+from urllib.parse import parse_qsl
+
+import numpy as np
+import pytest
+
+from astropy.io.votable import from_table, parse_single_table
+from astropy.io.votable.tree import Info
+from astropy.table import Table
+
+from pyvo.dal import TAPService, DALOverflowWarning, DALQueryError
+from pyvo.dal.partition import (
+    NullPartition, RangePartition, value_partitions, healpix_partitions)
+
+_RANGE = re.compile(r"\(n >= ([0-9.e+-]+) AND n (<=?) ([0-9.e+-]+)\)")
+
+
+class _SyncServer:
+    """
+    a TAP service on a table of the integers 0 to 99 that understands the
+    partition conditions.
+    """
+
+    def __init__(self, nulls=0, failures=0):
+        self.queries = []
+        self.lock = threading.Lock()
+        self.nulls = nulls
+        self.failures = failures
+
+    def __call__(self, request, context):
+        params = dict(parse_qsl(request.body))
+        query = params['QUERY']
+        with self.lock:
+            self.queries.append(query)
+            if self.failures:
+                self.failures -= 1
+                context.status_code = 503
+                return b'try again'
+
+        if 'n IS NULL' in query:
+            values = np.ma.masked_all(self.nulls, dtype=int)
+            return _votable(Table({'n': values, 'sq': values}), 'OK')
+
+        values = np.arange(100)
+        for lower, op, upper in _RANGE.findall(query):
+            upper_ok = values <= float(upper) if op == '<=' else (
+                values < float(upper))
+            values = values[(values >= float(lower)) & upper_ok]
+
+        status = 'OK'
+        if 'broken' in query:
+            status = 'ERROR'
+        elif len(values) > int(params['MAXREC']):
+            values = values[:int(params['MAXREC'])]
+            status = 'OVERFLOW'
+
+        return _votable(Table({'n': values, 'sq': values ** 2}), status)
+
+
+def _votable(table, status):
+    votable = from_table(table)
+    votable.resources[0].type = 'results'
+    votable.resources[0].infos.append(Info(name='QUERY_STATUS', value=status))
+    out = BytesIO()
+    votable.to_xml(out)
+    return out.getvalue()
+
+
+class _JoinServer:
+    """
+    a TAP service "joining" an uploaded table with a column x, returning
+    the rows with x odd in reverse order, and failing the first time it
+    sees a chunk.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.lock = threading.Lock()
+
+    def __call__(self, request, context):
+        message = BytesParser().parsebytes(
+            'Content-Type: {}\r\n\r\n'.format(
+                request.headers['Content-Type']).encode('ascii')
+            + b''.join(request.body))
+        params = {}
+        for part in message.get_payload():
+            params[part.get_param('name', header='content-disposition')] = (
+                part.get_payload(decode=True))
+
+        upload = parse_single_table(BytesIO(params['t'])).to_table()
+        rows = tuple(upload['pyvo_row'])
+        with self.lock:
+            first = rows not in self.chunks
+            self.chunks.append(rows)
+        if first:
+            context.status_code = 500
+            return b'try again'
+
+        matches = upload[upload['x'] % 2 == 1][::-1]
+        status = 'OK'
+        if len(matches) > int(params['MAXREC']):
+            matches = matches[:int(params['MAXREC'])]
+            status = 'OVERFLOW'
+        return _votable(matches, status)
+
+
+@pytest.fixture()
+def server(mocker):
+    server = _SyncServer()
+    with mocker.register_uri(
+            'POST', 'http://example.com/tap/sync', content=server):
+        yield server
+
+
+def test_value_partitions():
+    partitions = value_partitions('n', 0, 99, 3)
+    assert [(part.lower, part.upper) for part in partitions[:-1]] == [
+        (0, 33), (33, 66), (66, 100)]
+    assert partitions[0].condition == 'n >= 0 AND n < 33'
+    assert partitions[-1].condition == 'n IS NULL'
+
+    partitions = value_partitions('x', 0., 1., 4, nulls=False)
+    assert partitions[-1].condition == 'x >= 0.75 AND x <= 1.0'
+
+    assert len(value_partitions('n', 0, 2, 10, nulls=False)) == 3
+
+
+def test_split():
+    assert [(part.lower, part.upper)
+            for part in RangePartition('n', 0, 5).split()] == [(0, 2), (2, 5)]
+    assert RangePartition('n', 3, 4).split() is None
+
+    lower, upper = RangePartition('x', 0., 1., inclusive=True).split()
+    assert not lower.inclusive and upper.inclusive
+
+
+def test_healpix_partitions():
+    partitions = healpix_partitions('source_id', 1, column_order=12,
+                                    scale=2**35)
+    assert len(partitions) == 49
+    assert partitions[1].lower == 4**11 * 2**35
+    assert partitions[-2].upper == 12 * 4**12 * 2**35
+    assert isinstance(partitions[-1], NullPartition)
+    assert partitions[-1].split() is None
+
+    with pytest.raises(ValueError):
+        healpix_partitions('ipix', 5, column_order=3)
+
+
+def test_run_partitioned(server):
+    service = TAPService('http://example.com/tap', response_format=None)
+    result = service.run_partitioned(
+        'SELECT * FROM numbers WHERE {partition}',
+        value_partitions('n', 0, 99, 4), maxrec=20)
+
+    assert list(result['n']) == list(range(100))
+    assert list(result['sq']) == [n ** 2 for n in range(100)]
+    assert result.query_status == 'OK'
+    # the 4 partitions of 25 overflow and are split in 8 of 12 or 13, and
+    # there is one for the NULLs
+    assert len(server.queries) == 13
+
+
+def test_run_partitioned_nulls(mocker):
+    server = _SyncServer(nulls=3, failures=1)
+    with mocker.register_uri(
+            'POST', 'http://example.com/tap/sync', content=server):
+        service = TAPService('http://example.com/tap', response_format=None)
+        result = service.run_partitioned(
+            'SELECT * FROM numbers WHERE {partition}',
+            value_partitions('n', 0, 99, 2), maxrec=100)
+
+    column = result.to_table()['n']
+    assert len(column) == 103
+    assert list(column[:100]) == list(range(100))
+    assert column.mask[100:].all()
+    # the failed partition was retried
+    assert len(server.queries) == 4
+
+
+def test_run_partitioned_overflow(server):
+    service = TAPService('http://example.com/tap', response_format=None)
+    with pytest.warns(DALOverflowWarning):
+        result = service.run_partitioned(
+            'SELECT * FROM numbers WHERE {partition}',
+            ['n < 50', 'n >= 50'], maxrec=40)
+
+    assert len(result) == 80
+    assert result.query_status == 'OVERFLOW'
+
+
+def test_run_partitioned_errors(server):
+    service = TAPService('http://example.com/tap', response_format=None)
+    with pytest.raises(ValueError):
+        service.run_partitioned('SELECT * FROM numbers', ['n < 50'])
+
+    with pytest.raises(ValueError):
+        service.run_partitioned('SELECT * FROM numbers WHERE {partition}', [])
+
+    with pytest.raises(DALQueryError):
+        service.run_partitioned(
+            'SELECT * FROM numbers WHERE {partition}',
+            ['n < 50', 'broken'], maxrec=100)
+
+
+def test_run_upload_join(mocker):
+    server = _JoinServer()
+    table = Table({'x': np.arange(1000) * 7})
+
+    with mocker.register_uri(
+            'POST', 'http://example.com/tap/sync', content=server):
+        service = TAPService('http://example.com/tap', response_format=None)
+        result = service.run_upload_join(
+            'SELECT * FROM TAP_UPLOAD.t', {'t': table}, chunk_rows=300,
+            maxrec=120)
+
+    assert table.colnames == ['x']
+    expected = np.arange(1, 1000, 2)
+    assert list(result['pyvo_row']) == list(expected)
+    assert list(result['x']) == list(expected * 7)
+    # four chunks of up to 150 matches; the first three are split
+    assert len(set(server.chunks)) == 4 + 3 * 2
+    assert len(server.chunks) == 2 * len(set(server.chunks))
@@ -7,6 +7,8 @@ from functools import partial
 
 from contextlib import ExitStack
 
+from io import BytesIO
+
 from os import listdir
 
 import pytest
@@ -15,8 +17,11 @@ import numpy as np
 
 import platform
 
-from pyvo.dal.query import DALService, DALQuery, DALResults, Record
+from pyvo.dal.query import (
+    DALService, DALQuery, DALResults, Record, Upload,
+    enable_response_cache, disable_response_cache)
 from pyvo.dal.exceptions import DALServiceError, DALQueryError, DALFormatError, DALOverflowWarning
+from pyvo.utils.cache import DiskCache
 from pyvo.version import version
 
 from astropy.table import Table, QTable
@@ -286,6 +291,100 @@ class TestDALQuery:
         assert raw.startswith(b'<?xml')
         assert raw.strip().endswith(b'</VOTABLE>')
 
+    def test_execute_iter(self):
+        query = DALQuery('http://example.com/query/basic')
+        chunks = list(query.execute_iter(chunk_size=2))
+
+        assert [len(chunk.array) for chunk in chunks] == [2, 1]
+        assert chunks[0].array['1'][1] == 42
+        assert chunks[1].array['2'][0] == 'Elite'
+
+    def test_execute_iter_errors(self):
+        with pytest.raises(DALQueryError):
+            list(DALQuery('http://example.com/query/errorstatus').execute_iter())
+
+        with pytest.raises(DALServiceError):
+            list(DALQuery('http://example.com/query/errornous').execute_iter())
+
+    def test_response_cache(self, register_mocks, tmp_path):
+        cache = DiskCache(str(tmp_path))
+        basic = register_mocks[0]
+
+        query = DALQuery('http://example.com/query/basic', foo='bar')
+        query.cache = cache
+        _test_results(query.execute())
+        assert basic.call_count == 1
+
+        query = DALQuery('http://example.com/query/basic', foo='bar')
+        query.cache = cache
+        _test_results(query.execute())
+        assert query.execute_raw().strip().endswith(b'</VOTABLE>')
+        assert basic.call_count == 1
+
+        query.cache_policy = 'refresh'
+        _test_results(query.execute())
+        assert basic.call_count == 2
+
+        query.cache_policy = 'bypass'
+        _test_results(query.execute())
+        assert basic.call_count == 3
+
+        query = DALQuery('http://example.com/query/basic', foo='baz')
+        query.cache = cache
+        query.execute()
+        assert basic.call_count == 4
+
+    def test_response_cache_errors(self, register_mocks, tmp_path):
+        cache = DiskCache(str(tmp_path))
+        query = DALQuery('http://example.com/query/errornous')
+        query.cache = cache
+
+        for _ in range(2):
+            with pytest.raises(DALServiceError):
+                query.execute()
+        assert register_mocks[10].call_count == 2
+        assert cache.size() == 0
+
+    def test_response_cache_status(self, register_mocks, tmp_path):
+        cache = DiskCache(str(tmp_path))
+
+        query = DALQuery('http://example.com/query/errorstatus')
+        query.cache = cache
+        for _ in range(2):
+            with pytest.raises(DALQueryError):
+                query.execute()
+        assert register_mocks[11].call_count == 2
+
+        query = DALQuery('http://example.com/query/overflowstatus')
+        query.cache = cache
+        for _ in range(2):
+            with pytest.warns(DALOverflowWarning):
+                query.execute()
+        assert register_mocks[12].call_count == 2
+
+        # an unparseable response leaves no temporary file behind
+        query = DALQuery('http://example.com/querydata/image.fits')
+        query.cache = cache
+        with pytest.raises(DALFormatError):
+            query.execute()
+
+        assert listdir(str(tmp_path)) == []
+
+    def test_enable_response_cache(self, register_mocks, tmp_path):
+        cache = enable_response_cache(str(tmp_path), ttl=None)
+        try:
+            for _ in range(2):
+                _test_results(DALQuery('http://example.com/query/basic').execute())
+            assert register_mocks[0].call_count == 1
+
+            query = DALQuery('http://example.com/query/basic')
+            query.cache = False
+            query.execute()
+            assert register_mocks[0].call_count == 2
+        finally:
+            disable_response_cache()
+            cache.clear()
+
 
 @pytest.mark.filterwarnings('ignore::astropy.io.votable.exceptions.W03')
 @pytest.mark.filterwarnings('ignore::astropy.io.votable.exceptions.W06')
@@ -311,6 +410,74 @@ class TestDALResults:
             'http://example.com/query/basic')
         assert dalresults.status == ('OK', 'OK')
 
+    def test_iter_result_url(self):
+        chunks = list(DALResults.iter_result_url(
+            'http://example.com/query/basic', chunk_size=10))
+
+        assert len(chunks) == 1
+        assert list(chunks[0].array['1']) == [23, 42, 1337]
+
+    def test_column_lookups(self):
+        dalresults = DALResults.from_result_url(
+            'http://example.com/query/basic')
+
+        assert dalresults.fieldname_with_ucd('foo') == '1'
+        assert dalresults.fieldname_with_ucd('baz;bar') == '1'
+        assert dalresults.fieldname_with_ucd('baz') is None
+        assert dalresults.fieldname_with_utype('foobar') == '2'
+        assert dalresults.fieldname_with_utype('foobaz') is None
+
+        assert list(dalresults.getcolumn('_1')) == [23, 42, 1337]
+        assert dalresults.getdesc('2').ID == '_2'
+        with pytest.raises(KeyError):
+            dalresults.getcolumn('_3')
+        with pytest.raises(KeyError):
+            dalresults.getdesc('_2')
+
+        # the index is built once and shared by all records
+        index = dalresults._columnindex
+        assert dalresults[0]._fieldindex is index.names
+        assert dalresults[2]._fieldindex is index.names
+
+    def test_iter_batches(self):
+        dalresults = DALResults.from_result_url(
+            'http://example.com/query/basic')
+
+        batches = list(dalresults.iter_batches(2))
+        assert len(batches) == 2
+        assert list(batches[0]) == ['1', '2']
+        assert list(batches[0]['1']) == [23, 42]
+        assert list(batches[1]['2']) == ['Elite']
+
+        batches = list(dalresults.iter_batches(5, columns=['_2'], start=1))
+        assert len(batches) == 1
+        assert list(batches[0]) == ['2']
+        assert len(batches[0]['2']) == 2
+
+        tables = list(dalresults.iter_batches(2, columns=['1'], as_table=True))
+        assert isinstance(tables[0], Table)
+        assert tables[0].colnames == ['1']
+        assert list(tables[1]['1']) == [1337]
+
+        with pytest.raises(KeyError):
+            next(dalresults.iter_batches(2, columns=['nosuchcolumn']))
+
+        with pytest.raises(ValueError):
+            next(dalresults.iter_batches(0))
+
+    def test_cursor(self):
+        cursor = DALResults.from_result_url(
+            'http://example.com/query/basic').cursor()
+
+        assert cursor.fetchone() == [23, 'Illuminatus']
+        assert cursor.fetchmany(1) == [[42, "Don't panic, and always carry a towel"]]
+        assert cursor.fetchmany(5) == [[1337, 'Elite']]
+        assert cursor.fetchmany(5) == []
+
+        cursor.scroll(1, mode='absolute')
+        assert [row[0] for row in cursor.fetchall()] == [42, 1337]
+        assert cursor.fetchall() == []
+
     def test_init_errorstatus(self):
         with pytest.raises(DALQueryError):
             DALResults.from_result_url('http://example.com/query/errorstatus')
@@ -468,6 +635,31 @@ class TestRecord:
 
         assert record.get('2', decode=True) == 'Illuminatus'
 
+    def test_lightweight(self):
+        results = DALResults.from_result_url(
+            'http://example.com/query/basic')
+        first, second = results[0], results[1]
+
+        assert not hasattr(first, '__dict__')
+        assert first._fieldindex is second._fieldindex
+        assert first.get('nosuchcolumn', 'default') == 'default'
+
+        with pytest.raises(IndexError):
+            results.getrecord(len(results))
+
+    def test_setvalue(self):
+        results = DALResults.from_result_url(
+            'http://example.com/query/basic')
+        record = results[0]
+
+        record._setvalue('2', 'Discordia')
+        assert record['2'] == 'Discordia'
+        assert record['_2'] == 'Discordia'
+        assert results[0]['2'] == 'Illuminatus'
+
+        with pytest.raises(KeyError):
+            record._setvalue('nosuchcolumn', None)
+
     def test_columnaliases(self):
         record = DALResults.from_result_url(
             'http://example.com/query/basic')[0]
@@ -511,4 +703,49 @@ class TestRecord:
 
 
 class TestUpload:
-    pass
+    def test_iter_content_fileobj(self):
+        fileobj = BytesIO(b'x' * 200000)
+        fileobj.seek(10)
+        upload = Upload('t', fileobj)
+
+        digest = upload.content_hash()
+        assert digest is not None
+        assert fileobj.tell() == 10
+
+        chunks = list(upload.iter_content())
+        assert len(chunks) > 1
+        assert b''.join(chunks) == b'x' * 199990
+
+    def test_iter_content_table(self):
+        table = Table({'a': np.arange(10)})
+        upload = Upload('t', table)
+
+        assert upload.content_type == 'application/x-votable+xml'
+        chunks = list(upload.iter_content(chunk_rows=3))
+        assert b'<BINARY2>' in chunks[0]
+        assert upload.content_hash() == Upload('t', table).content_hash()
+
+    def test_content_hash_table(self, monkeypatch):
+        def fail(*args, **kwargs):
+            raise AssertionError('table serialized to compute its hash')
+
+        monkeypatch.setattr('pyvo.dal.query.iter_binary2_votable', fail)
+        table = Table({'a': np.arange(10), 'b': ['x'] * 10})
+        digest = Upload('t', table).content_hash()
+
+        other = table.copy()
+        other['a'][3] = 42
+        assert Upload('t', other).content_hash() != digest
+
+        other = table.copy()
+        other['a'].unit = 'deg'
+        assert Upload('t', other).content_hash() != digest
+
+        other = Table(table, masked=True)
+        other['a'].mask[3] = True
+        assert Upload('t', other).content_hash() != Upload(
+            't', Table(table, masked=True)).content_hash()
+
+    def test_iter_content_remote(self):
+        with pytest.raises(ValueError):
+            list(Upload('t', 'http://example.com/table').iter_content())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Tests for pyvo.dal.remotefits
+"""
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from astropy.io import fits
+from astropy.io.votable import parse as votableparse
+
+from pyvo.dal import DALResults, DALFormatError
+from pyvo.dal.remotefits import RangeFile, open_remote_fits
+from pyvo.utils.http import create_session
+
+URL = 'http://example.com/cube.fits'
+
+RESULT = b"""<?xml version="1.0" encoding="utf-8"?>
+<VOTABLE xmlns="http://www.ivoa.net/xml/VOTable/v1.3" version="1.3">
+  <RESOURCE type="results">
+    <INFO name="QUERY_STATUS" value="OK"/>
+    <TABLE>
+      <FIELD name="access_url" datatype="char" arraysize="*"
+        utype="obscore:access.reference"/>
+      <FIELD name="access_format" datatype="char" arraysize="*"
+        ucd="meta.code.mime"/>
+      <DATA><TABLEDATA>
+        <TR><TD>http://example.com/cube.fits</TD><TD>image/fits</TD></TR>
+      </TABLEDATA></DATA>
+    </TABLE>
+  </RESOURCE>
+</VOTABLE>
+"""
+
+
+def _make_fits():
+    primary = fits.PrimaryHDU()
+    primary.header['OBJECT'] = 'M31'
+    hdulist = fits.HDUList([
+        primary,
+        fits.ImageHDU(np.arange(100000, dtype=np.float64), name='SCI'),
+        fits.ImageHDU(np.ones((10, 10), dtype=np.int16), name='DQ')])
+    out = BytesIO()
+    hdulist.writeto(out)
+    return out.getvalue()
+
+
+DATA = _make_fits()
+
+
+class _RangeServer:
+    """
+    serves DATA, honouring single-range requests if ``ranges`` is set.
+    """
+
+    def __init__(self, data=DATA, *, ranges=True):
+        self.data = data
+        self.ranges = ranges
+        self.sent = 0
+        self.requests = []
+        self.timeouts = []
+
+    def __call__(self, request, context):
+        range_header = request.headers.get('Range')
+        self.requests.append(range_header)
+        self.timeouts.append(request.timeout)
+        body = self.data
+        if self.ranges and range_header:
+            start, stop = (
+                int(val) for val in range_header.split('=')[1].split('-'))
+            body = self.data[start:stop + 1]
+            context.status_code = 206
+            context.headers['Content-Range'] = 'bytes {}-{}/{}'.format(
+                start, start + len(body) - 1, len(self.data))
+            context.headers['ETag'] = '"v1"'
+        self.sent += len(body)
+        return body
+
+
+@pytest.fixture()
+def server(mocker):
+    server = _RangeServer()
+    with mocker.register_uri('GET', URL, content=server):
+        yield server
+
+
+@pytest.fixture()
+def record():
+    return DALResults(votableparse(BytesIO(RESULT)))[0]
+
+
+def test_getheaders(record, server):
+    headers = record.getheaders()
+
+    assert [header.get('EXTNAME') for header in headers] == [None, 'SCI', 'DQ']
+    assert headers[0]['OBJECT'] == 'M31'
+    assert headers[1]['NAXIS1'] == 100000
+    # the pixels of SCI are skipped
+    assert server.sent < len(DATA) / 10
+
+
+def test_getdataobj_lazy(record, server):
+    with record.getdataobj(lazy=True) as hdulist:
+        assert np.all(hdulist['DQ'].data == 1)
+        assert server.sent < len(DATA) / 10
+
+        assert hdulist['SCI'].data[-1] == 99999
+
+
+def test_getdataobj_lazy_timeout(record, server):
+    with record.getdataobj(lazy=True, timeout=7) as hdulist:
+        assert np.all(hdulist['DQ'].data == 1)
+
+    assert server.timeouts
+    assert set(server.timeouts) == {7}
+
+
+def test_no_ranges(mocker):
+    server = _RangeServer(ranges=False)
+    with mocker.register_uri('GET', URL, content=server):
+        fileobj = RangeFile(create_session(), URL)
+        assert not fileobj.ranges_supported
+
+        with open_remote_fits(create_session(), URL) as hdulist:
+            assert hdulist['SCI'].data[-1] == 99999
+            assert len(hdulist) == 3
+
+    # a single full download each
+    assert len(server.requests) == 2
+
+
+def test_rangefile(server):
+    fileobj = RangeFile(create_session(), URL, readahead=100)
+
+    assert fileobj.read(10) == DATA[:10]
+    assert fileobj.seek(-10, 2) == len(DATA) - 10
+    assert fileobj.read() == DATA[-10:]
+    fileobj.seek(5000)
+    assert fileobj.read(300) == DATA[5000:5300]
+    assert fileobj.requests == 3
+
+
+def test_not_fits(mocker, record):
+    server = _RangeServer(b'<html>not found</html>' * 200)
+    with mocker.register_uri('GET', URL, content=server):
+        with pytest.raises(DALFormatError):
+            record.getheaders()
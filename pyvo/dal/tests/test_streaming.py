@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Tests for pyvo.dal.streaming
+"""
+from functools import partial
+from io import BytesIO
+
+import numpy as np
+import pytest
+
+from astropy.io.votable import from_table, parse as votableparse
+from astropy.table import Table, MaskedColumn
+from astropy.utils.data import get_pkg_data_contents
+
+from pyvo.dal.exceptions import DALQueryError, DALFormatError, DALOverflowWarning
+from pyvo.dal import streaming
+from pyvo.dal.streaming import iter_votable_chunks
+
+get_pkg_data_contents = partial(
+    get_pkg_data_contents, package=__package__, encoding='binary')
+
+
+def _serialize(table, tabledata_format):
+    out = BytesIO()
+    from_table(table).to_xml(out, tabledata_format=tabledata_format)
+    return out.getvalue()
+
+
+@pytest.fixture()
+def table():
+    return Table({
+        'id': np.arange(25, dtype=np.int64),
+        'flux': MaskedColumn(np.linspace(0, 1, 25), mask=np.arange(25) % 7 == 0),
+        'name': ['obj{}'.format(i) for i in range(25)],
+    })
+
+
+@pytest.mark.parametrize('tabledata_format', ['tabledata', 'binary', 'binary2'])
+def test_chunks(table, tabledata_format):
+    doc = _serialize(table, tabledata_format)
+    chunks = list(iter_votable_chunks(BytesIO(doc).read, chunk_size=10))
+
+    assert [len(chunk.array) for chunk in chunks] == [10, 10, 5]
+    assert [field.name for field in chunks[0].fields] == ['id', 'flux', 'name']
+
+    full = votableparse(BytesIO(doc)).get_first_table().array
+    joined = np.ma.concatenate([chunk.array for chunk in chunks])
+    assert np.all(joined['id'] == full['id'])
+    assert np.all(joined['name'] == full['name'])
+    assert np.all(joined['flux'].mask == full['flux'].mask)
+    assert np.allclose(joined['flux'].compressed(), full['flux'].compressed())
+
+    assert len(chunks[1].to_table()) == 10
+
+
+@pytest.mark.parametrize('tabledata_format', ['binary', 'binary2'])
+def test_binary_bounded(monkeypatch, tabledata_format):
+    readers = []
+
+    class Reader(streaming._Base64Reader):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            readers.append(self)
+
+    monkeypatch.setattr(streaming, '_Base64Reader', Reader)
+
+    nrows = 50000
+    doc = _serialize(Table({
+        'id': np.arange(nrows, dtype=np.int64),
+        'flux': np.linspace(0, 1, nrows)}), tabledata_format)
+    assert len(doc) > 10 * streaming.STREAM_BLOCK_SIZE
+
+    nchunks = total = 0
+    for chunk in iter_votable_chunks(BytesIO(doc).read, chunk_size=1000):
+        nchunks += 1
+        total += int(chunk.array['id'].sum())
+
+    assert nchunks == nrows // 1000
+    assert total == nrows * (nrows - 1) // 2
+    assert len(readers) == 1
+    # the decoded and undecoded data held at any time
+    assert 0 < readers[0].max_buffered <= 2 * streaming.STREAM_BLOCK_SIZE
+
+
+def test_basic():
+    doc = get_pkg_data_contents('data/query/basic.xml')
+    chunks = list(iter_votable_chunks(BytesIO(doc).read, chunk_size=2))
+
+    assert [len(chunk.array) for chunk in chunks] == [2, 1]
+    assert chunks[1].array['1'][0] == 1337
+    assert chunks[0].fields[0].ucd == 'foo;bar'
+
+
+def test_empty(table):
+    doc = _serialize(table[:0], 'tabledata')
+    chunks = list(iter_votable_chunks(BytesIO(doc).read))
+
+    assert len(chunks) == 1
+    assert len(chunks[0].array) == 0
+    assert [field.name for field in chunks[0].fields] == ['id', 'flux', 'name']
+
+
+def test_errorstatus():
+    doc = get_pkg_data_contents('data/query/errorstatus.xml')
+    with pytest.raises(DALQueryError):
+        next(iter_votable_chunks(BytesIO(doc).read))
+
+
+def test_overflowstatus():
+    doc = get_pkg_data_contents('data/query/overflowstatus.xml')
+    with pytest.warns(DALOverflowWarning):
+        chunks = list(iter_votable_chunks(BytesIO(doc).read))
+    assert len(chunks[0].array) == 3
+
+
+def test_missingtable():
+    doc = get_pkg_data_contents('data/query/missingtable.xml')
+    with pytest.raises(DALFormatError):
+        next(iter_votable_chunks(BytesIO(doc).read))
+
+
+@pytest.mark.parametrize('stream', [
+    b'<STREAM href="http://example.com/data.bin"/>',
+    b'<STREAM encoding="gzip">H4sIAAAAAAAAA2NgYGBgBAAyRdQOCAAAAA==</STREAM>'])
+def test_unsupported_stream(table, stream):
+    doc = _serialize(table, 'binary2')
+    start = doc.index(b'<STREAM')
+    end = doc.index(b'</STREAM>') + len(b'</STREAM>')
+    doc = doc[:start] + stream + doc[end:]
+
+    with pytest.raises(DALFormatError):
+        list(iter_votable_chunks(BytesIO(doc).read))
@@ -5,22 +5,31 @@ Tests for pyvo.dal.tap
 from functools import partial
 from contextlib import ExitStack
 import datetime
+from email.parser import BytesParser
+import gzip
 import re
+import threading
+import time
 from io import BytesIO
 from urllib.parse import parse_qsl
 import tempfile
 
+import numpy as np
 import pytest
 import requests_mock
 
 from pyvo.dal.tap import escape, search, AsyncTAPJob, TAPService
-from pyvo.dal import DALQueryError, DALServiceError
+from pyvo.dal import DALQueryError, DALServiceError, SearchFailure
+from pyvo.dal import enable_metadata_cache, disable_metadata_cache
+from pyvo.dal import scheduler
 
 from pyvo.io.uws import JobFile
 from pyvo.io.uws.tree import Parameter, Result, ErrorSummary, Message
 from pyvo.io.vosi.exceptions import VOSIError
 from pyvo.utils import prototype
 
+from astropy.io.votable import parse as votableparse
+from astropy.table import Table
 from astropy.time import Time, TimeDelta
 
 from astropy.utils.data import get_pkg_data_contents
@@ -355,6 +364,93 @@ def async_fixture(mocker):
     yield from mock_server.use(mocker)
 
 
+class ConcurrentAsyncTAPServer(MockAsyncTAPServer):
+    """
+    a thread-safe mock server that deletes jobs, tracks how many of them
+    exist at a time and turns down the first ``busy`` submissions.
+    """
+
+    def __init__(self, busy=0):
+        super().__init__()
+        self._lock = threading.Lock()
+        self.busy = busy
+        self.max_jobs = 0
+        self.deleted = 0
+
+    def create(self, request, context):
+        with self._lock:
+            if self.busy and request.method == 'POST':
+                self.busy -= 1
+                context.status_code = 503
+                return b'busy'
+            result = super().create(request, context)
+            self.max_jobs = max(self.max_jobs, len(self._jobs))
+            return result
+
+    def job(self, request, context):
+        if request.method == 'DELETE':
+            with self._lock:
+                del self._jobs[int(job_re_path.match(request.path).group(1))]
+                self.deleted += 1
+            return
+        with self._lock:
+            return super().job(request, context)
+
+    def phase(self, request, context):
+        with self._lock:
+            job = self._jobs[int(job_re_path.match(request.path).group(1))]
+            if job.phase == 'ERROR':
+                return
+            return super().phase(request, context)
+
+
+class SlowAsyncTAPServer(ConcurrentAsyncTAPServer):
+    """
+    a mock server on which started jobs execute until `finish` is called,
+    and whose job list shows the actual jobs.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.listings = 0
+        self.job_gets = 0
+
+    def phase(self, request, context):
+        with self._lock:
+            jobid = int(job_re_path.match(request.path).group(1))
+            if request.method == 'POST' and 'RUN' in request.body:
+                self._jobs[jobid].phase = 'EXECUTING'
+                return
+            return MockAsyncTAPServer.phase(self, request, context)
+
+    def job(self, request, context):
+        if request.method == 'GET':
+            with self._lock:
+                self.job_gets += 1
+        return super().job(request, context)
+
+    def finish(self, *jobids):
+        with self._lock:
+            for jobid in jobids:
+                self._jobs[jobid].phase = 'COMPLETED'
+
+    def get_job_list(self, request, context):
+        phases = [val for arg, val in parse_qsl(request.query)
+                  if arg == 'PHASE']
+        with self._lock:
+            self.listings += 1
+            doc = ''.join(
+                self._get_jobref_rep(
+                    jobid, job.phase, '', '', '2018-12-20T00:23:15.79')
+                for jobid, job in self._jobs.items()
+                if not phases or job.phase in phases)
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<uws:jobs xmlns:uws="http://www.ivoa.net/xml/UWS/v1.0" '
+            'xmlns:xlink="http://www.w3.org/1999/xlink" version="1.1">\n'
+            + doc + '</uws:jobs>').encode('UTF-8')
+
+
 @pytest.fixture()
 def tables(mocker):
     def callback_tables(request, context):
@@ -470,6 +566,90 @@ class TestTAPService:
         table1, table2 = list(vositables)
         self._test_tables(table1, table2)
 
+    def test_tables_prefetch(self, tables):
+        service = TAPService('http://example.com/tap')
+        service.tables.prefetch(workers=2)
+        assert tables['table1'].call_count == 1
+        assert tables['table2'].call_count == 1
+
+        self._test_tables(*service.tables.values())
+        assert tables['table2'].call_count == 1
+
+        # iterating retrieves the tables ahead
+        service = TAPService('http://example.com/tap')
+        vositables = service.tables
+        names = []
+        for name, table in vositables.items():
+            names.append(name)
+            assert tables['table2'].call_count == 2
+        assert names == ['test.table1', 'test.table2']
+
+        with pytest.raises(KeyError):
+            vositables.prefetch(['test.table1', 'no.such.table'])
+
+    def test_metadata_cache(self, mocker, tmp_path):
+        requests = {'capabilities': [], 'tables': [], 'table1': []}
+        down = []
+
+        def respond(name, filename, validator):
+            def callback(request, context):
+                requests[name].append(request.headers.get(validator[0]))
+                if down:
+                    context.status_code = 500
+                    return b''
+                if request.headers.get(validator[0]) == validator[2]:
+                    context.status_code = 304
+                    return b''
+                context.headers[validator[1]] = validator[2]
+                return get_pkg_data_contents(filename)
+            return callback
+
+        etag = ('If-None-Match', 'ETag', '"v1"')
+        modified = ('If-Modified-Since', 'Last-Modified',
+                    'Wed, 21 Oct 2015 07:28:00 GMT')
+        with ExitStack() as stack:
+            for name, path, filename, validator in [
+                    ('capabilities', 'capabilities',
+                     'data/tap/capabilities.xml', etag),
+                    ('tables', 'tables', 'data/tap/tables.xml', modified),
+                    ('table1', 'tables/test.table1',
+                     'data/tap/lazy-table1.xml', etag)]:
+                stack.enter_context(mocker.register_uri(
+                    'GET', 'http://example.com/tap/' + path,
+                    content=respond(name, filename, validator)))
+            # where capabilities are looked for next
+            stack.enter_context(mocker.register_uri(
+                'GET', 'http://example.com/capabilities', status_code=404))
+
+            def use_service():
+                service = TAPService('http://example.com/tap')
+                assert service.hardlimit == 10000000
+                assert list(service.tables.keys()) == [
+                    'test.table1', 'test.table2']
+                assert service.tables['test.table1'].title == 'Test table 1'
+
+            try:
+                enable_metadata_cache(str(tmp_path), ttl=None)
+                use_service()
+                use_service()
+                assert requests == {
+                    'capabilities': [None], 'tables': [None],
+                    'table1': [None]}
+
+                # expired entries are revalidated...
+                enable_metadata_cache(str(tmp_path), ttl=-1)
+                use_service()
+                assert requests == {
+                    'capabilities': [None, etag[2]],
+                    'tables': [None, modified[2]],
+                    'table1': [None, etag[2]]}
+
+                # ...and used while the service is down
+                down.append(True)
+                use_service()
+            finally:
+                disable_metadata_cache()
+
     def _test_examples(self, parsed_examples):
         assert len(parsed_examples) == 6
         assert "SELECT * FROM rosmaster" in parsed_examples[0]['QUERY']
@@ -510,6 +690,165 @@ class TestTAPService:
         assert upload_methods[3].ivo_id == (
             'ivo://ivoa.net/std/TAPRegExt#upload-http')
 
+    def test_response_format(self, capabilities):
+        service = TAPService('http://example.com/tap')
+        # choosing the format makes no request of its own
+        assert service.response_format is None
+        assert not capabilities.called
+        assert 'RESPONSEFORMAT' not in service.create_query('SELECT 1')
+
+        assert service.capabilities
+        assert service.response_format == (
+            'application/x-votable+xml;serialization=binary2')
+        assert service.create_query('SELECT 1')['RESPONSEFORMAT'] == (
+            'application/x-votable+xml;serialization=binary2')
+
+        service = TAPService('http://example.com/tap', response_format=None)
+        service.capabilities
+        assert service.response_format is None
+
+    def test_response_format_cached(self, capabilities, tmp_path):
+        try:
+            enable_metadata_cache(str(tmp_path))
+            assert TAPService('http://example.com/tap').response_format is None
+            TAPService('http://example.com/tap').capabilities
+            assert capabilities.call_count == 1
+
+            service = TAPService('http://example.com/tap')
+            assert service.response_format == (
+                'application/x-votable+xml;serialization=binary2')
+            assert capabilities.call_count == 1
+        finally:
+            disable_metadata_cache()
+
+    def test_response_format_fallback(self, mocker):
+        with mocker.register_uri(
+            'GET', re.compile('http://example.com/.*capabilities'), status_code=404
+        ):
+            service = TAPService('http://example.com/tap')
+            with pytest.raises(DALServiceError):
+                service.capabilities
+            assert service.response_format is None
+
+        query = service.create_query('SELECT * FROM ivoa.obscore')
+        assert 'RESPONSEFORMAT' not in query
+
+    @pytest.mark.usefixtures('capabilities')
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W27")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W48")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+    def test_run_sync_binary2(self, mocker):
+        tabledata = get_pkg_data_contents('data/tap/obscore-image.xml')
+        binary2 = BytesIO()
+        votableparse(BytesIO(tabledata)).to_xml(
+            binary2, tabledata_format='binary2')
+        requested = []
+
+        def callback(request, context):
+            responseformat = dict(parse_qsl(request.body)).get('RESPONSEFORMAT')
+            requested.append(responseformat)
+            if responseformat == 'application/x-votable+xml;serialization=binary2':
+                return binary2.getvalue()
+            return tabledata
+
+        with mocker.register_uri(
+            'POST', 'http://example.com/tap/sync', content=callback
+        ):
+            service = TAPService('http://example.com/tap')
+            service.capabilities
+            result = service.run_sync('SELECT * FROM ivoa.obscore')
+            expected = service.run_sync(
+                'SELECT * FROM ivoa.obscore', responseformat='votable')
+
+        assert requested == [
+            'application/x-votable+xml;serialization=binary2', 'votable']
+        assert result.fieldnames == expected.fieldnames
+        assert len(result) == len(expected)
+        for name in result.fieldnames:
+            assert np.ma.allequal(result.getcolumn(name), expected.getcolumn(name))
+
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W27")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W48")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+    @pytest.mark.parametrize('compression', [None, 'gzip'])
+    def test_run_sync_upload(self, mocker, compression):
+        table = Table({
+            'ra': np.linspace(0, 360, 25000),
+            'name': ['src{}'.format(i % 100) for i in range(25000)]})
+        posted = {}
+
+        def callback(request, context):
+            # the body is generated while it is sent
+            assert not isinstance(request.body, bytes)
+            message = BytesParser().parsebytes(
+                'Content-Type: {}\r\n\r\n'.format(
+                    request.headers['Content-Type']).encode('ascii')
+                + b''.join(request.body))
+            for part in message.get_payload():
+                content = part.get_payload(decode=True)
+                if part['Content-Encoding'] == 'gzip':
+                    content = gzip.decompress(content)
+                posted[part.get_param('name', header='content-disposition')] = (
+                    part.get_content_type(), content)
+            return get_pkg_data_contents('data/tap/obscore-image.xml')
+
+        with mocker.register_uri(
+            'POST', 'http://example.com/tap/sync', content=callback
+        ):
+            service = TAPService('http://example.com/tap', response_format=None)
+            service.upload_compression = compression
+            service.run_sync(
+                "SELECT * FROM TAP_UPLOAD.t", uploads={'t': table})
+
+        assert posted['UPLOAD'][1] == b't,param:t'
+        assert posted['QUERY'][1] == b'SELECT * FROM TAP_UPLOAD.t'
+        content_type, content = posted['t']
+        assert content_type == 'application/x-votable+xml'
+        assert b'<BINARY2>' in content
+
+        uploaded = votableparse(BytesIO(content)).get_first_table().to_table()
+        assert np.all(uploaded['ra'] == table['ra'])
+        assert np.all(uploaded['name'] == table['name'])
+
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W27")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W48")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+    @pytest.mark.parametrize('compression', [None, 'gzip'])
+    def test_run_sync_upload_redirect(self, mocker, compression):
+        fileobj = BytesIO(b'<VOTABLE/>' * 20000)
+        bodies = []
+
+        def redirect(request, context):
+            bodies.append(b''.join(request.body))
+            context.status_code = 307
+            context.headers['Location'] = 'http://example.com/tap/sync2'
+            return b''
+
+        def callback(request, context):
+            bodies.append(b''.join(request.body))
+            return get_pkg_data_contents('data/tap/obscore-image.xml')
+
+        with ExitStack() as stack:
+            stack.enter_context(mocker.register_uri(
+                'POST', 'http://example.com/tap/sync', content=redirect))
+            stack.enter_context(mocker.register_uri(
+                'POST', 'http://example.com/tap/sync2', content=callback))
+            service = TAPService('http://example.com/tap', response_format=None)
+            service.upload_compression = compression
+            service.run_sync(
+                "SELECT * FROM TAP_UPLOAD.t", uploads={'t': fileobj})
+
+        # the redirected request sends the whole body again
+        assert len(bodies) == 2
+        assert bodies[0] == bodies[1]
+
+        boundary = bodies[1].split(b'\r\n', 1)[0]
+        part = bodies[1].split(boundary)[-2]
+        content = part.split(b'\r\n\r\n', 1)[1][:-2]
+        if compression == 'gzip':
+            content = gzip.decompress(content)
+        assert content == b'<VOTABLE/>' * 20000
+
     @pytest.mark.usefixtures('sync_fixture')
     @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W27")
     @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W48")
@@ -537,6 +876,151 @@ class TestTAPService:
         results = service.run_async("SELECT * FROM ivoa.obscore")
         _test_image_results(results)
 
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W27")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W48")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+    def test_run_async_batch(self, mocker, monkeypatch):
+        monkeypatch.setattr(scheduler, 'SUBMIT_RETRY_DELAY', 0)
+        server = ConcurrentAsyncTAPServer(busy=2)
+        queries = ["SELECT * FROM ivoa.obscore WHERE n={}".format(i)
+                   for i in range(12)]
+        queries[5] = "SELECT * FROM test_erroneus_submit.non_existent"
+
+        for _ in server.use(mocker):
+            service = TAPService('http://example.com/tap', response_format=None)
+            outcomes = dict(service.run_async_batch(queries, max_running=3))
+
+        assert sorted(outcomes) == list(range(12))
+        assert isinstance(outcomes[5], SearchFailure)
+        assert isinstance(outcomes[5].error, DALQueryError)
+        for index, outcome in outcomes.items():
+            if index != 5:
+                assert not isinstance(outcome, SearchFailure), outcome.error
+                _test_image_results(outcome)
+
+        # three executing, and at most three more finished ones whose
+        # results are being fetched
+        assert server.max_jobs <= 6
+        assert server.deleted == 12
+        assert not server._jobs
+
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W27")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W48")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+    def test_run_async_batch_fetch(self, mocker, monkeypatch):
+        server = ConcurrentAsyncTAPServer()
+        created = []
+        fetched = []
+        fetch_result = AsyncTAPJob.fetch_result
+
+        def slow_fetch_result(job):
+            # wait for the next job, which is only submitted meanwhile if
+            # fetching does not block the submissions
+            fetched.append(job)
+            deadline = time.monotonic() + 5
+            while (len(fetched) < 3 and len(created) <= len(fetched)
+                   and time.monotonic() < deadline):
+                time.sleep(0.01)
+            return fetch_result(job)
+
+        def create(request, context):
+            created.append(request)
+            return ConcurrentAsyncTAPServer.create(server, request, context)
+
+        monkeypatch.setattr(AsyncTAPJob, 'fetch_result', slow_fetch_result)
+        monkeypatch.setattr(server, 'create', create)
+        queries = ["SELECT * FROM ivoa.obscore WHERE n={}".format(i)
+                   for i in range(3)]
+
+        for _ in server.use(mocker):
+            service = TAPService('http://example.com/tap', response_format=None)
+            started = time.monotonic()
+            outcomes = dict(service.run_async_batch(queries, max_running=1))
+
+        assert sorted(outcomes) == [0, 1, 2]
+        for outcome in outcomes.values():
+            assert not isinstance(outcome, SearchFailure), outcome.error
+        assert time.monotonic() - started < 5
+
+    def test_job_watcher(self, mocker):
+        server = SlowAsyncTAPServer()
+        called = []
+
+        for _ in server.use(mocker):
+            service = TAPService('http://example.com/tap')
+            jobs = [service.submit_job("SELECT {}".format(i)).run()
+                    for i in range(10)]
+            job_gets = server.job_gets
+
+            with scheduler.JobWatcher(
+                    service, min_interval=0.01, max_interval=0.02) as watcher:
+                futures = [watcher.watch(job, callback=called.append)
+                           for job in jobs]
+                time.sleep(0.2)
+                assert not any(future.done() for future in futures)
+                # one request per round for all jobs...
+                assert server.listings > 1
+                assert server.job_gets == job_gets
+
+                server.finish(*(int(job.job_id) for job in jobs))
+                for job, future in zip(jobs, futures):
+                    assert future.result(timeout=5) is job
+                # ...and one more for each finished job
+                assert server.job_gets == job_gets + 10
+                assert all(job.phase == 'COMPLETED' for job in jobs)
+
+        assert sorted(called, key=futures.index) == futures
+
+    def test_job_watcher_wait(self, mocker, monkeypatch):
+        server = SlowAsyncTAPServer()
+        released = threading.Event()
+
+        for _ in server.use(mocker):
+            service = TAPService('http://example.com/tap')
+            first, second = [service.submit_job("SELECT {}".format(i)).run()
+                             for i in range(2)]
+            update = first._update
+
+            def blocking_update(wait_for_statechange=False, **kwargs):
+                if wait_for_statechange:
+                    # a WAIT on a job that does not change its phase
+                    released.wait(10)
+                return update(wait_for_statechange=wait_for_statechange, **kwargs)
+
+            monkeypatch.setattr(first, '_update', blocking_update)
+
+            with scheduler.JobWatcher(
+                    service, min_interval=0.01, max_interval=0.02,
+                    wait_time=30) as watcher:
+                first_future = watcher.watch(first)
+                time.sleep(0.1)
+                second_future = watcher.watch(second)
+                server.finish(int(second.job_id))
+
+                # the pending WAIT does not hold up the new job
+                assert second_future.result(timeout=5) is second
+                assert not first_future.done()
+
+                server.finish(int(first.job_id))
+                released.set()
+                assert first_future.result(timeout=5) is first
+
+    @pytest.mark.usefixtures('async_fixture')
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W27")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W48")
+    @pytest.mark.filterwarnings("ignore::astropy.io.votable.exceptions.W06")
+    def test_fetch_result_iter(self):
+        service = TAPService('http://example.com/tap')
+        job = service.submit_job("SELECT * FROM ivoa.obscore").run().wait()
+        expected = job.fetch_result()
+
+        chunks = list(job.fetch_result_iter(chunk_size=1))
+        job.delete()
+
+        assert len(chunks) == len(expected)
+        assert [chunk.array['access_url'][0] for chunk in chunks] == list(
+            expected['access_url'])
+
     @pytest.mark.usefixtures('async_fixture')
     def test_submit_job(self):
         service = TAPService('http://example.com/tap')
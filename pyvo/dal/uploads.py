@@ -0,0 +1,169 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Streaming encoding of inline table uploads.
+
+Tables are uploaded as BINARY2 VOTables that are serialized a chunk of rows
+at a time, and the request is posted as a multipart/form-data body that is
+generated while it is sent.  Hence, neither the serialized table nor the
+request body is ever held in memory as a whole.
+"""
+import base64
+import io
+import uuid
+import zlib
+
+import numpy as np
+
+from astropy.io.votable import converters, from_table
+
+__all__ = ["iter_binary2_votable", "MultipartBody"]
+
+DEFAULT_CHUNK_ROWS = 10000
+
+DEFAULT_BLOCKSIZE = 65536
+
+VOTABLE_MIME = "application/x-votable+xml"
+
+
+def _encode_rows(fields, array):
+    # the BINARY2 serialization of the rows of a masked record array, as
+    # done by astropy's VOTable writer
+    encoders = []
+    for field in fields:
+        converter = field.converter.binoutput
+        # BINARY2 null flags cover whole values, only arrays take masks
+        encoders.append(
+            (converter, isinstance(field.converter, converters.Array)))
+
+    data = io.BytesIO()
+    values, masks = array.data, array.mask
+    for row in range(len(array)):
+        row_values, row_mask = values[row], masks[row]
+        data.write(converters.bool_to_bitarray(
+            np.array([np.all(mask) for mask in row_mask])))
+        for index, (converter, takes_mask) in enumerate(encoders):
+            data.write(converter(
+                row_values[index], row_mask[index] if takes_mask else None))
+    return data.getvalue()
+
+
+def iter_binary2_votable(table, *, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    yield the serialization of ``table`` as a BINARY2 VOTable in pieces.
+
+    The table is converted and encoded ``chunk_rows`` rows at a time, so
+    memory use does not grow with the size of the table.
+
+    Parameters
+    ----------
+    table : `astropy.table.Table`
+        the table to serialize
+    chunk_rows : int
+        the number of rows to encode at a time
+
+    Yields
+    ------
+    bytes
+    """
+    votable = from_table(table[:chunk_rows])
+    fields = votable.get_first_table().fields
+
+    out = io.BytesIO()
+    from_table(table[:0]).to_xml(out)
+    head, _, tail = out.getvalue().rpartition(b"</TABLE>")
+    yield head + b'<DATA><BINARY2><STREAM encoding="base64">\n'
+
+    pending = b""
+    for start in range(0, len(table), chunk_rows):
+        if start:
+            votable = from_table(table[start:start + chunk_rows])
+        data = pending + _encode_rows(
+            fields, votable.get_first_table().array)
+
+        # base64 works on groups of three bytes
+        split = len(data) - len(data) % 3
+        pending = data[split:]
+        if split:
+            yield base64.encodebytes(data[:split])
+
+    if pending:
+        yield base64.encodebytes(pending)
+    yield b"</STREAM></BINARY2></DATA>\n</TABLE>" + tail
+
+
+def iter_gzip(chunks):
+    """
+    yield the gzip compression of the byte strings in ``chunks``.
+    """
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class MultipartBody:
+    """
+    a multipart/form-data request body generated while it is sent.
+
+    Pass it as ``data`` to a `requests.Session` method along with the
+    ``Content-Type`` header from `content_type`; requests then sends it
+    with chunked transfer encoding.
+
+    Parameters
+    ----------
+    fields : iterable
+        (name, value) pairs of plain form fields; list values are sent as
+        repeated fields
+    files : iterable
+        (name, chunks, content_type, content_encoding) tuples for the file
+        parts, where ``chunks`` is a callable returning a new iterable of
+        byte strings and the latter two may be None
+
+    The body may be iterated more than once, e.g. when requests resends it
+    after a 307 or 308 redirect; ``chunks`` is called on every iteration.
+    """
+
+    def __init__(self, fields, files):
+        self._fields = list(fields)
+        self._files = list(files)
+        self.boundary = uuid.uuid4().hex
+
+    @property
+    def content_type(self):
+        """
+        the value of the Content-Type header for this body
+        """
+        return "multipart/form-data; boundary={}".format(self.boundary)
+
+    def _part_head(self, name, filename=None, headers=()):
+        disposition = 'form-data; name="{}"'.format(name)
+        if filename is not None:
+            disposition += '; filename="{}"'.format(filename)
+        lines = ["--" + self.boundary, "Content-Disposition: " + disposition]
+        lines.extend("{}: {}".format(*header) for header in headers)
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("utf-8")
+
+    def __iter__(self):
+        for name, value in self._fields:
+            if value is None:
+                continue
+            for item in value if isinstance(value, (list, tuple)) else [value]:
+                if not isinstance(item, bytes):
+                    item = str(item).encode("utf-8")
+                yield self._part_head(name) + item + b"\r\n"
+
+        for name, chunks, content_type, content_encoding in self._files:
+            headers = []
+            if content_type:
+                headers.append(("Content-Type", content_type))
+            if content_encoding:
+                headers.append(("Content-Encoding", content_encoding))
+            yield self._part_head(name, name, headers)
+            for chunk in chunks():
+                if chunk:
+                    yield chunk
+            yield b"\r\n"
+
+        yield "--{}--\r\n".format(self.boundary).encode("utf-8")
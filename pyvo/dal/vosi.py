@@ -2,25 +2,194 @@
 """
 VOSI classes and mixins
 """
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import io
 from itertools import chain
+import pickle
 import requests
 from urllib.parse import urlparse
 
+from astropy.utils.collections import HomogeneousList
 from astropy.utils.decorators import lazyproperty, deprecated
 
 from .exceptions import DALServiceError
+from .. import __version__
 from ..io import vosi
+from ..utils.cache import DiskCache, make_cache_key
 from ..utils.url import url_sibling
-from ..utils.decorators import stream_decode_content, response_decode_content
+from ..utils.xml.elements import Element
+from ..utils.decorators import stream_decode_content
 from ..utils.http import use_session
 
-__all__ = ['CapabilityMixin', 'VOSITables']
+__all__ = ['CapabilityMixin', 'VOSITables',
+           'enable_metadata_cache', 'disable_metadata_cache']
+
+# the cache for parsed service metadata (capabilities, tables, examples)
+_metadata_cache = None
+
+
+def enable_metadata_cache(directory, *, ttl=86400, max_size=2**30):
+    """
+    Cache parsed service metadata on disk.
+
+    The capabilities, table sets and examples of services are kept in
+    ``directory`` in a serialized form that loads much faster than the XML
+    can be parsed, keyed by the service URL, so that other processes and
+    later sessions need not download them again.  Entries older than
+    ``ttl`` seconds are revalidated with the server by their ETag or
+    Last-Modified date where the server sent one; if the server cannot be
+    reached, the outdated entry is used.
+
+    Only enable this with a directory no one else can write to, as
+    entries are unpickled.
+
+    Parameters
+    ----------
+    directory : str
+        the cache directory
+    ttl : float
+        the time in seconds before entries are revalidated
+    max_size : int
+        the maximal size of the cache in bytes
+
+    Returns
+    -------
+    `~pyvo.utils.cache.DiskCache`
+        the cache now in use
+    """
+    global _metadata_cache
+    _metadata_cache = DiskCache(directory, ttl=ttl, max_size=max_size)
+    return _metadata_cache
+
+
+def disable_metadata_cache():
+    """
+    Stop caching service metadata.  Cached entries are kept.
+    """
+    global _metadata_cache
+    _metadata_cache = None
+
+
+def _new_list(cls, types):
+    obj = list.__new__(cls)
+    obj._types = types
+    return obj
+
+
+def _new_element(cls):
+    return object.__new__(cls)
+
+
+class _MetadataPickler(pickle.Pickler):
+    # the default way of unpickling does not work for the metadata trees:
+    # astropy's HomogeneousList checks items on insertion against an
+    # attribute that is only restored later, and the elements run their
+    # constructors (and validation) when created.
+    def reducer_override(self, obj):
+        if isinstance(obj, HomogeneousList):
+            return (_new_list, (type(obj), obj._types), obj.__dict__,
+                    iter(obj))
+        if isinstance(obj, Element):
+            return _new_element, (type(obj),), obj.__dict__
+        return NotImplemented
+
+
+def _dumps(obj):
+    out = io.BytesIO()
+    _MetadataPickler(out, pickle.HIGHEST_PROTOCOL).dump(obj)
+    return out.getvalue()
+
+
+def _loads(path):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception:
+        # an unreadable or outdated entry is just a miss
+        return None
+
+
+def _cached_metadata(url, kind, fetch, parse):
+    """
+    return the parsed metadata of ``kind`` for the service at ``url``,
+    from the metadata cache if enabled.
+
+    ``fetch`` is called with a dictionary of request headers and returns
+    the response (with status 200 or, for conditional requests, 304) or
+    raises a `DALServiceError`; ``parse`` turns the response into the
+    object to cache.
+    """
+    cache = _metadata_cache
+    if cache is None:
+        return _parse_response(parse, fetch({}))
+
+    key = make_cache_key("metadata", __version__, kind, url)
+    found = cache.lookup(key, include_expired=True)
+    if found is not None:
+        path, meta = found
+        cached = _loads(path)
+        if cached is not None:
+            if not cache.is_expired(meta):
+                return cached
+
+            headers = {}
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            elif meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+            if headers:
+                try:
+                    response = fetch(headers)
+                except DALServiceError:
+                    return cached
+                if response.status_code == 304:
+                    cache.touch(key)
+                    return cached
+                return _store_metadata(cache, key, parse, response)
+
+    return _store_metadata(cache, key, parse, fetch({}))
+
+
+def _peek_cached_metadata(url, kind):
+    """
+    return the metadata of ``kind`` for the service at ``url`` if it is in
+    the metadata cache, expired or not, and None otherwise.  This never
+    makes a request.
+    """
+    cache = _metadata_cache
+    if cache is None:
+        return None
+    found = cache.lookup(
+        make_cache_key("metadata", __version__, kind, url), include_expired=True)
+    if found is None:
+        return None
+    return _loads(found[0])
+
+
+def _parse_response(parse, response):
+    # requests doesn't decode the content by default
+    response.raw.read = partial(response.raw.read, decode_content=True)
+    return parse(response)
+
+
+def _store_metadata(cache, key, parse, response):
+    parsed = _parse_response(parse, response)
+    cache.put(
+        key, _dumps(parsed),
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"))
+    return parsed
 
 
 class EndpointMixin():
     def _get_endpoint(self, endpoint):
         # finds the endpoint relative to the base url or its parent
         # and returns its content in raw format
+        return self._get_endpoint_response(endpoint).raw
+
+    def _get_endpoint_response(self, endpoint, headers=None):
 
         # do not trust baseurl as it might contain query or fragments
         urlcomp = urlparse(self.baseurl)
@@ -37,7 +206,8 @@ class EndpointMixin():
 
         for ep_url in ep_urls:
             try:
-                response = self._session.get(ep_url, stream=True)
+                response = self._session.get(
+                    ep_url, stream=True, headers=headers)
                 response.raise_for_status()
                 break
             except requests.RequestException:
@@ -47,7 +217,7 @@ class EndpointMixin():
                 "No working {endpoint} endpoint provided".format(
                     endpoint=endpoint))
 
-        return response.raw
+        return response
 
 
 @deprecated(since="1.5")
@@ -100,7 +270,10 @@ class CapabilityMixin(EndpointMixin):
 
     @lazyproperty
     def capabilities(self):
-        return vosi.parse_capabilities(self._capabilities().read)
+        return _cached_metadata(
+            self.baseurl, "capabilities",
+            partial(self._get_endpoint_response, "capabilities"),
+            lambda response: vosi.parse_capabilities(response.raw.read))
 
 
 class TablesMixin(CapabilityMixin):
@@ -136,7 +309,7 @@ class TablesMixin(CapabilityMixin):
 
     @lazyproperty
     def tables(self):
-        return VOSITables(vosi.parse_tables(self._tables().read))
+        return VOSITables(vosi.parse_tables(self._tables().read, lazy=True))
 
 
 class VOSITables:
@@ -144,12 +317,23 @@ class VOSITables:
     This class encapsulates access to the VOSITables using a given Endpoint.
     Access to table names is like accessing dictionary keys. using iterator
     syntax or `keys()`
+
+    The tables are parsed from the tableset document when first accessed;
+    tables listed there without their columns are retrieved from the
+    endpoint instead.  Iterating over the tables retrieves the missing ones
+    ahead, ``prefetch_workers`` at a time; call `prefetch` to get them all
+    at once.
     """
+
+    #: the number of table documents retrieved concurrently while iterating
+    #: over the tables; 1 retrieves them one by one as they are needed.
+    prefetch_workers = 8
+
     def __init__(self, vosi_tables, endpoint_url, *, session=None):
         self._vosi_tables = vosi_tables
         self._endpoint_url = endpoint_url
         self._cache = {}
-        self._session = use_session(session)
+        self._session = use_session(session, url=endpoint_url)
 
     def __len__(self):
         return self._vosi_tables.ntables
@@ -158,12 +342,19 @@ class VOSITables:
         return self._get_table(key)
 
     def __iter__(self):
-        for tablename in self.keys():
+        for tablename in self._iter_prefetching():
             yield self._get_table(tablename)
 
     def __contains__(self, tablename):
         return tablename in self.keys()
 
+    def _is_missing(self, name):
+        # whether the table still needs to be retrieved from the endpoint
+        if name in self._cache:
+            return False
+        table = self._vosi_tables.get_table_by_name(name)
+        return not table.columns and not table.foreignkeys
+
     def _get_table(self, name):
         if name in self._cache:
             return self._cache[name]
@@ -172,35 +363,85 @@ class VOSITables:
 
         if not table.columns and not table.foreignkeys:
             tables_url = '{}/{}'.format(self._endpoint_url, name)
-            response = self._get_table_file(tables_url)
-
-            try:
-                response.raise_for_status()
-            except requests.RequestException as ex:
-                raise DALServiceError.from_except(ex, tables_url)
-
-            table = vosi.parse_tables(response.raw.read).get_first_table()
+            table = _cached_metadata(
+                tables_url, "table", partial(self._get_table_file, tables_url),
+                lambda response: vosi.parse_tables(
+                    response.raw.read).get_first_table())
             self._cache[name] = table
 
         return table
 
-    @response_decode_content
-    def _get_table_file(self, tables_url):
-        return self._session.get(tables_url, stream=True)
+    def _prefetch(self, names, workers):
+        # retrieves the missing tables among names concurrently and returns
+        # the errors by table name
+        names = [name for name in names if self._is_missing(name)]
+        errors = {}
+        if not names:
+            return errors
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(self._get_table, name)
+                       for name in names}
+            for name, future in futures.items():
+                try:
+                    future.result()
+                except Exception as ex:
+                    errors[name] = ex
+        return errors
+
+    def _iter_prefetching(self):
+        # yields the table names, retrieving the tables ahead of time
+        names = list(self.keys())
+        workers = self.prefetch_workers
+        for index, name in enumerate(names):
+            if workers > 1 and self._is_missing(name):
+                # the errors surface when the tables are accessed
+                self._prefetch(names[index:index + 4 * workers], workers)
+            yield name
+
+    def prefetch(self, names=None, *, workers=8):
+        """
+        retrieve the tables listed without their columns from the endpoint
+        concurrently, such that later accesses need no further requests.
+
+        Parameters
+        ----------
+        names : iterable of str
+            the names of the tables to retrieve; by default, all tables.
+        workers : int
+            the maximal number of requests at the same time
+
+        Raises
+        ------
+        DALServiceError
+            if a table could not be retrieved; the other tables are
+            retrieved nevertheless.
+        """
+        errors = self._prefetch(
+            self.keys() if names is None else names, workers)
+        if errors:
+            raise next(iter(errors.values()))
+
+    def _get_table_file(self, tables_url, headers=None):
+        response = self._session.get(tables_url, stream=True, headers=headers)
+        try:
+            response.raise_for_status()
+        except requests.RequestException as ex:
+            raise DALServiceError.from_except(ex, tables_url)
+        return response
 
     def keys(self):
         """
         Iterates over the keys (table names).
         """
-        for table in self._vosi_tables.iter_tables():
-            yield table.name
+        yield from self._vosi_tables.iter_table_names()
 
     def values(self):
         """
         Iterates over the values (tables).
         Gathers missing values from endpoint if necessary.
         """
-        for name in self.keys():
+        for name in self._iter_prefetching():
             yield self._get_table(name)
 
     def items(self):
@@ -208,7 +449,7 @@ class VOSITables:
         Iterates over keys and values (table names and tables).
         Gathers missing values from endpoint if necessary.
         """
-        for name in self.keys():
+        for name in self._iter_prefetching():
             yield (name, self._get_table(name))
 
     def describe(self):
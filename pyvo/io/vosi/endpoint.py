@@ -3,7 +3,10 @@
 This file contains a contains the high-level functions to read the various
 VOSI Endpoints.
 """
+from io import BytesIO
+from xml.parsers import expat
 
+from astropy.utils.data import get_readable_fileobj
 from astropy.utils.xml import iterparser
 from astropy.utils.collections import HomogeneousList
 from astropy.io.votable.exceptions import vo_raise, vo_warn
@@ -17,7 +20,7 @@ from .exceptions import W15, W16, E07, E10
 
 __all__ = [
     "parse_tables", "parse_capabilities", "parse_availability",
-    "TablesFile", "CapabilitiesFile", "AvailabilityFile"]
+    "TablesFile", "LazyTablesFile", "CapabilitiesFile", "AvailabilityFile"]
 
 
 def _pedantic_settings(pedantic):
@@ -45,7 +48,118 @@ def _pedantic_settings(pedantic):
         return {'verify': 'warn'}
 
 
-def parse_tables(source, *, pedantic=None, filename=None,
+def _read_source(source):
+    """
+    Returns the content of a path, file-like object or read function as
+    bytes.
+    """
+    if isinstance(source, str):
+        with get_readable_fileobj(source, encoding='binary') as fd:
+            return fd.read()
+
+    read = source if callable(source) else source.read
+    chunks = []
+    while True:
+        chunk = read(2 ** 16)
+        if not chunk:
+            break
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+class _TableIndexer:
+    """
+    Records the name and the byte range of each table of a tableset (or
+    single table) document in one pass with expat, without building any
+    elements.
+    """
+
+    def __init__(self, data):
+        self._data = data
+        self._parser = None
+        self._stack = []
+        self._table = None
+        self._in_name = False
+        self._leaf = False
+
+        self.root = None
+        self.prolog = b''
+        self.tables = []
+
+    def run(self):
+        self._parser = parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.XmlDeclHandler = self._xml_decl
+        parser.StartElementHandler = self._start
+        parser.EndElementHandler = self._end
+        parser.CharacterDataHandler = self._characters
+        parser.Parse(self._data, True)
+
+    def _xml_decl(self, version, encoding, standalone):
+        # the tables are parsed on their own later, so they need the
+        # encoding of the document
+        if encoding:
+            self.prolog = '<?xml version="{}" encoding="{}"?>'.format(
+                version or '1.0', encoding).encode('ascii')
+
+    def _start(self, name, attrs):
+        name = name.rpartition(':')[2]
+        if self.root is None:
+            self.root = name
+
+        if self._table is not None:
+            self._leaf = False
+            if len(self._stack) == self._table[0] + 1 and name == 'name':
+                self._in_name = True
+        elif name == 'table' and (
+                not self._stack or self._stack == ['tableset', 'schema']):
+            self._table = (
+                len(self._stack), self._parser.CurrentByteIndex, [])
+            self._leaf = True
+
+        self._stack.append(name)
+
+    def _end(self, name):
+        self._stack.pop()
+        self._in_name = False
+        if self._table is None or len(self._stack) != self._table[0]:
+            return
+
+        depth, start, name_parts = self._table
+        index = self._parser.CurrentByteIndex
+        if self._leaf and self._data[index - 2:index] == b'/>':
+            # expat reports the end of empty-element tags after them
+            stop = index
+        else:
+            stop = self._data.index(b'>', index) + 1
+        self.tables.append((''.join(name_parts).strip(), start, stop))
+        self._table = None
+
+    def _characters(self, text):
+        if self._table is not None:
+            self._leaf = False
+            if self._in_name:
+                self._table[2].append(text)
+
+
+def _index_tables(data):
+    """
+    Returns a `_TableIndexer` that has run over data, or None if data is
+    not a well-formed tableset or table document.
+    """
+    indexer = _TableIndexer(data)
+    try:
+        indexer.run()
+    except expat.ExpatError:
+        return None
+    if indexer.root not in ('tableset', 'table'):
+        return None
+    return indexer
+
+
+def parse_tables(source, *, pedantic=None, filename=None, lazy=False,
                  _debug_python_based_parser=False):
     """
     Parses a tableset xml file (or file-like object), and returns a
@@ -67,6 +181,12 @@ def parse_tables(source, *, pedantic=None, filename=None,
         then *source* will be used as a filename for error messages.
         Therefore, *filename* is only required when source is a
         file-like object.
+    lazy : bool, optional
+        When `True`, only the names and positions of the tables are read
+        at first, and each table is parsed when first looked up or
+        iterated over; see `~pyvo.io.vosi.endpoint.LazyTablesFile`.
+        Errors and warnings about a table then surface only when it is
+        parsed.  Defaults to False.
 
     Returns
     -------
@@ -83,6 +203,16 @@ def parse_tables(source, *, pedantic=None, filename=None,
     else:
         config['filename'] = filename
 
+    if lazy:
+        data = _read_source(source)
+        index = _index_tables(data)
+        if index is not None:
+            return LazyTablesFile(
+                data, index.tables, prolog=index.prolog, config=config,
+                pos=(1, 1))
+        # not a tableset; let the full parser complain
+        source = BytesIO(data)
+
     with iterparser.get_xml_iterator(
         source,
         _debug_python_based_parser=_debug_python_based_parser
@@ -197,6 +327,7 @@ class TablesFile(Element):
         self._table = None
 
         self._ntables = None
+        self._table_index = None
 
         version = str(version)
         if version not in ("1.0", "1.1"):
@@ -304,14 +435,145 @@ class TablesFile(Element):
             return table
         raise IndexError("No table found in VOSITables file.")
 
+    def iter_table_names(self):
+        """
+        Iterates over the names of all tables in the VOSITables file.
+        """
+        for table in self.iter_tables():
+            yield table.name
+
     def get_table_by_name(self, name):
         """
         Looks up a table element by the given name.
         """
-        for table in self.iter_tables():
-            if table.name == name:
-                return table
-        raise KeyError("No table with name {} found".format(name))
+        table = (self._table_index or {}).get(name)
+        if table is None or table.name != name:
+            # (re-)build the index, as tables may have been added
+            self._table_index = {}
+            for candidate in self.iter_tables():
+                self._table_index.setdefault(candidate.name, candidate)
+            table = self._table_index.get(name)
+
+        if table is None:
+            raise KeyError("No table with name {} found".format(name))
+        return table
+
+
+class LazyTablesFile(TablesFile):
+    """
+    A `TablesFile` parsing its tables only when they are needed, as
+    returned by ``parse_tables(source, lazy=True)``.
+
+    On creation, only the names and the positions of the tables in the
+    document are known.  Looking up a table by name or iterating over the
+    tables parses them one by one, keeping the tables once parsed; listing
+    the table names parses none.  Accessing `tableset` or `table` parses
+    the whole document.
+    """
+
+    def __init__(self, data, tables, *, prolog=b'', config=None, pos=None):
+        super().__init__(config=config, pos=pos)
+
+        self._data = data
+        self._prolog = prolog
+        self._entries = tables
+        self._positions = {}
+        for position, (name, _, _) in enumerate(tables):
+            self._positions.setdefault(name, position)
+
+        self._parsed = {}
+        self._complete = False
+        self._ntables = len(tables)
+
+    def __repr__(self):
+        return '<LazyTablesFile: {} tables, {} parsed>'.format(
+            self._ntables, len(self._parsed))
+
+    @TablesFile.tableset.getter
+    def tableset(self):
+        """
+        The tableset. Must be a `TableSet` object.
+        """
+        self._parse_all()
+        return self._tableset
+
+    @TablesFile.table.getter
+    def table(self):
+        """
+        The `VODataServiceTable` root element if present.
+        """
+        self._parse_all()
+        return self._table
+
+    def _parse_table(self, position):
+        table = self._parsed.get(position)
+        if table is None:
+            _, start, stop = self._entries[position]
+            config = dict(self._config)
+            with iterparser.get_xml_iterator(
+                BytesIO(self._prolog + self._data[start:stop])
+            ) as iterator:
+                table = TablesFile(config=config, pos=(1, 1)).parse(
+                    iterator, config).table
+            # another thread may have been faster
+            table = self._parsed.setdefault(position, table)
+        return table
+
+    def _parse_all(self):
+        if self._complete:
+            return
+
+        config = dict(self._config)
+        with iterparser.get_xml_iterator(BytesIO(self._data)) as iterator:
+            tables_file = TablesFile(config=config, pos=(1, 1)).parse(
+                iterator, config)
+
+        # keep the tables already handed out
+        if tables_file._table is not None:
+            tables_file._table = self._parsed.setdefault(
+                0, tables_file._table)
+        else:
+            position = 0
+            for schema in tables_file._tableset.schemas:
+                for index, table in enumerate(schema.tables):
+                    parsed = self._parsed.get(position)
+                    if parsed is not None and parsed.name == table.name:
+                        schema.tables[index] = parsed
+                    else:
+                        self._parsed[position] = table
+                    position += 1
+
+        self._tableset = tables_file._tableset
+        self._table = tables_file._table
+        self._version = tables_file._version
+        self._complete = True
+
+    def iter_tables(self):
+        """
+        Iterates over all tables in the VOSITables file in a "flat" way,
+        ignoring the schemas, parsing each table when it is reached.
+        """
+        for position in range(len(self._entries)):
+            yield self._parse_table(position)
+
+    def iter_table_names(self):
+        """
+        Iterates over the names of all tables in the VOSITables file
+        without parsing them.
+        """
+        for name, _, _ in self._entries:
+            yield name
+
+    def get_table_by_name(self, name):
+        """
+        Looks up a table element by the given name, parsing it if needed.
+        """
+        try:
+            position = self._positions[name]
+        except KeyError:
+            raise KeyError(
+                "No table with name {} found".format(name)) from None
+        return self._parse_table(position)
 
 
 class CapabilitiesFile(Element, HomogeneousList):
@@ -401,3 +401,63 @@ class TestTables:
             onedesc_table.describe()
             output = buf.getvalue()
         assert describe_string in output
+
+    def test_lazy(self):
+        tablesfile = vosi.parse_tables(
+            get_pkg_data_filename("data/tables.xml"), lazy=True)
+        assert isinstance(tablesfile, vosi.endpoint.LazyTablesFile)
+        assert tablesfile.ntables == 1
+        assert list(tablesfile.iter_table_names()) == ["test.all"]
+        assert not tablesfile._parsed
+
+        table = tablesfile.get_table_by_name("test.all")
+        assert table.title == "Test table"
+        assert table.columns[0].name == "id"
+        assert table.foreignkeys[0].targettable == "test.foreigntable"
+        assert tablesfile.get_table_by_name("test.all") is table
+        assert tablesfile.tableset.schemas[0].tables[0] is table
+
+        with pytest.raises(KeyError):
+            tablesfile.get_table_by_name("test.missing")
+
+    def test_lazy_many_tables(self):
+        tableset = (
+            '<?xml version="1.0" encoding="ISO-8859-1"?>'
+            '<vtm:tableset xmlns:vtm="http://www.ivoa.net/xml/VOSITables/v1.0"'
+            ' xmlns:vs="http://www.ivoa.net/xml/VODataService/v1.1">'
+            '<schema><name>s</name>{}<table><name>s.empty</name></table>'
+            '<table/></schema></vtm:tableset>').format(''.join(
+                '<table><name> s.t{0} </name><description>caf\xe9</description>'
+                '<column><name>c{0}</name></column></table>'.format(index)
+                for index in range(100))).encode('latin-1')
+
+        tablesfile = vosi.parse_tables(io.BytesIO(tableset), lazy=True)
+        assert tablesfile.ntables == 102
+        assert list(tablesfile.iter_table_names())[-3:] == [
+            "s.t99", "s.empty", ""]
+
+        table = tablesfile.get_table_by_name("s.t42")
+        assert table.columns[0].name == "c42"
+        assert table.description == "caf\xe9"
+        assert len(tablesfile._parsed) == 1
+        assert not tablesfile.get_table_by_name("s.empty").columns
+
+        # errors in a table surface when it is parsed
+        with pytest.raises(E06):
+            list(tablesfile.iter_tables())
+
+    def test_lazy_single_table(self):
+        tablesfile = vosi.parse_tables(io.BytesIO(
+            b'<table><name>s.t</name><column><name>c</name></column>'
+            b'</table>'), lazy=True)
+        table = tablesfile.get_table_by_name("s.t")
+        assert table.columns[0].name == "c"
+        assert tablesfile.table is table
+
+    def test_table_index(self):
+        tablesfile = vosi.parse_tables(
+            get_pkg_data_filename("data/tables.xml"))
+        table = tablesfile.get_table_by_name("test.all")
+        assert tablesfile._table_index == {"test.all": table}
+        with pytest.raises(KeyError):
+            tablesfile.get_table_by_name("test.missing")
@@ -513,17 +513,17 @@ class RegistryResource(dalq.Record):
     def __init__(self, results, index, *, session=None):
         dalq.Record.__init__(self, results, index, session=session)
 
-        self._mapping["access_urls"
-                      ] = self._parse_pseudo_array(self._mapping["access_urls"])
-        self._mapping["standard_ids"] = [
+        self._setvalue(
+            "access_urls", self._parse_pseudo_array(self["access_urls"]))
+        self._setvalue("standard_ids", [
             regularize_SIA2_id(id) for id in
-                self._parse_pseudo_array(self._mapping["standard_ids"])]
-        self._mapping["intf_types"
-                      ] = self._parse_pseudo_array(self._mapping["intf_types"])
-        self._mapping["intf_roles"
-                      ] = self._parse_pseudo_array(self._mapping["intf_roles"])
-        self._mapping["cap_descriptions"
-                      ] = self._parse_pseudo_array(self._mapping["cap_descriptions"])
+                self._parse_pseudo_array(self["standard_ids"])])
+        self._setvalue(
+            "intf_types", self._parse_pseudo_array(self["intf_types"]))
+        self._setvalue(
+            "intf_roles", self._parse_pseudo_array(self["intf_roles"]))
+        self._setvalue(
+            "cap_descriptions", self._parse_pseudo_array(self["cap_descriptions"]))
 
         self.interfaces = [Interface(props[0], standard_id=props[1], intf_type=props[2],
                                      intf_role=props[3], capability_description=props[4])
@@ -0,0 +1,339 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+A simple on-disk cache with time-to-live and LRU eviction.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+__all__ = ["DiskCache", "make_cache_key"]
+
+
+def make_cache_key(*parts):
+    """
+    Return a stable hex digest for a sequence of JSON-serializable parts.
+    """
+    serialized = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class DiskCache:
+    """
+    A directory of cached byte streams.
+
+    Each entry consists of a data file and a small JSON file with metadata,
+    both named after the entry's key.  Entries older than ``ttl`` seconds
+    are treated as missing, and when the total size of the data exceeds
+    ``max_size`` bytes, the least recently used entries are removed.
+
+    Entries are written to temporary files and renamed into place, so
+    several threads or processes may share a cache directory.  Each
+    instance keeps a running total of the cached data and only scans the
+    directory, catching up with other writers, once that exceeds
+    ``max_size``.
+    """
+
+    def __init__(self, directory, *, ttl=None, max_size=None):
+        """
+        Parameters
+        ----------
+        directory : str
+            the directory to keep the cache in; it is created if necessary.
+        ttl : float
+            the time in seconds after which entries expire.  If None,
+            entries never expire.
+        max_size : int
+            the maximal total size of the cached data in bytes.  If None,
+            the cache is not size limited.
+        """
+        self._directory = os.path.abspath(os.path.expanduser(directory))
+        self._ttl = ttl
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        # the running total of the data sizes, known after the first scan
+        self._size = None
+        self._purged = time.time()
+        os.makedirs(self._directory, exist_ok=True)
+
+    def __repr__(self):
+        return "{}({!r}, ttl={!r}, max_size={!r})".format(
+            type(self).__name__, self._directory, self._ttl, self._max_size)
+
+    @property
+    def directory(self):
+        """
+        the cache directory
+        """
+        return self._directory
+
+    @property
+    def ttl(self):
+        """
+        the time in seconds after which entries expire
+        """
+        return self._ttl
+
+    @property
+    def max_size(self):
+        """
+        the maximal total size of the cached data in bytes
+        """
+        return self._max_size
+
+    def _datapath(self, key):
+        return os.path.join(self._directory, key + ".dat")
+
+    def _metapath(self, key):
+        return os.path.join(self._directory, key + ".json")
+
+    def _read_meta(self, key):
+        try:
+            with open(self._metapath(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_expired(self, meta):
+        """
+        True if an entry with the metadata ``meta`` has outlived the ttl.
+        """
+        if self._ttl is None:
+            return False
+        return time.time() - meta.get("stored", 0) > self._ttl
+
+    def lookup(self, key, *, include_expired=False):
+        """
+        Return the data path and metadata of an entry, or None if there
+        is no (unexpired) entry for ``key``.
+
+        A successful lookup marks the entry as recently used.
+        """
+        meta = self._read_meta(key)
+        path = self._datapath(key)
+        if meta is None or not os.path.exists(path):
+            return None
+
+        if not include_expired and self.is_expired(meta):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path, meta
+
+    def open(self, key):
+        """
+        Return an open binary file for the entry ``key``, or None if there
+        is no (unexpired) entry.
+        """
+        found = self.lookup(key)
+        if found is None:
+            return None
+
+        try:
+            return open(found[0], "rb")
+        except OSError:
+            return None
+
+    def touch(self, key, **meta):
+        """
+        Mark an entry as fresh again, e.g. after revalidating it with the
+        server, and update its metadata with ``meta``.
+        """
+        stored = self._read_meta(key)
+        if stored is None:
+            return
+        stored.update(meta)
+        stored["stored"] = time.time()
+        self._write_meta(key, stored)
+
+    def writer(self, key, **meta):
+        """
+        Return a file-like object that stores what is written to it as the
+        entry ``key`` once it is committed.
+
+        The metadata passed as keywords is stored along with the data.
+        """
+        return _EntryWriter(self, key, meta)
+
+    def put(self, key, data, **meta):
+        """
+        Store the bytes ``data`` as entry ``key`` and return its data path.
+        """
+        with self.writer(key, **meta) as writer:
+            writer.write(data)
+        return self._datapath(key)
+
+    def _write_meta(self, key, meta):
+        fd, tmppath = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmppath, self._metapath(key))
+
+    def _commit(self, key, tmppath, meta):
+        size = os.path.getsize(tmppath)
+        meta = dict(meta, stored=time.time(), size=size)
+        replaced = _getsize(self._datapath(key))
+        os.replace(tmppath, self._datapath(key))
+        self._write_meta(key, meta)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += size - replaced
+            full = self._max_size is not None and self._size > self._max_size
+            # without a size limit, expired entries are purged once per ttl
+            stale = (self._ttl is not None
+                     and time.time() - self._purged > self._ttl)
+        if full or stale:
+            self.evict()
+
+    def _remove(self, key):
+        # returns the size of the data removed
+        size = _getsize(self._datapath(key))
+        for path in (self._metapath(key), self._datapath(key)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return size
+
+    def remove(self, key):
+        """
+        Remove the entry ``key`` if it exists.
+        """
+        size = self._remove(key)
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def _entries(self):
+        entries = []
+        with os.scandir(self._directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".dat"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.name[:-4]))
+        return entries
+
+    def size(self):
+        """
+        the total size of the cached data in bytes
+        """
+        with self._lock:
+            self._size = sum(size for _, size, _ in self._entries())
+            return self._size
+
+    def evict(self):
+        """
+        Remove expired entries and, if the cache exceeds its size limit,
+        the least recently used ones.
+
+        This scans the whole cache directory; committing entries only
+        does so when the cache has grown beyond its limit.
+        """
+        with self._lock:
+            entries = self._entries()
+            if self._ttl is not None:
+                self._purged = time.time()
+                for entry in list(entries):
+                    meta = self._read_meta(entry[2])
+                    if meta is not None and self.is_expired(meta):
+                        self._remove(entry[2])
+                        entries.remove(entry)
+
+            total = sum(size for _, size, _ in entries)
+            if self._max_size is not None:
+                for _, size, key in sorted(entries):
+                    if total <= self._max_size:
+                        break
+                    self._remove(key)
+                    total -= size
+            self._size = total
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        for _, _, key in self._entries():
+            self.remove(key)
+
+
+def _getsize(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class _EntryWriter:
+    """
+    A writable file that becomes a cache entry when committed.
+
+    Leaving a ``with`` block without an exception commits the entry,
+    closing the writer without committing discards what was written.
+    """
+
+    def __init__(self, cache, key, meta):
+        self._cache = cache
+        self._key = key
+        self._meta = meta
+        fd, self._tmppath = tempfile.mkstemp(
+            dir=cache.directory, suffix=".tmp")
+        self._file = os.fdopen(fd, "w+b")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.close()
+
+    def write(self, data):
+        return self._file.write(data)
+
+    def tell(self):
+        """
+        Return the number of bytes written so far.
+        """
+        return self._file.tell()
+
+    def copy_to(self, out):
+        """
+        Copy what has been written so far to the binary file ``out``.
+        """
+        self._file.seek(0)
+        shutil.copyfileobj(self._file, out)
+
+    def commit(self):
+        """
+        Finish writing and store the entry in the cache.
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        self._cache._commit(self._key, self._tmppath, self._meta)
+
+    def close(self):
+        """
+        Discard the entry unless it has been committed.
+        """
+        if self._file.closed:
+            return
+        self._file.close()
+        try:
+            os.remove(self._tmppath)
+        except OSError:
+            pass
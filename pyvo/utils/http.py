@@ -2,22 +2,52 @@
 """
 HTTP utils
 """
+import os
 import platform
+import threading
+from urllib.parse import urlparse
+
 import requests
+from requests.adapters import HTTPAdapter
+
 from ..version import version
 
+__all__ = ["DEFAULT_USER_AGENT", "use_session", "create_session",
+           "get_shared_session", "configure_session_pool", "clear_shared_sessions"]
+
 DEFAULT_USER_AGENT = f'pyVO/{version} Python/{platform.python_version()} ({platform.system()})'
 
+# connection pool settings applied to the sessions created by create_session.
+# pool_connections is the number of hosts for which pools are kept,
+# pool_maxsize is the number of keep-alive connections kept per host.
+_pool_settings = {
+    "pool_connections": 10,
+    "pool_maxsize": 10,
+    "max_retries": 0,
+}
+
+# process-wide registry of shared sessions, keyed by host
+_shared_sessions = {}
+_shared_sessions_lock = threading.Lock()
 
-def use_session(session):
+
+def use_session(session, *, url=None):
     """
-    Return the session passed in, or create a default
-    session to use for this network request.
+    Return the session passed in, or a shared default session
+    to use for this network request.
+
+    Parameters
+    ----------
+    session : object
+        a requests.Session like object or None
+    url : str, optional
+        the URL the session will mainly be used for.  It is used to
+        pick the shared session of the corresponding host.
     """
     if session:
         return session
     else:
-        return create_session()
+        return get_shared_session(url)
 
 
 def create_session():
@@ -27,4 +57,95 @@ def create_session():
     """
     session = requests.Session()
     session.headers['User-Agent'] = DEFAULT_USER_AGENT
+
+    adapter = HTTPAdapter(**_pool_settings)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _host_key(url):
+    if not url:
+        return None
+    if isinstance(url, bytes):
+        url = url.decode("utf-8")
+    urlcomp = urlparse(url)
+    return (urlcomp.scheme.lower(), (urlcomp.netloc or '').lower())
+
+
+def get_shared_session(url=None):
+    """
+    Return the process-wide session for the host of ``url``.
+
+    Shared sessions keep their connections alive between requests, so
+    repeated calls to the same service avoid new TCP and TLS handshakes.
+    Sessions are created on first use and are safe to retrieve from
+    several threads.  Use `create_session` instead if the session is going
+    to be modified, e.g. by adding credentials.
+
+    Parameters
+    ----------
+    url : str, optional
+        a URL on the host the session is for.  If omitted, a host
+        independent default session is returned.
+    """
+    key = _host_key(url)
+    session = _shared_sessions.get(key)
+    if session is None:
+        with _shared_sessions_lock:
+            session = _shared_sessions.get(key)
+            if session is None:
+                session = _shared_sessions[key] = create_session()
     return session
+
+
+def configure_session_pool(*, pool_connections=None, pool_maxsize=None, max_retries=None):
+    """
+    Configure the connection pools of sessions created by pyvo.
+
+    Changing the settings discards the existing shared sessions, such
+    that the new settings apply to all subsequent requests made through
+    them.  Sessions already handed out keep working with their old pools.
+
+    Parameters
+    ----------
+    pool_connections : int, optional
+        the number of hosts to keep connection pools for.
+    pool_maxsize : int, optional
+        the maximum number of connections kept alive per host.  This should
+        be at least the number of threads making concurrent requests.
+    max_retries : int or urllib3.util.Retry, optional
+        retries for failed connections, as accepted by
+        `requests.adapters.HTTPAdapter`.
+    """
+    settings = {
+        "pool_connections": pool_connections,
+        "pool_maxsize": pool_maxsize,
+        "max_retries": max_retries,
+    }
+    _pool_settings.update(
+        {key: value for key, value in settings.items() if value is not None})
+    clear_shared_sessions()
+
+
+def clear_shared_sessions():
+    """
+    Close and forget all shared sessions.
+    """
+    with _shared_sessions_lock:
+        sessions = list(_shared_sessions.values())
+        _shared_sessions.clear()
+
+    for session in sessions:
+        session.close()
+
+
+def _reset_after_fork():
+    # pooled connections must not be shared with a forked child
+    global _shared_sessions_lock
+    _shared_sessions_lock = threading.Lock()
+    _shared_sessions.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
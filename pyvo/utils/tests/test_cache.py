@@ -0,0 +1,93 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Tests for pyvo.utils.cache
+"""
+import os
+import time
+
+from pyvo.utils.cache import DiskCache, make_cache_key
+
+
+def test_make_cache_key():
+    assert make_cache_key('a', {'x': 1, 'y': 2}) == make_cache_key('a', {'y': 2, 'x': 1})
+    assert make_cache_key('a', 1) != make_cache_key('a', 2)
+
+
+def test_put_open(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    assert cache.open('key') is None
+
+    cache.put('key', b'data', url='http://example.com')
+    with cache.open('key') as f:
+        assert f.read() == b'data'
+
+    path, meta = cache.lookup('key')
+    assert meta['url'] == 'http://example.com'
+    assert meta['size'] == 4
+
+
+def test_writer_discard(tmp_path):
+    cache = DiskCache(str(tmp_path))
+    writer = cache.writer('key')
+    writer.write(b'partial')
+    writer.close()
+
+    assert cache.open('key') is None
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_ttl(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl=60)
+    cache.put('key', b'data')
+    assert cache.lookup('key') is not None
+
+    _, meta = cache.lookup('key')
+    meta['stored'] = time.time() - 120
+    cache._write_meta('key', meta)
+    assert cache.lookup('key') is None
+    assert cache.lookup('key', include_expired=True) is not None
+
+    cache.touch('key', etag='"abc"')
+    _, meta = cache.lookup('key')
+    assert meta['etag'] == '"abc"'
+
+
+def test_lru_eviction(tmp_path):
+    cache = DiskCache(str(tmp_path), max_size=10)
+    cache.put('a', b'1234')
+    cache.put('b', b'1234')
+    # mark a as more recently used than b
+    past = time.time() - 100
+    os.utime(cache._datapath('b'), (past, past))
+
+    cache.put('c', b'1234')
+
+    assert cache.lookup('a') is not None
+    assert cache.lookup('b') is None
+    assert cache.lookup('c') is not None
+    assert cache.size() == 8
+
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_eviction_running_total(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_size=10)
+    cache.put('a', b'1234')
+    scans = []
+    entries = DiskCache._entries
+
+    def counting_entries(self):
+        scans.append(None)
+        return entries(self)
+
+    monkeypatch.setattr(DiskCache, '_entries', counting_entries)
+    cache.put('a', b'12345')
+    cache.put('b', b'1234')
+    # within the limit, commits do not scan the directory
+    assert not scans
+
+    cache.put('c', b'1234')
+    assert len(scans) == 1
+    assert cache.lookup('a') is None
+    assert cache.size() == 8
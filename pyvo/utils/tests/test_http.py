@@ -4,8 +4,10 @@ Tests for pyvo.utils.http
 """
 
 import platform
+from concurrent.futures import ThreadPoolExecutor
 
-from pyvo.utils.http import create_session
+from pyvo.utils.http import (
+    create_session, use_session, get_shared_session, configure_session_pool)
 from pyvo.version import version
 
 
@@ -13,3 +15,34 @@ def test_create_session():
     test_session = create_session()
     assert (test_session.headers['User-Agent']
             == f'pyVO/{version} Python/{platform.python_version()} ({platform.system()})')
+
+
+def test_shared_session_per_host():
+    session = get_shared_session('http://example.com/tap')
+    assert get_shared_session('http://example.com/other') is session
+    assert use_session(None, url='http://example.com/sync') is session
+    assert get_shared_session('http://example.org/tap') is not session
+
+
+def test_use_session_passthrough():
+    test_session = create_session()
+    assert use_session(test_session, url='http://example.com') is test_session
+
+
+def test_configure_session_pool():
+    old_session = get_shared_session('http://example.com')
+    try:
+        configure_session_pool(pool_maxsize=32)
+        new_session = get_shared_session('http://example.com')
+        assert new_session is not old_session
+        assert new_session.get_adapter('http://example.com')._pool_maxsize == 32
+    finally:
+        configure_session_pool(pool_maxsize=10)
+
+
+def test_shared_session_threads():
+    with ThreadPoolExecutor(8) as executor:
+        sessions = set(executor.map(
+            lambda _: id(get_shared_session('http://threads.example.com')),
+            range(64)))
+    assert len(sessions) == 1